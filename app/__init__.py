@@ -9,11 +9,20 @@ static_folder = os.path.join(base_dir, 'static')
 app = Flask(__name__, static_folder=static_folder)
 app.config.from_object("config.Config")
 
-# Disable template caching
+# Disable template caching. Set on the config rather than on app.jinja_env, which would load
+# Jinja in workers that never render a page.
 app.config['TEMPLATES_AUTO_RELOAD'] = True
-app.jinja_env.auto_reload = True
 
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 
-from app import routes, models
+from app.engine import configure_sqlite
+with app.app_context():
+    configure_sqlite(db.engine, app.config['SQLITE_PRAGMAS'])
+
+from app import models, versions, changes, sites, ingest, cli, metrics
+
+# Ingest workers (FILATRACK_ROLE=ingest) only take slicer uploads: no pages, API or change feed,
+# so they never load a template and stay small
+if app.config['ROLE'] != 'ingest':
+    from app import routes, api, events
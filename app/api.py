@@ -0,0 +1,256 @@
+from datetime import datetime
+from flask import request, jsonify, stream_with_context, url_for
+from sqlalchemy import func, select
+from app import app, db
+from app.models import FilamentRoll, PrintJob, PrintJobUsage, TempPrintJob, RollUsage
+from app.routes import encode_cursor, decode_cursor, page_job_ids
+from app.cache import versioned, response_cache
+from app.stats import PERIODS, DIMENSIONS, consumption_series
+from app.forecast import current_forecast
+from app.export import TABLES, check_format, content_type, file_name, manifest, snapshot, table_chunks
+from app.sites import current_site_id
+
+API_PAGE_SIZE = 100
+MAX_API_PAGE_SIZE = 1000
+
+# Fields of every resource, selectable with ?fields=a,b and filterable with ?name=value,
+# ?min_name=value and ?max_name=value
+ROLL_FIELDS = {
+    "id": FilamentRoll.id,
+    "maker": FilamentRoll.maker,
+    "color": FilamentRoll.color,
+    "total_weight": FilamentRoll.total_weight,
+    "remaining_weight": FilamentRoll.remaining_weight,
+    "in_use": FilamentRoll.in_use,
+    "grams_used": func.coalesce(RollUsage.grams_used, 0.0),
+    "job_count": func.coalesce(RollUsage.job_count, 0),
+    "last_used": RollUsage.last_used,
+}
+
+JOB_FIELDS = {
+    "id": PrintJob.id,
+    "project_name": PrintJob.project_name,
+    "date": PrintJob.date,
+    "weight_used": PrintJob.weight_used,
+    "filament_id": PrintJob.filament_id,
+    "printer_id": PrintJob.printer_id,
+}
+
+TEMP_JOB_FIELDS = {
+    "id": TempPrintJob.id,
+    "project_name": TempPrintJob.project_name,
+    "date": TempPrintJob.date,
+    "weight_used": TempPrintJob.weight_used,
+    "printer_id": TempPrintJob.printer_id,
+}
+
+# Every listing is of one site, ?site=<id> (the default site without it)
+RESERVED_ARGS = {"fields", "limit", "cursor", "site"}
+
+class ApiError(ValueError):
+    pass
+
+@app.errorhandler(ApiError)
+def api_error(error):
+    return jsonify({"error": str(error)}), 400
+
+def selected_fields(fields, extra=()):
+    names = request.args.get("fields")
+    if not names:
+        return list(fields)
+    names = [name.strip() for name in names.split(",") if name.strip()]
+    unknown = [name for name in names if name not in fields and name not in extra]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+    return names
+
+def parse_value(field, column, value):
+    python_type = column.type.python_type
+    try:
+        if python_type is bool:
+            if value.lower() not in ("true", "false", "1", "0"):
+                raise ValueError
+            return value.lower() in ("true", "1")
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        return python_type(value)
+    except ValueError:
+        raise ApiError(f"Invalid value for {field}: {value}")
+
+def apply_filters(query, fields):
+    for name, value in request.args.items():
+        if name in RESERVED_ARGS:
+            continue
+        field, compare = name, "eq"
+        if name.startswith(("min_", "max_")) and name[4:] in fields:
+            field, compare = name[4:], name[:3]
+        if field not in fields:
+            raise ApiError(f"Unknown filter: {name}")
+
+        column = fields[field]
+        value = parse_value(field, column, value)
+        if compare == "min":
+            query = query.where(column >= value)
+        elif compare == "max":
+            query = query.where(column <= value)
+        else:
+            query = query.where(column == value)
+    return query
+
+def page_limit():
+    limit = request.args.get("limit", API_PAGE_SIZE, type=int)
+    return max(1, min(limit, MAX_API_PAGE_SIZE))
+
+def serialize(row, names):
+    item = {}
+    for name in names:
+        value = row[name]
+        item[name] = value.strftime("%Y-%m-%dT%H:%M") if isinstance(value, datetime) else value
+    return item
+
+@app.route('/api/v1/rolls')
+@versioned("filament_roll", "roll_usage")
+def api_rolls():
+    names = selected_fields(ROLL_FIELDS)
+    query = (
+        select(*(ROLL_FIELDS[name].label(name) for name in names))
+        .select_from(FilamentRoll)
+        .outerjoin(RollUsage, RollUsage.roll_id == FilamentRoll.id)
+        .where(FilamentRoll.site_id == current_site_id())
+        .order_by(FilamentRoll.id)
+    )
+    rows = db.session.execute(apply_filters(query, ROLL_FIELDS)).mappings()
+    return jsonify(rolls=[serialize(row, names) for row in rows])
+
+@app.route('/api/v1/jobs')
+@versioned("print_job", "print_job_usage")
+def api_jobs():
+    """Print history, newest first, paginated with the same keyset cursor as the web page.
+
+    The "allocations" field lists the grams taken from every roll.
+    """
+    names = selected_fields(JOB_FIELDS, extra=["allocations"])
+    columns = [name for name in names if name in JOB_FIELDS]
+    limit = page_limit()
+
+    # date and id are always read, the cursor is built from them
+    query = (
+        select(PrintJob.id.label("_id"), PrintJob.date.label("_date"), *(JOB_FIELDS[name].label(name) for name in columns))
+        .order_by(PrintJob.date.desc().nulls_last(), PrintJob.id.desc())
+        .limit(limit + 1)
+    )
+    cursor = request.args.get("cursor")
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise ApiError("Invalid cursor")
+    # The filters narrow the seeks, so a page is still read from the index
+    job_ids = apply_filters(select(PrintJob.id).where(PrintJob.site_id == current_site_id()), JOB_FIELDS)
+    query = query.where(PrintJob.id.in_(page_job_ids(job_ids, after, limit)))
+
+    rows = db.session.execute(query).mappings().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["_date"], rows[-1]["_id"])
+
+    jobs = [serialize(row, columns) for row in rows]
+    if "allocations" in names and rows:
+        # One query for the rolls of the whole page
+        allocations = {}
+        for job_id, roll_id, grams in db.session.execute(
+            select(PrintJobUsage.job_id, PrintJobUsage.roll_id, PrintJobUsage.grams)
+            .where(PrintJobUsage.job_id.in_([row["_id"] for row in rows]))
+            .order_by(PrintJobUsage.id)
+        ):
+            allocations.setdefault(job_id, []).append({"filament_id": roll_id, "weight_used": grams})
+        for job, row in zip(jobs, rows):
+            job["allocations"] = allocations.get(row["_id"], [])
+
+    return jsonify(jobs=jobs, next_cursor=next_cursor)
+
+@app.route('/api/v1/temp_jobs')
+@versioned("temp_print_job")
+def api_temp_jobs():
+    names = selected_fields(TEMP_JOB_FIELDS)
+    query = (
+        select(*(TEMP_JOB_FIELDS[name].label(name) for name in names))
+        .where(TempPrintJob.site_id == current_site_id())
+        .order_by(TempPrintJob.date.desc(), TempPrintJob.id.desc())
+    )
+    rows = db.session.execute(apply_filters(query, TEMP_JOB_FIELDS)).mappings()
+    return jsonify(temp_jobs=[serialize(row, names) for row in rows])
+
+@app.route('/api/v1/stats')
+@versioned("filament_roll", "print_job", "print_job_usage")
+def api_stats():
+    """Grams consumed per ?period=day|week|month (default), split by ?by=maker,color,roll,project.
+
+    ?min_date= and ?max_date= limit the range, the monthly series cover whole months.
+    """
+    period = request.args.get("period", "month")
+    if period not in PERIODS:
+        raise ApiError(f"Invalid period: {period}")
+    by = [name.strip() for name in request.args.get("by", "").split(",") if name.strip()]
+    unknown = [name for name in by if name not in DIMENSIONS]
+    if unknown:
+        raise ApiError(f"Unknown dimension(s): {', '.join(unknown)}")
+    min_date, max_date = (
+        parse_value(name, PrintJob.date, request.args[name]) if name in request.args else None
+        for name in ("min_date", "max_date")
+    )
+
+    buckets, series = consumption_series(current_site_id(), period, by, min_date, max_date)
+    return jsonify(period=period, by=by, buckets=[start.isoformat() for start in buckets], series=series)
+
+@app.route('/api/v1/forecast')
+def api_forecast():
+    """When every roll and every maker/color runs out at its recent rate, and the unreviewed
+    jobs their likely roll can't hold.
+
+    Not a versioned view: the days left change with the date, the forecast itself is only
+    recomputed when the data changes.
+    """
+    return jsonify(current_forecast(current_site_id()))
+
+@app.route('/api/v1/cache')
+def api_cache_stats():
+    """Hit and miss counters of this worker's response cache."""
+    return jsonify(response_cache.stats())
+
+def export_options():
+    fmt = request.args.get("format", "ndjson")
+    try:
+        check_format(fmt)
+    except ValueError as e:
+        raise ApiError(str(e))
+    return fmt, request.args.get("gzip") in ("1", "true")
+
+@app.route('/api/v1/export')
+def api_export():
+    """Manifest of a full export, with the download of every table.
+
+    Saving it as manifest.json next to the downloads gives a directory 'flask import' loads.
+    """
+    fmt, compress = export_options()
+    with snapshot() as connection:
+        description = manifest(connection, fmt, compress)
+    for name, table in description["tables"].items():
+        table["url"] = url_for("api_export_table", table=name, format=fmt, gzip=int(compress), _external=True)
+    return jsonify(description)
+
+@app.route('/api/v1/export/<table>')
+def api_export_table(table):
+    """Streams every row of a table as NDJSON, CSV or Parquet (?format=), gzipped with ?gzip=1."""
+    if table not in TABLES:
+        return jsonify({"error": f"Unknown table {table!r} (choose from {', '.join(TABLES)})"}), 404
+    fmt, compress = export_options()
+
+    def generate():
+        with snapshot() as connection:
+            yield from table_chunks(connection, TABLES[table], fmt, compress)
+
+    return app.response_class(
+        stream_with_context(generate()), content_type=content_type(fmt, compress),
+        headers={"Content-Disposition": f"attachment; filename={file_name(table, fmt, compress)}"}
+    )
@@ -0,0 +1,295 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.engine import make_url
+from app import app, db
+from app.changes import FEED_TABLES, record_reload
+from app.models import LOCAL_TZ, DataVersion
+from app.versions import VERSIONED_TABLES
+
+# Snapshots are named after the time they were taken, so they sort by age. A label marks copies
+# taken for a reason (e.g. before a restore): those are kept until deleted by hand.
+PREFIX = "filatrack-"
+NAME = re.compile(r"^filatrack-(\d{8}-\d{6}-\d{3})(-[a-z-]+)?\.db$")
+
+# Copying is restarted by every write of another connection. After this many restarts the rest
+# is copied in a single step instead.
+MAX_RESTARTS = 3
+
+# How often each worker checks whether a scheduled backup is due
+SCHEDULE_CHECK_SECONDS = 60
+
+class _Restarted(Exception):
+    pass
+
+def sqlite_path(uri=None):
+    """The file of the configured SQLite database; ValueError for any other database."""
+    url = make_url(uri or app.config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise ValueError(
+            "Backups copy a SQLite database file, use 'flask export' or pg_dump for other databases"
+        )
+    return url.database
+
+def connect(path, readonly=False):
+    # sqlite3 would create a missing file
+    if not os.path.exists(path):
+        raise ValueError(f"{path} doesn't exist")
+    if readonly:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    return sqlite3.connect(path, timeout=app.config["SQLITE_PRAGMAS"]["busy_timeout"] / 1000)
+
+def copy_database(source, target, pages, sleep_ms):
+    """Copies the source connection's database into the target's with the online backup API.
+
+    `pages` pages are copied per step, and between steps the source isn't locked, so uploads carry
+    on while a large database is copied. Every write of another connection restarts the copy though,
+    which under steady uploads would never end: after MAX_RESTARTS the rest is copied in one step,
+    which in WAL mode only holds a read transaction, still without blocking writers.
+    Returns the number of restarts.
+    """
+    progress = {"remaining": None, "restarts": 0}
+
+    def check(status, remaining, total):
+        if progress["remaining"] is not None and remaining > progress["remaining"]:
+            progress["restarts"] += 1
+            if progress["restarts"] > MAX_RESTARTS:
+                raise _Restarted
+        progress["remaining"] = remaining
+
+    try:
+        source.backup(target, pages=pages, progress=check, sleep=sleep_ms / 1000)
+    except _Restarted:
+        source.backup(target)
+    return progress["restarts"]
+
+def table_counts(connection):
+    """Row counts of the app's tables found in a database."""
+    names = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return {
+        name: connection.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+        for name in db.metadata.tables if name in names
+    }
+
+def schema_revision(connection):
+    try:
+        return connection.execute("SELECT version_num FROM alembic_version").fetchone()[0]
+    except (sqlite3.OperationalError, TypeError):
+        return None
+
+def last_change_id(connection):
+    # The AUTOINCREMENT counter rather than the newest entry, which may have been pruned
+    try:
+        row = connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+def backup_name(label=None):
+    now = datetime.now(LOCAL_TZ)
+    name = PREFIX + now.strftime("%Y%m%d-%H%M%S-") + f"{now.microsecond // 1000:03d}"
+    return name + (f"-{label}" if label else "") + ".db"
+
+def info_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+def create_backup(source_path, directory, label=None):
+    """Copies the database at source_path into a new snapshot in directory.
+
+    The copy is checked and counted before it gets its name, next to it a .json file records the
+    row counts that `verify_backup` checks later. Returns the snapshot's path and description.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, backup_name(label))
+    partial = path + ".partial"
+    started = time.monotonic()
+    source = connect(source_path)
+    try:
+        target = sqlite3.connect(partial)
+        try:
+            restarts = copy_database(
+                source, target, app.config["BACKUP_PAGES_PER_STEP"], app.config["BACKUP_STEP_SLEEP_MS"]
+            )
+            # A single file, without the -wal and -shm files of the live database
+            target.execute("PRAGMA journal_mode = DELETE")
+            check = target.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise ValueError(f"The copy of {source_path} is damaged: {check}")
+            description = {
+                "source": source_path,
+                "created_at": datetime.now(LOCAL_TZ).replace(tzinfo=None).isoformat(timespec="seconds"),
+                "revision": schema_revision(target),
+                "last_change_id": last_change_id(target),
+                "restarts": restarts,
+                "seconds": round(time.monotonic() - started, 3),
+                "tables": table_counts(target),
+            }
+        finally:
+            target.close()
+        with open(info_path(path), "w", encoding="utf-8") as f:
+            json.dump(description, f, indent=2)
+        os.replace(partial, path)
+    except BaseException:
+        for leftover in (partial, info_path(path)):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    finally:
+        source.close()
+    return path, description
+
+def list_backups(directory):
+    """Paths of the snapshots in directory, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if NAME.match(name)]
+
+def scheduled_backups(directory):
+    """The snapshots without a label, which are rotated."""
+    return [path for path in list_backups(directory) if not NAME.match(os.path.basename(path)).group(2)]
+
+def read_info(path):
+    try:
+        with open(info_path(path), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def verify_backup(path):
+    """Opens a snapshot and checks its integrity and its row counts. Returns the problems found."""
+    try:
+        connection = connect(path, readonly=True)
+    except ValueError as e:
+        return [str(e)]
+    try:
+        problems = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+        if problems == ["ok"]:
+            problems = []
+        counts = table_counts(connection)
+    except sqlite3.DatabaseError as e:
+        return [f"Not a readable database: {e}"]
+    finally:
+        connection.close()
+
+    info = read_info(path)
+    if info is None:
+        problems.append(f"{os.path.basename(info_path(path))} is missing, the row counts can't be checked")
+        return problems
+    for table, rows in info["tables"].items():
+        if counts.get(table) != rows:
+            problems.append(f"{table}: {counts.get(table)} rows, {rows} when the snapshot was taken")
+    return problems
+
+def prune_backups(directory, keep):
+    """Deletes all but the newest `keep` unlabelled snapshots. Returns the deleted paths."""
+    snapshots = scheduled_backups(directory)
+    deleted = snapshots[:-keep] if keep > 0 else snapshots
+    for path in deleted:
+        os.remove(path)
+        if os.path.exists(info_path(path)):
+            os.remove(info_path(path))
+    return deleted
+
+def restore_backup(path, target_path, directory):
+    """Verifies a snapshot and copies it over the database at target_path.
+
+    The current database is first saved as a "pre-restore" snapshot. The copy is a single step of
+    the backup API, so connections still open on the database see either the old or the restored
+    one. Returns the path and description of the pre-restore snapshot, None without a current
+    database.
+    """
+    problems = verify_backup(path)
+    if problems:
+        raise ValueError(f"{os.path.basename(path)} failed verification: " + "; ".join(problems))
+
+    saved = None, None
+    if os.path.exists(target_path):
+        saved = create_backup(target_path, directory, label="pre-restore")
+
+    source = connect(path, readonly=True)
+    try:
+        target = sqlite3.connect(target_path, timeout=app.config["SQLITE_PRAGMAS"]["busy_timeout"] / 1000)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    return saved
+
+def finish_restore(previous_change_id):
+    """Makes caches and open dashboards drop what they showed of the replaced database.
+
+    The data versions start over from random values, like those of a new database, so no cached
+    page or ETag is taken for current. The change log continues after the replaced database's
+    last entry with a reload of every dashboard table, which the browsers following the feed get
+    right away.
+    """
+    connection = db.session.connection()
+    connection.exec_driver_sql(
+        "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'change_log'", (previous_change_id,)
+    )
+    connection.exec_driver_sql(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'change_log', ? "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'change_log')", (previous_change_id,)
+    )
+    for table in VERSIONED_TABLES:
+        db.session.execute(
+            update(DataVersion.__table__)
+            .where(DataVersion.table_name == table)
+            .values(version=random.randrange(2 ** 30))
+        )
+    for table in FEED_TABLES:
+        record_reload(table)
+    db.session.commit()
+
+def scheduled_backup():
+    """Takes a backup if the newest one is older than BACKUP_INTERVAL_HOURS, then rotates them.
+
+    Every worker of every server on the database calls this. A lock file in the backup folder lets
+    one of them do it, the others find the new snapshot and skip.
+    """
+    import fcntl  # Unix only, like gunicorn
+
+    directory = app.config["BACKUP_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        latest = scheduled_backups(directory)
+        if latest and time.time() - os.path.getmtime(latest[-1]) < app.config["BACKUP_INTERVAL_HOURS"] * 3600:
+            return None
+        path, description = create_backup(sqlite_path(), directory)
+        app.logger.info("Backup %s taken in %.1f s (%d restarts)",
+                        path, description["seconds"], description["restarts"])
+        for deleted in prune_backups(directory, app.config["BACKUP_KEEP"]):
+            app.logger.info("Backup %s rotated out", deleted)
+        return path
+
+def run_schedule():
+    while True:
+        time.sleep(SCHEDULE_CHECK_SECONDS)
+        try:
+            scheduled_backup()
+        except Exception:
+            app.logger.exception("Scheduled backup failed")
+
+def start_schedule():
+    """Starts checking for due backups in a thread, on SQLite with BACKUP_INTERVAL_HOURS set."""
+    try:
+        sqlite_path()
+    except ValueError:
+        return None
+    if app.config["BACKUP_INTERVAL_HOURS"] <= 0:
+        return None
+    thread = threading.Thread(target=run_schedule, name="backup-schedule", daemon=True)
+    thread.start()
+    return thread
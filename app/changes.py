@@ -0,0 +1,105 @@
+import itertools
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, func, insert, inspect, select, text
+from sqlalchemy.orm import Session
+from app import app, db
+from app.models import LOCAL_TZ, ChangeLog
+
+# Tables shown on the dashboard. Every commit writing to one of them appends the ids of the rows it
+# changed to change_log, which every worker polls to push the changes to its connected browsers
+# (see app/events.py).
+FEED_TABLES = ("filament_roll", "temp_print_job", "print_job")
+
+# Changes to these tables are changes of a row of their parent: (parent table, foreign key)
+FEED_PARENTS = {"print_job_usage": ("print_job", "job_id")}
+
+# Keeps the ids of commits from different transactions in commit order on PostgreSQL, where a
+# sequence hands them out at insert time and a later id could otherwise become visible first
+CHANGE_LOG_LOCK = 4721
+
+PRUNE_EVERY = 100
+
+_commits = itertools.count(1)
+
+def pending_changes(session):
+    return session.info.setdefault("feed_changes", {})
+
+def record_changes(table, ids, action="upsert"):
+    """Adds rows changed by a bulk statement to the change log of the current transaction.
+
+    Changes made through the ORM are found by the flush, only insert(), update() and delete()
+    statements need this. A bulk statement on a dashboard table that isn't recorded here makes
+    the browsers reload the page instead.
+    """
+    changes = pending_changes(db.session)
+    for row_id in ids:
+        # A deletion wins over any other change of the row in the same transaction
+        if changes.get((table, row_id)) != "delete":
+            changes[(table, row_id)] = action
+
+def record_reload(table):
+    """Makes the browsers reload the page once the current transaction commits.
+
+    For writes too large to list row by row, or that bypass the session (e.g. an import).
+    """
+    pending_changes(db.session)[(table, None)] = "reload"
+
+@event.listens_for(Session, "after_flush")
+def track_rows(session, flush_context):
+    changes = pending_changes(session)
+    for objects, action in ((session.new, "upsert"), (session.dirty, "upsert"), (session.deleted, "delete")):
+        for obj in objects:
+            table = obj.__table__.name
+            if table in FEED_PARENTS:
+                # Any change of a child (e.g. a job's rolls) changes how the parent's row looks
+                table, column = FEED_PARENTS[table]
+                key, row_action = (table, getattr(obj, column)), "upsert"
+            elif table in FEED_TABLES:
+                if objects is session.dirty and not session.is_modified(obj):
+                    continue
+                # New objects only get their identity after the flush, their id is already set
+                identity = inspect(obj).identity
+                key, row_action = (table, identity[0] if identity else obj.id), action
+            else:
+                continue
+            if key[1] is not None and changes.get(key) != "delete":
+                changes[key] = row_action
+
+@event.listens_for(Session, "do_orm_execute")
+def track_bulk_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = orm_execute_state.statement.table.name
+        if table in FEED_TABLES:
+            orm_execute_state.session.info.setdefault("feed_bulk_tables", set()).add(table)
+
+@event.listens_for(Session, "before_commit")
+def write_change_log(session):
+    session.flush()
+    changes = session.info.pop("feed_changes", {})
+    recorded = {table for table, _ in changes}
+    for table in session.info.pop("feed_bulk_tables", set()) - recorded:
+        changes[(table, None)] = "reload"
+    if not changes:
+        return
+
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_LOG_LOCK})
+    now = datetime.now(LOCAL_TZ).replace(tzinfo=None)
+    connection.execute(insert(ChangeLog.__table__), [
+        {"table_name": table, "row_id": row_id, "action": action, "created_at": now}
+        for (table, row_id), action in changes.items()
+    ])
+    if next(_commits) % PRUNE_EVERY == 0:
+        connection.execute(
+            delete(ChangeLog.__table__)
+            .where(ChangeLog.created_at < now - timedelta(hours=app.config["CHANGE_LOG_RETENTION_HOURS"]))
+        )
+
+@event.listens_for(Session, "after_rollback")
+def forget_rows(session):
+    session.info.pop("feed_changes", None)
+    session.info.pop("feed_bulk_tables", None)
+
+def latest_change_id():
+    return db.session.scalar(select(func.max(ChangeLog.id))) or 0
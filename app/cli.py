@@ -0,0 +1,252 @@
+import os
+import click
+from flask.cli import AppGroup
+from flask_migrate import upgrade
+from sqlalchemy import delete, insert, update
+from app import app, db
+from app.backup import (
+    create_backup, finish_restore, list_backups, prune_backups, read_info, restore_backup, sqlite_path,
+    verify_backup
+)
+from app.export import BATCH_SIZE, FORMATS, export_database, import_database
+from app.models import Printer, PrintJob, RollUsage, MonthlyRollUsage, MonthlyProjectUsage, Site, TempPrintJob
+from app.sites import add_printer
+from app.stats import monthly_roll_usage_from_print_jobs, monthly_project_usage_from_print_jobs
+from app.usage import usage_from_print_jobs
+
+usage_cli = AppGroup('usage', help='Check or rebuild the per-roll usage summary and the monthly rollups.')
+
+# Monthly rollups, the columns they are split by and the query rebuilding them
+ROLLUPS = [
+    (MonthlyRollUsage, ('roll_id',), monthly_roll_usage_from_print_jobs),
+    (MonthlyProjectUsage, ('site_id', 'project_name'), monthly_project_usage_from_print_jobs),
+]
+
+@usage_cli.command('verify')
+def verify_usage():
+    """Compare the usage summary and the monthly rollups against the print history."""
+    expected = {
+        roll_id: (grams or 0, count, last_used)
+        for roll_id, grams, count, last_used in db.session.execute(usage_from_print_jobs())
+    }
+    actual = {
+        usage.roll_id: (usage.grams_used, usage.job_count, usage.last_used)
+        for usage in RollUsage.query
+    }
+
+    mismatches = 0
+    for roll_id in sorted(expected.keys() | actual.keys()):
+        want = expected.get(roll_id, (0, 0, None))
+        got = actual.get(roll_id, (0, 0, None))
+        if abs(want[0] - got[0]) > 1e-6 or want[1:] != got[1:]:
+            mismatches += 1
+            click.echo(f"Roll {roll_id}: summary {got} != print history {want}")
+
+    for model, columns, query in ROLLUPS:
+        expected_monthly = {
+            (month, *key): (grams or 0, count) for month, *key, grams, count in db.session.execute(query())
+        }
+        actual_monthly = {
+            (usage.month, *(getattr(usage, column) for column in columns)): (usage.grams, usage.job_count)
+            for usage in model.query
+        }
+        for month, *key in sorted(expected_monthly.keys() | actual_monthly.keys()):
+            want = expected_monthly.get((month, *key), (0, 0))
+            got = actual_monthly.get((month, *key), (0, 0))
+            if abs(want[0] - got[0]) > 1e-6 or want[1] != got[1]:
+                mismatches += 1
+                click.echo(f"{model.__tablename__} {month:%Y-%m} {' '.join(map(str, key))}: "
+                           f"rollup {got} != print history {want}")
+
+    if mismatches:
+        click.echo(f"{mismatches} row(s) out of sync, run 'flask usage rebuild'.")
+        raise SystemExit(1)
+    click.echo(f"Usage summary and monthly rollups match the print history ({len(expected)} rolls).")
+
+def rebuild_usage_tables():
+    """Recomputes the usage summary and the monthly rollups in the current transaction."""
+    db.session.execute(delete(RollUsage))
+    db.session.execute(
+        insert(RollUsage).from_select(
+            ['roll_id', 'grams_used', 'job_count', 'last_used'], usage_from_print_jobs()
+        )
+    )
+    for model, columns, query in ROLLUPS:
+        db.session.execute(delete(model))
+        db.session.execute(insert(model).from_select(['month', *columns, 'grams', 'job_count'], query()))
+
+@usage_cli.command('rebuild')
+def rebuild_usage():
+    """Recompute the usage summary and the monthly rollups from the print history."""
+    rebuild_usage_tables()
+    db.session.commit()
+    click.echo(f"Rebuilt usage summary for {RollUsage.query.count()} rolls and the monthly rollups.")
+
+app.cli.add_command(usage_cli)
+
+@app.cli.command('export')
+@click.argument('directory')
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='ndjson', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Compress NDJSON and CSV files (Parquet always is).')
+@click.option('--batch-size', type=int, default=BATCH_SIZE, show_default=True, help='Rows read and written at a time.')
+def export_data(directory, fmt, compress, batch_size):
+    """Write the rolls, print jobs and ledger to DIRECTORY, a file per table and a manifest.json."""
+    try:
+        description = export_database(directory, fmt, compress, batch_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for name, table in description["tables"].items():
+        click.echo(f"{name}: {table['rows']} rows -> {table['file']}")
+
+@app.cli.command('import')
+@click.argument('directory')
+@click.option('--replace', is_flag=True, help='Delete the rolls, print jobs and ledger of this database first.')
+@click.option('--batch-size', type=int, default=BATCH_SIZE, show_default=True, help='Rows inserted at a time.')
+def import_data(directory, replace, batch_size):
+    """Load an export written by 'flask export' (or downloaded from /api/v1/export) from DIRECTORY."""
+    try:
+        counts = import_database(directory, replace, batch_size)
+        rebuild_usage_tables()
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+    for name, count in counts.items():
+        click.echo(f"{name}: {count} rows")
+    click.echo("Rebuilt the usage summary and the monthly rollups.")
+
+backup_cli = AppGroup('backup', help='Take, check, rotate and restore snapshots of the SQLite database.')
+
+def backup_file(name):
+    """A snapshot given by its file name in BACKUP_DIR, or by a path."""
+    path = name if os.path.dirname(name) else os.path.join(app.config['BACKUP_DIR'], name)
+    if not os.path.exists(path):
+        raise click.ClickException(f"No snapshot {name} in {app.config['BACKUP_DIR']}")
+    return path
+
+@backup_cli.command('create')
+def create_snapshot():
+    """Copy the database into a new snapshot in BACKUP_DIR while it stays in use."""
+    try:
+        path, description = create_backup(sqlite_path(), app.config['BACKUP_DIR'])
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    rows = sum(description['tables'].values())
+    click.echo(f"{path}: {rows} rows in {description['seconds']:.1f} s")
+
+@backup_cli.command('list')
+def list_snapshots():
+    """List the snapshots in BACKUP_DIR, oldest first."""
+    for path in list_backups(app.config['BACKUP_DIR']):
+        info = read_info(path) or {}
+        size = os.path.getsize(path) / 1024 / 1024
+        click.echo(f"{os.path.basename(path)}  {size:.1f} MB  {info.get('revision') or '-'}")
+
+@backup_cli.command('verify')
+@click.argument('names', nargs=-1)
+def verify_snapshots(names):
+    """Check the integrity and row counts of the given snapshots, or of all of them."""
+    paths = [backup_file(name) for name in names] or list_backups(app.config['BACKUP_DIR'])
+    failed = 0
+    for path in paths:
+        problems = verify_backup(path)
+        if problems:
+            failed += 1
+        click.echo(f"{os.path.basename(path)}: " + ("; ".join(problems) if problems else "ok"))
+    if failed:
+        click.echo(f"{failed} of {len(paths)} snapshot(s) failed verification.")
+        raise SystemExit(1)
+
+@backup_cli.command('prune')
+@click.option('--keep', type=int, help='Snapshots to keep (default BACKUP_KEEP).')
+def prune_snapshots(keep):
+    """Delete all but the newest snapshots. Pre-restore snapshots are kept."""
+    keep = app.config['BACKUP_KEEP'] if keep is None else keep
+    for path in prune_backups(app.config['BACKUP_DIR'], keep):
+        click.echo(f"Deleted {os.path.basename(path)}")
+
+@backup_cli.command('restore')
+@click.argument('name')
+@click.confirmation_option(prompt='Replace the database with this snapshot?')
+def restore_snapshot(name):
+    """Replace the database with the snapshot NAME, after verifying it.
+
+    The current database is kept as a pre-restore snapshot first.
+    """
+    path = backup_file(name)
+    try:
+        target = sqlite_path()
+        # No pooled connection of this process keeps a transaction open on the old file
+        db.session.remove()
+        db.engine.dispose()
+        saved, replaced = restore_backup(path, target, app.config['BACKUP_DIR'])
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if saved:
+        click.echo(f"Saved the replaced database as {os.path.basename(saved)}")
+
+    # A snapshot from before an upgrade is brought up to the schema of this version
+    revision = read_info(path).get('revision')
+    if revision and revision != (replaced or {}).get('revision'):
+        upgrade()
+    finish_restore((replaced or {}).get('last_change_id', 0))
+    click.echo(f"Restored {os.path.basename(path)} into {target}.")
+
+app.cli.add_command(backup_cli)
+
+sites_cli = AppGroup('sites', help='Add and list the sites (e.g. printer rooms), each with its own dashboard.')
+
+def find_site(value):
+    site = db.session.get(Site, int(value)) if value.isdigit() else Site.query.filter_by(name=value).first()
+    if not site:
+        raise click.ClickException(f"No site {value}")
+    return site
+
+@sites_cli.command('add')
+@click.argument('name')
+def add_site(name):
+    """Add a site NAME."""
+    if Site.query.filter_by(name=name).first():
+        raise click.ClickException(f"A site {name} already exists")
+    site = Site(name=name)
+    db.session.add(site)
+    db.session.commit()
+    click.echo(f"Added site {site.id} ({name}), its dashboard is /?site={site.id}")
+
+@sites_cli.command('list')
+def list_sites():
+    """List the sites and their printers."""
+    for site in Site.query.order_by(Site.id):
+        click.echo(f"{site.id}  {site.name}")
+        for printer in Printer.query.filter_by(site_id=site.id).order_by(Printer.id):
+            click.echo(f"    printer {printer.id}  {printer.name}")
+
+app.cli.add_command(sites_cli)
+
+printers_cli = AppGroup('printers', help='Add printers with the API key their uploads are sent with, or remove them.')
+
+@printers_cli.command('add')
+@click.argument('site')
+@click.argument('name')
+def add_printer_command(site, name):
+    """Add a printer NAME to SITE (id or name) and show its API key."""
+    printer, key = add_printer(find_site(site), name)
+    db.session.commit()
+    click.echo(f"Added printer {printer.id} ({name}) to {printer.site.name}.")
+    click.echo(f"API key, shown only now (FILAMENT_TRACKER_API_KEY of its slicer): {key}")
+
+@printers_cli.command('remove')
+@click.argument('printer_id', type=int)
+def remove_printer(printer_id):
+    """Remove a printer, its API key stops working. Its jobs stay at its site."""
+    printer = db.session.get(Printer, printer_id)
+    if not printer:
+        raise click.ClickException(f"No printer {printer_id}")
+    # SQLite doesn't enforce the foreign keys' ON DELETE SET NULL
+    for model in (PrintJob, TempPrintJob):
+        db.session.execute(update(model).where(model.printer_id == printer_id).values(printer_id=None))
+    db.session.delete(printer)
+    db.session.commit()
+    click.echo(f"Removed printer {printer_id}.")
+
+app.cli.add_command(printers_cli)
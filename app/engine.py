@@ -0,0 +1,13 @@
+from sqlalchemy import event
+
+def configure_sqlite(engine, pragmas):
+    """Applies the configured PRAGMAs to every new connection of a SQLite engine."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
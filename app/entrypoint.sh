@@ -1,8 +1,12 @@
 #!/bin/sh
 set -e
 
-echo "Running database migrations..."
-flask db upgrade || flask db migrate -m "Auto migration" && flask db upgrade
+# An ingest server (FILATRACK_ROLE=ingest) leaves the migrations to the main one
+if [ "${FILATRACK_ROLE:-all}" != "ingest" ]; then
+    echo "Running database migrations..."
+    flask db upgrade || flask db migrate -m "Auto migration" && flask db upgrade
+fi
 
 echo "Starting Gunicorn..."
-exec gunicorn -b 0.0.0.0:5000 "app:app"
+# Bind address, workers, worker class and threads are set in gunicorn.conf.py (GUNICORN_* variables)
+exec gunicorn "app:app"
@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from datetime import datetime
+from flask import Response, jsonify, render_template, request, stream_with_context
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from app import app, db
+from app.models import ChangeLog, FilamentRoll, PrintJob, PrintJobUsage, TempPrintJob
+from app.changes import latest_change_id
+from app.sites import current_site_id
+
+MAX_BATCH = 500
+
+class ChangeFeed:
+    """Wakes the event streams of a worker when another worker (or this one) logged a change.
+
+    One thread per worker polls the newest change id while any stream is connected, so the
+    database sees one cheap query per interval however many browsers are open.
+    """
+    def __init__(self):
+        self.latest = None
+        self.streams = 0
+        self.thread = None
+        self.condition = threading.Condition()
+
+    def subscribe(self):
+        with self.condition:
+            self.streams += 1
+            if not self.thread or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.poll, daemon=True)
+                self.thread.start()
+
+    def unsubscribe(self):
+        with self.condition:
+            self.streams -= 1
+
+    def poll(self):
+        while True:
+            with self.condition:
+                if not self.streams:
+                    self.thread = None
+                    self.latest = None
+                    return
+            with app.app_context():
+                latest = latest_change_id()
+            with self.condition:
+                if latest != self.latest:
+                    self.latest = latest
+                    self.condition.notify_all()
+            time.sleep(app.config["CHANGE_FEED_POLL_SECONDS"])
+
+    def wait(self, after, timeout):
+        """Blocks until a change newer than `after` was seen, at most timeout seconds."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.latest is not None and self.latest > after, timeout)
+
+change_feed = ChangeFeed()
+
+def row_values(obj):
+    values = {}
+    for column in obj.__table__.columns:
+        value = getattr(obj, column.key)
+        values[column.key] = value.strftime("%Y-%m-%dT%H:%M") if isinstance(value, datetime) else value
+    return values
+
+def load_rows(table, ids, site_id):
+    if table == "filament_roll":
+        rows = FilamentRoll.query.filter(FilamentRoll.id.in_(ids), FilamentRoll.site_id == site_id)
+    elif table == "temp_print_job":
+        rows = TempPrintJob.query.filter(TempPrintJob.id.in_(ids), TempPrintJob.site_id == site_id)
+    else:
+        # Same eager loading as the print history page
+        rows = PrintJob.query.options(
+            joinedload(PrintJob.filament),
+            joinedload(PrintJob.allocations).joinedload(PrintJobUsage.roll)
+        ).filter(PrintJob.id.in_(ids), PrintJob.site_id == site_id)
+    return {row.id: row for row in rows}
+
+def render_row(table, row):
+    if table == "filament_roll":
+        return render_template("_roll_rows.html", rolls=[row])
+    if table == "temp_print_job":
+        return render_template("_temp_job_rows.html", temp_jobs=[row])
+    return render_template("_print_job_rows.html", print_jobs=[row])
+
+def changes_after(change_id, site_id, limit=MAX_BATCH):
+    """The changes logged after change_id, with the current values and rendered row of every changed row.
+
+    A row changed several times is sent once, with the id of its last change. Rows of other sites
+    are left out. Also returns the id of the last entry read and whether more entries are waiting.
+    """
+    entries = db.session.execute(
+        select(ChangeLog.id, ChangeLog.table_name, ChangeLog.row_id, ChangeLog.action)
+        .where(ChangeLog.id > change_id)
+        .order_by(ChangeLog.id)
+        .limit(limit)
+    ).all()
+    last = {}
+    for entry in entries:
+        last.pop((entry.table_name, entry.row_id), None)
+        last[(entry.table_name, entry.row_id)] = entry
+    latest = sorted(last.values(), key=lambda entry: entry.id)
+
+    # Rows that still exist, with one query per table
+    wanted = {}
+    for entry in latest:
+        if entry.action == "upsert":
+            wanted.setdefault(entry.table_name, set()).add(entry.row_id)
+    rows = {table: load_rows(table, ids, site_id) for table, ids in wanted.items()}
+
+    changes = []
+    for entry in latest:
+        change = {"table": entry.table_name, "id": entry.row_id, "action": entry.action}
+        if entry.action == "upsert":
+            row = rows[entry.table_name].get(entry.row_id)
+            if row is None:
+                # Deleted by a later commit than this batch read, or of another site (not on the page)
+                change["action"] = "delete"
+            else:
+                change["row"] = row_values(row)
+                change["html"] = render_row(entry.table_name, row)
+        changes.append((entry.id, change))
+    return changes, entries[-1].id if entries else change_id, len(entries) == limit
+
+def format_event(event_name, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event_name}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+def event_stream(since, duration, site_id):
+    """Streams the changes of a site's rows after `since` for `duration` seconds, then ends.
+
+    The browser reconnects by itself and resumes from the last event id it got, so a stream never
+    holds a gunicorn worker past its timeout. A token the log no longer covers (pruned, or from
+    another database) gets a reset event: the page has to be reloaded.
+    """
+    yield f"retry: {app.config['CHANGE_FEED_RETRY_MS']}\n\n"
+
+    latest = latest_change_id()
+    oldest = db.session.scalar(select(func.min(ChangeLog.id)))
+    if since is None:
+        since = latest
+    elif since > latest or (oldest is not None and since + 1 < oldest):
+        yield format_event("reset", {"latest": latest})
+        return
+
+    deadline = time.monotonic() + duration
+    subscribed = False
+    try:
+        while True:
+            changes, since, more = changes_after(since, site_id)
+            for change_id, change in changes:
+                yield format_event("change", change, change_id)
+            # Don't keep a connection (or a transaction) open while waiting
+            db.session.remove()
+            if more:
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if not subscribed:
+                change_feed.subscribe()
+                subscribed = True
+            if not change_feed.wait(since, min(remaining, app.config["CHANGE_FEED_KEEPALIVE_SECONDS"])):
+                yield ": keepalive\n\n"  # Finds disconnected browsers, keeps proxies from timing out
+    finally:
+        if subscribed:
+            change_feed.unsubscribe()
+
+@app.route('/events')
+def events():
+    """Server-Sent Events of the rows changed on the dashboard, resumable with Last-Event-ID or ?since=."""
+    since = request.headers.get("Last-Event-ID") or request.args.get("since")
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({"error": "Invalid event id"}), 400
+
+    duration = request.args.get("duration", app.config["CHANGE_FEED_STREAM_SECONDS"], type=float)
+    return Response(
+        stream_with_context(event_stream(since, min(duration, app.config["CHANGE_FEED_STREAM_SECONDS"]),
+                                         current_site_id())),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
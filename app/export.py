@@ -0,0 +1,465 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime
+from json.encoder import encode_basestring_ascii
+from sqlalchemy import delete, func, inspect, select, text
+from app import db
+from app.changes import FEED_TABLES, record_reload
+from app.models import (
+    LOCAL_TZ, ConsumptionEntry, FilamentRoll, MonthlyProjectUsage, MonthlyRollUsage, Printer, PrintJob,
+    PrintJobUsage, RollUsage, Site, TempPrintJob
+)
+from app.search import FTS_TABLES, fts_ddl, tsvector_ddl
+from app.versions import changed_tables
+
+# Exported tables, in the order they are imported (parents first). Only what was entered or
+# uploaded is exported: the usage summary and the monthly rollups are rebuilt after an import.
+EXPORT_TABLES = [
+    Site.__table__, Printer.__table__, FilamentRoll.__table__, PrintJob.__table__, PrintJobUsage.__table__,
+    TempPrintJob.__table__, ConsumptionEntry.__table__,
+]
+# Every database starts with the default site, an import replaces it with the exported sites.
+# Exports from before sites existed have neither, their rows stay with the default site.
+SEEDED_TABLES = [Site.__table__]
+OPTIONAL_TABLES = [Site.__table__, Printer.__table__]
+DERIVED_TABLES = [RollUsage.__table__, MonthlyRollUsage.__table__, MonthlyProjectUsage.__table__]
+TABLES = {table.name: table for table in EXPORT_TABLES}
+
+# format -> (file extension, content type)
+FORMATS = {
+    "ndjson": (".ndjson", "application/x-ndjson"),
+    "csv": (".csv", "text/csv"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+BATCH_SIZE = 10000
+MANIFEST = "manifest.json"
+
+def check_format(fmt):
+    """Raises ValueError when the format is unknown or its library isn't installed."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r} (choose from {', '.join(FORMATS)})")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ValueError("The parquet format needs pyarrow (pip install pyarrow)")
+
+def file_name(table_name, fmt, compress=False):
+    # Parquet files compress their columns themselves
+    suffix = ".gz" if compress and fmt != "parquet" else ""
+    return table_name + FORMATS[fmt][0] + suffix
+
+def content_type(fmt, compress=False):
+    return "application/gzip" if compress and fmt != "parquet" else FORMATS[fmt][1]
+
+def begin_sqlite(connection):
+    # pysqlite only opens a transaction before writes: every SELECT would see the latest commit
+    # and DDL (like dropping an index) would be committed right away
+    if connection.dialect.name == "sqlite" and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN")
+
+@contextmanager
+def snapshot():
+    """A connection reading every table as of the same moment, so the rows of different tables match."""
+    with db.engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execution_options(isolation_level="REPEATABLE READ")
+        begin_sqlite(connection)
+        yield connection
+
+def schema_revision(connection):
+    if not inspect(connection).has_table("alembic_version"):
+        return None
+    return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+def manifest(connection, fmt, compress=False):
+    """Describes an export: format, schema revision and the file, columns and row count of every table."""
+    return {
+        "format": fmt,
+        "revision": schema_revision(connection),
+        "exported_at": datetime.now(LOCAL_TZ).replace(tzinfo=None).isoformat(timespec="seconds"),
+        "tables": {
+            table.name: {
+                "file": file_name(table.name, fmt, compress),
+                "columns": [column.name for column in table.columns],
+                "rows": connection.execute(select(func.count()).select_from(table)).scalar(),
+            }
+            for table in EXPORT_TABLES
+        },
+    }
+
+def read_batches(connection, table, batch_size=BATCH_SIZE):
+    """Yields the rows of a table in primary key order, batch_size at a time.
+
+    yield_per reads them from a server-side cursor on PostgreSQL, so memory use doesn't grow
+    with the table.
+    """
+    query = select(table).order_by(*table.primary_key.columns).execution_options(yield_per=batch_size)
+    yield from connection.execute(query).partitions()
+
+def json_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+def ndjson_formatter(table):
+    """Returns a function formatting a row of the table as a line of JSON.
+
+    Rows are filled into a template made from the column types, json.dumps() would take three
+    times as long. Rows with NULLs, rare in these tables, go through json.dumps() still.
+    """
+    names = [column.name for column in table.columns]
+    fields, converters = [], []
+    for index, column in enumerate(table.columns):
+        key = encode_basestring_ascii(column.name) + ":"
+        python_type = column.type.python_type
+        if python_type is int:
+            fields.append(key + "%d")
+        elif python_type is float:
+            fields.append(key + "%r")
+        elif python_type is bool:
+            fields.append(key + "%s")
+            converters.append((index, lambda value: "true" if value else "false"))
+        elif python_type is str:
+            fields.append(key + "%s")
+            converters.append((index, encode_basestring_ascii))
+        else:
+            fields.append(key + '"%s"')
+            converters.append((index, json_value))
+    template = "{" + ",".join(fields) + "}\n"
+
+    def format_row(row):
+        if None in row:
+            return json.dumps(dict(zip(names, map(json_value, row))), separators=(",", ":")) + "\n"
+        values = list(row)
+        for index, convert in converters:
+            values[index] = convert(values[index])
+        return template % tuple(values)
+    return format_row
+
+def ndjson_chunks(table, batches):
+    format_row = ndjson_formatter(table)
+    for rows in batches:
+        yield "".join(map(format_row, rows)).encode()
+
+def csv_chunks(names, batches):
+    # The csv module writes NULLs as empty fields and dates the way datetime.fromisoformat() reads them
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(names)
+    yield buffer.getvalue().encode()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+class ChunkSink(io.RawIOBase):
+    """File pyarrow writes to, whose content is handed out chunk by chunk."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        # The Parquet footer points at the offsets of the row groups
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def arrow_schema(table):
+    import pyarrow
+
+    types = {
+        int: pyarrow.int64(), float: pyarrow.float64(), bool: pyarrow.bool_(), str: pyarrow.string(),
+        datetime: pyarrow.timestamp("us"), date: pyarrow.date32(),
+    }
+    return pyarrow.schema([(column.name, types[column.type.python_type]) for column in table.columns])
+
+def parquet_chunks(table, batches):
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = arrow_schema(table)
+    sink = ChunkSink()
+    # A row group per batch, columns compressed with zstd
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+    for rows in batches:
+        columns = zip(*rows)
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # With a gzip header
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
+
+def table_chunks(connection, table, fmt, compress=False, batch_size=BATCH_SIZE):
+    """Yields a table encoded in the format, as bytes, holding one batch of rows in memory at a time."""
+    names = [column.name for column in table.columns]
+    batches = read_batches(connection, table, batch_size)
+    if fmt == "parquet":
+        return parquet_chunks(table, batches)
+    chunks = ndjson_chunks(table, batches) if fmt == "ndjson" else csv_chunks(names, batches)
+    return gzipped(chunks) if compress else chunks
+
+def export_database(directory, fmt="ndjson", compress=False, batch_size=BATCH_SIZE):
+    """Writes every exported table to a file in directory, with a manifest.json describing them."""
+    check_format(fmt)
+    os.makedirs(directory, exist_ok=True)
+    with snapshot() as connection:
+        description = manifest(connection, fmt, compress)
+        for table in EXPORT_TABLES:
+            with open(os.path.join(directory, description["tables"][table.name]["file"]), "wb") as f:
+                for chunk in table_chunks(connection, table, fmt, compress, batch_size):
+                    f.write(chunk)
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(description, f, indent=2)
+    return description
+
+def find_export(directory, table_name):
+    """Returns the path and format of a table's file in an export directory."""
+    for fmt in FORMATS:
+        for compress in (False, True):
+            path = os.path.join(directory, file_name(table_name, fmt, compress))
+            if os.path.exists(path):
+                return path, fmt
+    raise ValueError(f"No export of {table_name} in {directory}")
+
+def open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+def check_columns(table, names):
+    unknown = [name for name in names if name not in table.columns]
+    if unknown:
+        raise ValueError(
+            f"{table.name} has no column {', '.join(unknown)}: the export is from a newer version, upgrade first"
+        )
+
+def text_parser(column):
+    """Returns the function reading a value of the column from its text, in NDJSON or CSV."""
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat
+    if python_type is date:
+        return date.fromisoformat
+    if python_type is bool:
+        return lambda value: value.lower() in ("1", "true")
+    return python_type
+
+def ndjson_batches(path, table, batch_size):
+    """Yields the rows of an NDJSON file as (column names, value lists), batch_size rows at a time."""
+    names = fields = None
+    with open_text(path) as f:
+        while lines := list(itertools.islice(f, batch_size)):
+            # One json.loads() for the batch takes half the time of one per line
+            rows = json.loads("[" + ",".join(line for line in lines if line.strip()) + "]")
+            if not rows:
+                continue
+            if names is None:
+                names, fields = list(rows[0]), rows[0].keys()
+                check_columns(table, names)
+                # JSON has numbers, strings and booleans, only dates are strings to parse
+                parsers = [
+                    (index, text_parser(table.columns[name])) for index, name in enumerate(names)
+                    if table.columns[name].type.python_type in (datetime, date)
+                ]
+            batch = []
+            for row in rows:
+                if row.keys() != fields:
+                    raise ValueError(f"{table.name}: every line needs the fields of the first ({', '.join(names)})")
+                values = [row[name] for name in names]
+                for index, parse in parsers:
+                    if values[index] is not None:
+                        values[index] = parse(values[index])
+                batch.append(values)
+            yield names, batch
+
+def csv_batches(path, table, batch_size):
+    """Yields the rows of a CSV file as (column names, value lists), batch_size rows at a time."""
+    with open_text(path) as f:
+        reader = csv.reader(f)
+        names = next(reader, None)
+        if names is None:
+            return
+        check_columns(table, names)
+        columns = [table.columns[name] for name in names]
+        parsers = [text_parser(column) for column in columns]
+        # An empty field is NULL, except in text columns that can't be
+        empty = ["" if column.type.python_type is str and not column.nullable else None for column in columns]
+        batch = []
+        for values in reader:
+            batch.append([
+                parse(value) if value != "" else default for parse, value, default in zip(parsers, values, empty)
+            ])
+            if len(batch) == batch_size:
+                yield names, batch
+                batch = []
+        if batch:
+            yield names, batch
+
+def parquet_batches(path, table, batch_size):
+    """Yields the row groups of a Parquet file as (column names, value lists), batch_size rows at a time."""
+    import pyarrow.parquet
+
+    parquet = pyarrow.parquet.ParquetFile(path)
+    names = parquet.schema_arrow.names
+    check_columns(table, names)
+    for batch in parquet.iter_batches(batch_size=batch_size):
+        yield names, [list(values) for values in zip(*(column.to_pylist() for column in batch.columns))]
+
+READERS = {"ndjson": ndjson_batches, "csv": csv_batches, "parquet": parquet_batches}
+
+def drop_indexes(connection, table):
+    """Drops the secondary indexes and the search index of a table, rebuilt once it is loaded."""
+    for index in table.indexes:
+        connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    if table.name in FTS_TABLES:
+        if connection.dialect.name == "sqlite":
+            for trigger in ("ai", "ad", "au"):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {table.name}_fts_{trigger}"))
+        elif connection.dialect.name == "postgresql":
+            connection.execute(text(f"DROP INDEX IF EXISTS ix_{table.name}_search"))
+
+def create_indexes(connection, table):
+    for index in table.indexes:
+        index.create(connection)
+    if table.name in FTS_TABLES:
+        if connection.dialect.name == "sqlite":
+            # Recreates the triggers and rebuilds the index from the table in one pass
+            for statement in fts_ddl(table.name, FTS_TABLES[table.name]):
+                connection.execute(text(statement))
+        elif connection.dialect.name == "postgresql":
+            connection.execute(text(tsvector_ddl(table.name, FTS_TABLES[table.name])))
+
+def sqlite_processor(column, dialect):
+    """Returns the function converting a value of the column to what SQLAlchemy stores in SQLite, if any."""
+    processor = column.type.dialect_impl(dialect).bind_processor(dialect)
+    if processor and column.type.python_type is datetime:
+        probe = datetime(2000, 1, 2, 3, 4, 5, 6)
+        if processor(probe) == probe.isoformat(" ", "microseconds"):
+            # The same text, three times as fast as SQLAlchemy's format string
+            return lambda value: value and value.isoformat(" ", "microseconds")
+    return processor
+
+def load_rows(connection, table, batches):
+    """Bulk loads (column names, value lists) batches and returns the number of rows.
+
+    COPY on PostgreSQL. On SQLite one executemany INSERT per batch, straight on the driver: building
+    the parameters of millions of rows through SQLAlchemy would take longer than inserting them.
+    """
+    batches = iter(batches)
+    first = next(batches, None)
+    if first is None:
+        return 0
+    names, count = first[0], 0
+    batches = itertools.chain([first], batches)
+
+    if connection.dialect.name == "postgresql":
+        with connection.connection.driver_connection.cursor() as cursor:
+            with cursor.copy(f"COPY {table.name} ({', '.join(names)}) FROM STDIN") as copy:
+                for _, rows in batches:
+                    for values in rows:
+                        copy.write_row(values)
+                    count += len(rows)
+        # The ids were given explicitly, move the sequence past them
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), coalesce(max(id), 1), max(id) IS NOT NULL) "
+            f"FROM {table.name}"
+        ))
+        return count
+
+    processors = [
+        (index, processor) for index, name in enumerate(names)
+        if (processor := sqlite_processor(table.columns[name], connection.dialect))
+    ]
+    statement = f"INSERT INTO {table.name} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+    for _, rows in batches:
+        for values in rows:
+            for index, processor in processors:
+                values[index] = processor(values[index])
+        connection.exec_driver_sql(statement, list(map(tuple, rows)))
+        count += len(rows)
+    return count
+
+def import_database(directory, replace=False, batch_size=BATCH_SIZE):
+    """Loads an export into the current transaction and returns the rows imported per table.
+
+    The tables must be empty unless replace is set, which deletes their rows first. Indexes are
+    dropped during the load and created again afterwards, which is much faster than updating them
+    row by row. The usage summary and the rollups are left to the caller to rebuild.
+    """
+    expected = {}
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            expected = {name: table["rows"] for name, table in json.load(f)["tables"].items()}
+
+    sources = {}
+    for table in EXPORT_TABLES:
+        try:
+            path, fmt = find_export(directory, table.name)
+        except ValueError:
+            if table in OPTIONAL_TABLES and table.name not in expected:
+                continue
+            raise
+        check_format(fmt)
+        sources[table.name] = (path, fmt)
+
+    connection = db.session.connection()
+    begin_sqlite(connection)
+    filled = [
+        table.name for table in EXPORT_TABLES
+        if table not in SEEDED_TABLES and connection.execute(select(table.c.id).limit(1)).first() is not None
+    ]
+    if filled and not replace:
+        raise ValueError(f"Not empty: {', '.join(filled)} (replace their rows with --replace)")
+
+    for table in EXPORT_TABLES:
+        drop_indexes(connection, table)
+    # Children first
+    for table in DERIVED_TABLES + EXPORT_TABLES[::-1]:
+        if table in SEEDED_TABLES and table.name not in sources:
+            continue  # Kept for an export without sites
+        if replace or table in SEEDED_TABLES:
+            connection.execute(delete(table))
+
+    counts = {}
+    for table in EXPORT_TABLES:
+        if table.name not in sources:
+            continue
+        path, fmt = sources[table.name]
+        counts[table.name] = load_rows(connection, table, READERS[fmt](path, table, batch_size))
+        if table.name in expected and counts[table.name] != expected[table.name]:
+            raise ValueError(f"{table.name}: {counts[table.name]} rows read, the manifest lists {expected[table.name]}")
+
+    for table in EXPORT_TABLES:
+        create_indexes(connection, table)
+
+    # The rows went in on the connection, past the session's tracking of what changed
+    changed_tables(db.session).update(TABLES)
+    for name in FEED_TABLES:
+        record_reload(name)
+    return counts
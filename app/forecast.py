@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from app import app, db
+from app.models import LOCAL_TZ, FilamentRoll, PrintJob, PrintJobUsage, TempPrintJob, RollUsage
+from app.versions import data_versions
+
+# Tables the forecast is computed from, it is only recomputed when one of them changes (or the day does)
+FORECAST_TABLES = ("filament_roll", "print_job", "print_job_usage", "temp_print_job", "roll_usage")
+
+# A roll (or color) first used in the last few days is not given a rate from those days alone
+MIN_RATE_DAYS = 7
+
+# site id -> (key, forecast)
+_cache = {}
+
+def usage_rate(grams, first_used, now, window_days):
+    """Grams per day over the window, or since the first use when that falls inside it."""
+    if not grams:
+        return 0.0
+    days = window_days
+    if first_used:
+        days = min(days, max((now - first_used).total_seconds() / 86400, MIN_RATE_DAYS))
+    return grams / days
+
+def depletion(remaining, rate, now):
+    """Days until the remaining grams run out at the given rate, and that date."""
+    if remaining <= 0:
+        return 0.0, now.date()
+    if rate <= 0:
+        return None, None
+    days = remaining / rate
+    return days, (now + timedelta(days=days)).date()
+
+def likely_rolls(temp_jobs, rolls, site_id):
+    """Guesses the roll every unreviewed job of a site will be approved on.
+
+    The roll the same project was last printed on when still in use, otherwise the most recently used roll.
+    """
+    names = {job.project_name for job in temp_jobs}
+    last_printed = (
+        select(PrintJob.project_name, func.max(PrintJob.date).label("date"))
+        .where(PrintJob.site_id == site_id, PrintJob.project_name.in_(names))
+        .group_by(PrintJob.project_name)
+        .subquery()
+    )
+    last_roll = dict(db.session.execute(
+        select(PrintJob.project_name, PrintJob.filament_id)
+        .join(last_printed, (PrintJob.project_name == last_printed.c.project_name)
+              & (PrintJob.date == last_printed.c.date))
+        .where(PrintJob.site_id == site_id)
+        .order_by(PrintJob.id)
+    ).all()) if names else {}
+
+    latest = db.session.scalar(
+        select(RollUsage.roll_id)
+        .join(FilamentRoll, FilamentRoll.id == RollUsage.roll_id)
+        .where(FilamentRoll.site_id == site_id, FilamentRoll.in_use.is_(True), RollUsage.last_used.is_not(None))
+        .order_by(RollUsage.last_used.desc())
+        .limit(1)
+    )
+
+    guesses = {}
+    for job in temp_jobs:
+        roll_id = last_roll.get(job.project_name)
+        if roll_id not in rolls or not rolls[roll_id].in_use:
+            roll_id = latest
+        guesses[job.id] = roll_id
+    return guesses
+
+def build_forecast(site_id, now, window_days, lead_days):
+    """Fits the recent consumption rate of a site's rolls and maker/colors and projects when they run out.
+
+    Reads the usage of the window with one GROUP BY, the rest is a single pass over the rolls.
+    """
+    since = now - timedelta(days=window_days)
+    usage = {
+        roll_id: (grams, first_used)
+        for roll_id, grams, first_used in db.session.execute(
+            select(PrintJobUsage.roll_id, func.sum(PrintJobUsage.grams), func.min(PrintJob.date))
+            .join(PrintJob, PrintJob.id == PrintJobUsage.job_id)
+            .where(PrintJob.site_id == site_id, PrintJob.date >= since)
+            .group_by(PrintJobUsage.roll_id)
+        )
+    }
+    rolls = {roll.id: roll for roll in FilamentRoll.query.filter_by(site_id=site_id).order_by(FilamentRoll.id)}
+
+    roll_forecasts = []
+    colors = {}
+    for roll in rolls.values():
+        grams, first_used = usage.get(roll.id, (0.0, None))
+        rate = usage_rate(grams, first_used, now, window_days)
+        days_left, empty_on = depletion(roll.remaining_weight, rate, now)
+        roll_forecasts.append({
+            "id": roll.id,
+            "maker": roll.maker,
+            "color": roll.color,
+            "remaining_weight": round(roll.remaining_weight, 2),
+            "grams_per_day": round(rate, 2),
+            "days_left": round(days_left, 1) if days_left is not None else None,
+            "empty_on": empty_on.isoformat() if empty_on else None,
+        })
+
+        color = colors.setdefault((roll.maker, roll.color), {"rolls": 0, "remaining": 0.0, "grams": 0.0, "first": None})
+        color["rolls"] += 1
+        color["remaining"] += max(roll.remaining_weight, 0)
+        color["grams"] += grams
+        if first_used and (not color["first"] or first_used < color["first"]):
+            color["first"] = first_used
+
+    color_forecasts = []
+    for (maker, color_name), color in colors.items():
+        # Successive rolls of a color share its rate, so it is fitted over all of them
+        rate = usage_rate(color["grams"], color["first"], now, window_days)
+        days_left, empty_on = depletion(color["remaining"], rate, now)
+        color_forecasts.append({
+            "maker": maker,
+            "color": color_name,
+            "rolls": color["rolls"],
+            "remaining_weight": round(color["remaining"], 2),
+            "grams_per_day": round(rate, 2),
+            "days_left": round(days_left, 1) if days_left is not None else None,
+            "empty_on": empty_on.isoformat() if empty_on else None,
+            "reorder": days_left is not None and days_left <= lead_days,
+        })
+    # Soonest to run out first, unused colors last
+    color_forecasts.sort(key=lambda c: (c["days_left"] is None, c["days_left"] or 0, c["maker"], c["color"]))
+
+    # Unreviewed jobs are taken from their likely roll in date order, so several small jobs can add up
+    temp_jobs = TempPrintJob.query.filter_by(site_id=site_id).order_by(TempPrintJob.date, TempPrintJob.id).all()
+    guesses = likely_rolls(temp_jobs, rolls, site_id)
+    left = {roll_id: roll.remaining_weight for roll_id, roll in rolls.items()}
+    pending = []
+    for job in temp_jobs:
+        roll_id = guesses[job.id]
+        available = left.get(roll_id, 0.0)
+        if roll_id in left:
+            left[roll_id] -= job.weight_used
+        pending.append({
+            "temp_job_id": job.id,
+            "project_name": job.project_name,
+            "weight_used": job.weight_used,
+            "roll_id": roll_id,
+            "available": round(max(available, 0), 2),
+            "fits": roll_id is not None and job.weight_used <= available,
+        })
+
+    return {
+        "window_days": window_days,
+        "reorder_lead_days": lead_days,
+        "rolls": roll_forecasts,
+        "colors": color_forecasts,
+        "pending": pending,
+    }
+
+def current_forecast(site_id):
+    """A site's forecast for today, recomputed only once the data it reads has changed."""
+    now = datetime.now(LOCAL_TZ).replace(tzinfo=None)
+    window_days = app.config["FORECAST_WINDOW_DAYS"]
+    lead_days = app.config["FORECAST_REORDER_LEAD_DAYS"]
+    key = (tuple(sorted(data_versions(FORECAST_TABLES).items())), now.date(), window_days, lead_days)
+    cached = _cache.get(site_id)
+    if not cached or cached[0] != key:
+        cached = _cache[site_id] = (key, build_forecast(site_id, now, window_days, lead_days))
+    return cached[1]
@@ -0,0 +1,129 @@
+import json
+from datetime import datetime
+from flask import request, jsonify
+from sqlalchemy import insert
+from app import app, db
+from app.models import TempPrintJob
+from app.changes import record_changes
+from app.sites import ApiKeyError, uploading_printer
+
+MAX_BULK_JOBS = 10000
+
+def parse_temp_job(data):
+    """Validates one job sent by a slicer and returns the row to insert.
+
+    Raises ValueError describing the problem when the job is invalid.
+    """
+    if not isinstance(data, dict) or "project_name" not in data or "weight_used" not in data:
+        raise ValueError("Invalid data")
+
+    project_name = data["project_name"]
+    if not isinstance(project_name, str) or not project_name.strip():
+        raise ValueError("project_name must be a non-empty string")
+
+    weight_used = data["weight_used"]
+    if isinstance(weight_used, bool):
+        raise ValueError("weight_used must be a number")
+    try:
+        weight_used = float(weight_used)
+    except (TypeError, ValueError):
+        raise ValueError("weight_used must be a number")
+
+    # Handle missing or incorrect date format
+    date_str = data.get("date", "")
+    try:
+        job_date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M") if date_str else datetime.now()
+    except (TypeError, ValueError):
+        job_date = datetime.now()  # Use current time if format is invalid
+
+    # Kept to suggest a roll per tool when the job is approved
+    weight_per_tool = data.get("weight_per_tool")
+    if weight_per_tool is not None:
+        if (not isinstance(weight_per_tool, list) or not weight_per_tool
+                or not all(isinstance(w, (int, float)) and not isinstance(w, bool) for w in weight_per_tool)):
+            raise ValueError("weight_per_tool must be a list of numbers")
+        weight_per_tool = ",".join(str(float(w)) for w in weight_per_tool) if len(weight_per_tool) > 1 else None
+
+    return {"project_name": project_name, "weight_used": weight_used, "weight_per_tool": weight_per_tool,
+            "date": job_date}
+
+def read_bulk_jobs():
+    """Reads the jobs of a bulk upload, either a JSON array or NDJSON (one object per line).
+
+    Returns a list of (index, job) pairs where job is None for lines that aren't valid JSON.
+    """
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        jobs = []
+        lines = (line for line in request.get_data(as_text=True).splitlines() if line.strip())
+        for index, line in enumerate(lines):
+            try:
+                jobs.append((index, json.loads(line)))
+            except ValueError:
+                jobs.append((index, None))
+        return jobs
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get("jobs")
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array or NDJSON of jobs")
+    return list(enumerate(data))
+
+@app.errorhandler(ApiKeyError)
+def api_key_error(error):
+    return jsonify({"error": str(error)}), 401
+
+@app.route('/add_temp_job', methods=['POST'])
+def add_temp_job():
+    # Jobs are queued at the site of the printer they were uploaded with
+    printer_id, site_id = uploading_printer()
+    data = request.get_json()
+
+    try:
+        row = parse_temp_job(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    row.update(site_id=site_id, printer_id=printer_id)
+
+    try:
+        # A plain INSERT rather than an ORM object, which would only be flushed and thrown away
+        job_id = db.session.scalar(insert(TempPrintJob).values(**row).returning(TempPrintJob.id))
+        record_changes("temp_print_job", [job_id])
+        db.session.commit()
+
+        return jsonify({"message": "Temporary job added successfully"}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/add_temp_jobs', methods=['POST'])
+def add_temp_jobs():
+    printer_id, site_id = uploading_printer()
+    try:
+        jobs = read_bulk_jobs()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if len(jobs) > MAX_BULK_JOBS:
+        return jsonify({"error": f"At most {MAX_BULK_JOBS} jobs per request"}), 413
+
+    rows, errors = [], []
+    for index, data in jobs:
+        try:
+            rows.append(dict(parse_temp_job(data), site_id=site_id, printer_id=printer_id))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+
+    if rows:
+        try:
+            # One executemany INSERT and one commit for the whole batch
+            ids = db.session.scalars(insert(TempPrintJob).returning(TempPrintJob.id), rows).all()
+            record_changes("temp_print_job", ids)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 500
+
+    status = 200 if rows or not errors else 400
+    return jsonify({"inserted": len(rows), "errors": errors}), status
@@ -0,0 +1,131 @@
+import os
+import time
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from app import app, db
+
+# Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR (set by gunicorn.conf.py)
+# and /metrics adds them up, so any worker can answer a scrape with the numbers of all of them
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    "filatrack_http_request_duration_seconds", "Time spent handling a request",
+    ["method", "endpoint", "status"], buckets=LATENCY_BUCKETS
+)
+REQUEST_QUEUE = Histogram(
+    "filatrack_http_request_queue_seconds",
+    "Time from the proxy accepting a request (X-Request-Start) until a worker picked it up",
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "filatrack_http_request_sql_statements", "SQL statements executed per request",
+    ["endpoint"], buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "filatrack_http_request_sql_seconds", "Time spent in SQL statements per request",
+    ["endpoint"], buckets=LATENCY_BUCKETS
+)
+TEMPLATE_RENDER = Histogram(
+    "filatrack_template_render_seconds", "Time spent rendering a template",
+    ["template"], buckets=LATENCY_BUCKETS
+)
+SLOW_QUERIES = Counter(
+    "filatrack_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS", ["endpoint"]
+)
+
+def endpoint_label():
+    # The route's endpoint rather than the path, so ids in URLs don't create a series each
+    return (request.endpoint if has_request_context() else None) or "none"
+
+def queue_seconds(header, now):
+    """Seconds since the X-Request-Start timestamp ("t=" and seconds, milliseconds or microseconds)."""
+    try:
+        start = float(header.removeprefix("t="))
+    except ValueError:
+        return None
+    while start > now * 100:
+        start /= 1000
+    queued = now - start
+    return queued if 0 <= queued < 3600 else None
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+    g.template_seconds = 0.0
+    if header := request.headers.get("X-Request-Start"):
+        queued = queue_seconds(header, time.time())
+        if queued is not None:
+            REQUEST_QUEUE.observe(queued)
+
+@app.after_request
+def record_request(response):
+    if "request_started" not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = endpoint_label()
+    REQUEST_LATENCY.labels(request.method, endpoint, str(response.status_code)).observe(elapsed)
+    REQUEST_SQL_STATEMENTS.labels(endpoint).observe(g.sql_statements)
+    REQUEST_SQL_SECONDS.labels(endpoint).observe(g.sql_seconds)
+    # Lets the browser's developer tools show where the time of a slow page went
+    response.headers["Server-Timing"] = ", ".join([
+        f'sql;dur={g.sql_seconds * 1000:.1f};desc="{g.sql_statements} statements"',
+        f"render;dur={g.template_seconds * 1000:.1f}",
+        f"total;dur={elapsed * 1000:.1f}",
+    ])
+    return response
+
+@before_render_template.connect_via(app)
+def start_render(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def record_render(sender, template, context, **extra):
+    if "render_started" not in g:
+        return
+    elapsed = time.perf_counter() - g.pop("render_started")
+    TEMPLATE_RENDER.labels(template.name or "string").observe(elapsed)
+    if "template_seconds" in g:
+        g.template_seconds += elapsed
+
+def instrument_engine(engine):
+    """Counts and times every statement of the engine, and logs the slow ones."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["statement_started"].pop()
+        if has_request_context() and "sql_statements" in g:
+            g.sql_statements += 1
+            g.sql_seconds += elapsed
+
+        if elapsed * 1000 >= app.config["SLOW_QUERY_MS"]:
+            SLOW_QUERIES.labels(endpoint_label()).inc()
+            where = f" in {request.method} {request.path}" if has_request_context() else ""
+            app.logger.warning("Slow query (%.0f ms%s): %s", elapsed * 1000, where, " ".join(statement.split()))
+
+    @event.listens_for(engine, "handle_error")
+    def forget_statement(context):
+        # A failed statement never reaches after_cursor_execute
+        if context.connection is not None and context.connection.info.get("statement_started"):
+            context.connection.info["statement_started"].pop()
+
+with app.app_context():
+    instrument_engine(db.engine)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics of every worker."""
+    registry = REGISTRY
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return app.response_class(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
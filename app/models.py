@@ -4,6 +4,23 @@ import pytz
 
 LOCAL_TZ = pytz.timezone("Europe/Berlin")
 
+# Created with the database, it holds everything not assigned to another site
+DEFAULT_SITE_ID = 1
+
+class Site(db.Model):
+    """A location (e.g. a printer room) with its own rolls, print history and unreviewed jobs."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+
+class Printer(db.Model):
+    """A printer uploading jobs to its site, authenticated by its API key (X-API-Key)."""
+    id = db.Column(db.Integer, primary_key=True)
+    site_id = db.Column(db.Integer, db.ForeignKey('site.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    # SHA-256 of the key, which is only shown when the printer is added
+    api_key_hash = db.Column(db.String(64), nullable=False, unique=True)
+    site = db.relationship('Site')
+
 class FilamentRoll(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     maker = db.Column(db.String(100), nullable=False)
@@ -11,6 +28,8 @@ class FilamentRoll(db.Model):
     total_weight = db.Column(db.Float, nullable=False)
     remaining_weight = db.Column(db.Float, nullable=False)
     in_use = db.Column(db.Boolean, default=True)
+    site_id = db.Column(db.Integer, db.ForeignKey('site.id', name='fk_filament_roll_site_id_site'), nullable=False,
+                        default=DEFAULT_SITE_ID, server_default=str(DEFAULT_SITE_ID), index=True)
 
 class PrintJob(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -18,16 +37,107 @@ class PrintJob(db.Model):
     weight_used = db.Column(db.Float, nullable=False)
     project_name = db.Column(db.String(255), nullable=False)
     date = db.Column(db.DateTime, default=lambda: datetime.now(LOCAL_TZ))
+    site_id = db.Column(db.Integer, db.ForeignKey('site.id', name='fk_print_job_site_id_site'), nullable=False,
+                        default=DEFAULT_SITE_ID, server_default=str(DEFAULT_SITE_ID))
+    printer_id = db.Column(db.Integer, db.ForeignKey('printer.id', ondelete='SET NULL',
+                                                     name='fk_print_job_printer_id_printer'))
     filament = db.relationship('FilamentRoll', backref='prints')
+    # filament_id is the roll the job used the most of and weight_used the total,
+    # allocations has the grams taken from every roll
+    allocations = db.relationship('PrintJobUsage', backref='job', cascade='all, delete-orphan',
+                                  order_by='PrintJobUsage.id')
 
+    __table_args__ = (
+        # Keyset pagination of the print history walks (date, id) backwards, within a site
+        db.Index('ix_print_job_site_id_date_id', 'site_id', 'date', 'id'),
+        db.Index('ix_print_job_filament_id_date', 'filament_id', 'date'),
+    )
 
     def save(self):
-        self.filament.remaining_weight -= self.weight_used
+        from app.usage import record_usage
+
         db.session.add(self)
+        record_usage(self)
         db.session.commit()
 
+class PrintJobUsage(db.Model):
+    """The filament a print job took from one roll, multi-material jobs have a row per roll."""
+    __tablename__ = 'print_job_usage'
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('print_job.id', ondelete='CASCADE'), nullable=False, index=True)
+    roll_id = db.Column(db.Integer, db.ForeignKey('filament_roll.id'), nullable=False, index=True)
+    grams = db.Column(db.Float, nullable=False)
+    roll = db.relationship('FilamentRoll')
+
 class TempPrintJob(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     project_name = db.Column(db.String(255), nullable=False)
     weight_used = db.Column(db.Float, nullable=False)
+    # Grams of every tool of a multi-material job, as sent by the slicer (e.g. "12.3,4.5")
+    weight_per_tool = db.Column(db.Text)
     date = db.Column(db.DateTime, default=lambda: datetime.now(LOCAL_TZ))
+    # The site and printer of the API key the job was uploaded with
+    site_id = db.Column(db.Integer, db.ForeignKey('site.id', name='fk_temp_print_job_site_id_site'), nullable=False,
+                        default=DEFAULT_SITE_ID, server_default=str(DEFAULT_SITE_ID))
+    printer_id = db.Column(db.Integer, db.ForeignKey('printer.id', ondelete='SET NULL',
+                                                     name='fk_temp_print_job_printer_id_printer'))
+
+    __table_args__ = (
+        db.Index('ix_temp_print_job_site_id_date', 'site_id', 'date'),
+    )
+
+class RollUsage(db.Model):
+    """Per-roll usage totals, updated in the same transaction as the print jobs they summarize."""
+    roll_id = db.Column(db.Integer, db.ForeignKey('filament_roll.id'), primary_key=True)
+    grams_used = db.Column(db.Float, nullable=False, default=0)
+    job_count = db.Column(db.Integer, nullable=False, default=0)
+    last_used = db.Column(db.DateTime)
+
+class MonthlyRollUsage(db.Model):
+    """Grams taken from a roll per month, the rollup behind the monthly statistics by roll, maker and color.
+
+    Kept in step with the print history in the same transaction, like RollUsage. job_count counts
+    the jobs' allocations and only serves to drop rows left empty.
+    """
+    __tablename__ = 'monthly_roll_usage'
+    month = db.Column(db.Date, primary_key=True)  # First day of the month
+    roll_id = db.Column(db.Integer, db.ForeignKey('filament_roll.id'), primary_key=True, index=True)
+    grams = db.Column(db.Float, nullable=False, default=0)
+    job_count = db.Column(db.Integer, nullable=False, default=0)
+
+class MonthlyProjectUsage(db.Model):
+    """Grams used per project, site and month, the rollup behind the monthly statistics by project."""
+    __tablename__ = 'monthly_project_usage'
+    site_id = db.Column(db.Integer, db.ForeignKey('site.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    project_name = db.Column(db.String(255), primary_key=True)
+    grams = db.Column(db.Float, nullable=False, default=0)
+    job_count = db.Column(db.Integer, nullable=False, default=0)
+
+class ConsumptionEntry(db.Model):
+    """Append-only record of every change to a roll's remaining weight."""
+    __tablename__ = 'consumption_ledger'
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign keys: entries outlive the rolls and jobs they refer to
+    roll_id = db.Column(db.Integer, nullable=False, index=True)
+    job_id = db.Column(db.Integer)
+    grams = db.Column(db.Float, nullable=False)  # Positive when filament is consumed
+    reason = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(LOCAL_TZ))
+
+class ChangeLog(db.Model):
+    """Rows of the dashboard's tables changed by every commit, streamed to the browsers (see app/events.py)."""
+    __tablename__ = 'change_log'
+    # AUTOINCREMENT, so SQLite never hands out an id again once old entries are pruned
+    __table_args__ = {'sqlite_autoincrement': True}
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(64), nullable=False)
+    row_id = db.Column(db.Integer)  # None when the whole table changed (bulk statements)
+    action = db.Column(db.String(10), nullable=False)  # upsert, delete or reload
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(LOCAL_TZ))
+
+class DataVersion(db.Model):
+    """Change counter of a table, bumped by every commit that writes to it (see app/versions.py)."""
+    __tablename__ = 'data_version'
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -1,14 +1,158 @@
 from datetime import datetime
 from flask import render_template, request, redirect, url_for, jsonify
+from sqlalchemy import delete, select, tuple_, union_all
+from sqlalchemy.orm import joinedload
 from app import app, db
-from app.models import FilamentRoll, PrintJob, TempPrintJob
+from app.models import FilamentRoll, PrintJob, PrintJobUsage, Site, TempPrintJob
+from app.cache import versioned
+from app.changes import record_changes, latest_change_id
+from app.search import search
+from app.sites import current_site_id
+from app.usage import record_usage, record_usage_bulk, record_adjustment, set_allocations, forget_roll
+
+PRINT_JOBS_PAGE_SIZE = 50
+
+def encode_cursor(date, job_id):
+    # Jobs without a date have an empty date in their cursor
+    return f"{date.isoformat() if date else ''}|{job_id}"
+
+def decode_cursor(cursor):
+    date_str, job_id = cursor.rsplit("|", 1)
+    return datetime.fromisoformat(date_str) if date_str else None, int(job_id)
+
+def page_job_ids(query, after, limit):
+    """Returns the ids of the jobs a SELECT of print job ids has after (date, id), at most limit + 1.
+
+    Keyset pagination: seeks past the last (date, id) seen instead of using OFFSET. Jobs without
+    a date come after the dated ones, so each kind is read with a seek of its own, an OR of both
+    would scan the site's whole history.
+    """
+    last_date, last_id = after or (None, None)
+    seeks = []
+    if not after or last_date:
+        dated = query.where(PrintJob.date.isnot(None))
+        if after:
+            dated = dated.where(tuple_(PrintJob.date, PrintJob.id) < (last_date, last_id))
+        seeks.append(dated.order_by(PrintJob.date.desc(), PrintJob.id.desc()).limit(limit + 1))
+    undated = query.where(PrintJob.date.is_(None))
+    if after and not last_date:
+        undated = undated.where(PrintJob.id < last_id)
+    seeks.append(undated.order_by(PrintJob.id.desc()).limit(limit + 1))
+    return union_all(*(select(seek.subquery().c.id) for seek in seeks))
+
+def print_job_page(site_id, cursor=None, limit=PRINT_JOBS_PAGE_SIZE):
+    """Returns one page of a site's print history, newest first, and the cursor of the next page."""
+    # Load each job's rolls in the same SELECT so rendering the rows doesn't lazy load per job
+    after = decode_cursor(cursor) if cursor else None
+    jobs = PrintJob.query.options(
+        joinedload(PrintJob.filament),
+        joinedload(PrintJob.allocations).joinedload(PrintJobUsage.roll)
+    ).filter(
+        PrintJob.id.in_(page_job_ids(select(PrintJob.id).where(PrintJob.site_id == site_id), after, limit))
+    ).order_by(PrintJob.date.desc().nulls_last(), PrintJob.id.desc()).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(jobs[limit - 1].date, jobs[limit - 1].id) if len(jobs) > limit else None
+    return jobs[:limit], next_cursor
+
+def form_allocations(form, site_id):
+    """Reads the rolls a print job of the site used from a form, as (roll_id, grams) pairs.
+
+    Multi-material jobs repeat the filament_id and weight_used fields once for every roll.
+    Returns None if one of the rolls isn't the site's, so no job charges another site's roll.
+    """
+    allocations = list(zip(
+        (int(roll_id) for roll_id in form.getlist('filament_id')),
+        (float(grams) for grams in form.getlist('weight_used'))
+    ))
+    roll_ids = {roll_id for roll_id, _ in allocations}
+    found = db.session.scalars(
+        select(FilamentRoll.id).where(FilamentRoll.id.in_(roll_ids), FilamentRoll.site_id == site_id)
+    ).all()
+    return allocations if len(found) == len(roll_ids) else None
 
 @app.route('/')
+@versioned("filament_roll", "print_job", "print_job_usage", "temp_print_job", "site")
 def index():
-    rolls = FilamentRoll.query.all()
-    print_jobs = PrintJob.query.order_by(PrintJob.date.desc()).all()
-    temp_jobs = TempPrintJob.query.order_by(TempPrintJob.date.desc()).all()
-    return render_template('index.html', rolls=rolls, print_jobs=print_jobs, datetime=datetime,  temp_jobs=temp_jobs)
+    site_id = current_site_id()
+    # Read before the rows, so the page's change feed starts no later than what it shows
+    change_id = latest_change_id()
+    rolls = FilamentRoll.query.filter_by(site_id=site_id).order_by(FilamentRoll.id).all()
+    print_jobs, next_cursor = print_job_page(site_id)
+    temp_jobs = TempPrintJob.query.filter_by(site_id=site_id).order_by(TempPrintJob.date.desc()).all()
+    sites = Site.query.order_by(Site.id).all()
+    return render_template('index.html', rolls=rolls, print_jobs=print_jobs, next_cursor=next_cursor,
+                           temp_jobs=temp_jobs, change_id=change_id, sites=sites, site_id=site_id)
+
+@app.route('/print_jobs')
+@versioned("filament_roll", "print_job", "print_job_usage")
+def print_jobs():
+    cursor = request.args.get('cursor')
+    try:
+        jobs, next_cursor = print_job_page(current_site_id(), cursor)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    return jsonify({
+        "rows": render_template('_print_job_rows.html', print_jobs=jobs),
+        "next_cursor": next_cursor
+    })
+
+@app.route('/search')
+def search_view():
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    return jsonify(query=query, **search(query, current_site_id(), limit))
+
+# The edit, duplicate and approve dialogs are shared by all rows and filled from these when opened
+
+@app.route('/roll/<int:roll_id>')
+def roll_data(roll_id):
+    roll = db.session.get(FilamentRoll, roll_id)
+    if not roll or roll.site_id != current_site_id():
+        return jsonify({"error": "Filament roll not found"}), 404
+    return jsonify({
+        "maker": roll.maker,
+        "color": roll.color,
+        "total_weight": roll.total_weight,
+        "remaining_weight": roll.remaining_weight,
+        "in_use": roll.in_use
+    })
+
+@app.route('/print/<int:print_id>')
+def print_data(print_id):
+    print_job = db.session.get(PrintJob, print_id)
+    if not print_job or print_job.site_id != current_site_id():
+        return jsonify({"error": "Print job not found"}), 404
+
+    # filament_id and weight_used hold the main roll, the other rolls are listed separately
+    extra = [
+        {"filament_id": allocation.roll_id, "weight_used": allocation.grams}
+        for allocation in print_job.allocations if allocation.roll_id != print_job.filament_id
+    ]
+    return jsonify({
+        "project_name": print_job.project_name,
+        "date": print_job.date.strftime("%Y-%m-%dT%H:%M") if print_job.date else "",
+        "filament_id": print_job.filament_id,
+        "weight_used": print_job.weight_used - sum(allocation["weight_used"] for allocation in extra),
+        "extra_rolls": extra
+    })
+
+@app.route('/temp_job/<int:job_id>')
+def temp_job_data(job_id):
+    job = db.session.get(TempPrintJob, job_id)
+    if not job or job.site_id != current_site_id():
+        return jsonify({"error": "Unreviewed print job not found"}), 404
+    values = {
+        "project_name": job.project_name,
+        "date": job.date.strftime("%Y-%m-%dT%H:%M") if job.date else "",
+        "weight_used": job.weight_used
+    }
+    if job.weight_per_tool:
+        # A roll row per tool with its grams, the rolls are left to pick
+        weights = [float(w) for w in job.weight_per_tool.split(",")]
+        values["weight_used"] = weights[0]
+        values["extra_rolls"] = [{"weight_used": w} for w in weights[1:]]
+    return jsonify(values)
 
 @app.route('/add_roll', methods=['POST'])
 def add_roll():
@@ -17,7 +161,8 @@ def add_roll():
     total_weight = float(request.form['total_weight'])
     remaining_weight = float(request.form['remaining_weight'])
 
-    roll = FilamentRoll(maker=maker, color=color, total_weight=total_weight, remaining_weight=remaining_weight, in_use=True)
+    roll = FilamentRoll(maker=maker, color=color, total_weight=total_weight, remaining_weight=remaining_weight, in_use=True,
+                        site_id=current_site_id())
     db.session.add(roll)
     db.session.commit()
     
@@ -25,26 +170,25 @@ def add_roll():
 
 @app.route('/add_print', methods=['POST'])
 def add_print():
-    filament_id = int(request.form['filament_id'])
-    weight_used = float(request.form['weight_used'])
     project_name = request.form['project_name']
     
     # Parse date from input, fallback to current time
     date_str = request.form['date']
     date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M") if date_str else datetime.now()
 
+    allocations = form_allocations(request.form, current_site_id())
+    if allocations is None:
+        return "Error: Filament roll not found.", 400
+
     print_job = PrintJob(
-        filament_id=filament_id,
-        weight_used=weight_used,
         project_name=project_name,
-        date=date  # Ensure local time is stored
+        date=date,  # Ensure local time is stored
+        site_id=current_site_id()
     )
-
-    filament = db.session.get(FilamentRoll, filament_id)
-    if filament:
-        filament.remaining_weight -= weight_used
+    set_allocations(print_job, allocations)
 
     db.session.add(print_job)
+    record_usage(print_job)
     db.session.commit()
     
     return redirect(url_for('index'))
@@ -52,9 +196,11 @@ def add_print():
 @app.route('/delete_roll/<int:roll_id>', methods=['POST'])
 def delete_roll(roll_id):
     roll = db.session.get(FilamentRoll, roll_id)
+    if not roll or roll.site_id != current_site_id():
+        return "Error: Filament roll not found.", 400
     
-    # Ensure all associated print jobs are deleted first
-    PrintJob.query.filter_by(filament_id=roll.id).delete()
+    # Ensure all associated print jobs and their usage summary are deleted first
+    forget_roll(roll.id)
 
     db.session.delete(roll)
     db.session.commit()
@@ -64,11 +210,11 @@ def delete_roll(roll_id):
 @app.route('/delete_print/<int:print_id>', methods=['POST'])
 def delete_print(print_id):
     print_job = db.session.get(PrintJob, print_id)
+    if not print_job or print_job.site_id != current_site_id():
+        return "Error: Print job not found.", 400
 
     # Restore the filament roll’s remaining weight
-    filament = db.session.get(FilamentRoll, print_job.filament_id)
-    if filament:
-        filament.remaining_weight += print_job.weight_used
+    record_usage(print_job, -1)
 
     db.session.delete(print_job)
     db.session.commit()
@@ -78,11 +224,13 @@ def delete_print(print_id):
 @app.route('/edit_roll/<int:roll_id>', methods=['POST'])
 def edit_roll(roll_id):
     roll = db.session.get(FilamentRoll, roll_id)
+    if not roll or roll.site_id != current_site_id():
+        return "Error: Filament roll not found.", 400
 
     roll.maker = request.form['maker']
     roll.color = request.form['color']
     roll.total_weight = float(request.form['total_weight'])
-    roll.remaining_weight = float(request.form['remaining_weight'])
+    record_adjustment(roll, float(request.form['remaining_weight']))
     roll.in_use = 'in_use' in request.form  # Checkbox handling
 
     db.session.commit()
@@ -91,22 +239,23 @@ def edit_roll(roll_id):
 @app.route('/edit_print/<int:print_id>', methods=['POST'])
 def edit_print(print_id):
     print_job = db.session.get(PrintJob, print_id)
-    filament = db.session.get(FilamentRoll, print_job.filament_id)
+    if not print_job or print_job.site_id != current_site_id():
+        return "Error: Print job not found.", 400
+    allocations = form_allocations(request.form, print_job.site_id)
+    if allocations is None:
+        return "Error: Filament roll not found.", 400
 
-    if filament:
-        filament.remaining_weight += print_job.weight_used
+    # Give the old weight back before applying the new values
+    record_usage(print_job, -1)
 
     print_job.project_name = request.form['project_name']
-    print_job.weight_used = float(request.form['weight_used'])
-    print_job.filament_id = int(request.form['filament_id'])
+    set_allocations(print_job, allocations)
 
     # Parse new date from input
     date_str = request.form['date']
     print_job.date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M") if date_str else datetime.now()
 
-    new_filament = db.session.get(FilamentRoll, print_job.filament_id)
-    if new_filament:
-        new_filament.remaining_weight -= print_job.weight_used
+    record_usage(print_job)
 
     db.session.commit()
     return redirect(url_for('index'))
@@ -114,7 +263,7 @@ def edit_print(print_id):
 @app.route('/duplicate_roll/<int:roll_id>', methods=['POST'])
 def duplicate_roll(roll_id):
     roll = db.session.get(FilamentRoll, roll_id)
-    if not roll:
+    if not roll or roll.site_id != current_site_id():
         return "Error: Filament roll not found.", 400
 
     # Capture new values from the form
@@ -130,7 +279,8 @@ def duplicate_roll(roll_id):
         color=new_color,
         total_weight=new_total_weight,
         remaining_weight=new_remaining_weight,
-        in_use=new_in_use
+        in_use=new_in_use,
+        site_id=roll.site_id
     )
     db.session.add(new_roll)
     db.session.commit()
@@ -139,68 +289,39 @@ def duplicate_roll(roll_id):
 
 @app.route('/duplicate_print/<int:print_id>', methods=['POST'])
 def duplicate_print(print_id):
-    print = db.session.get(FilamentRoll, print_id)
-    if not print:
-        return "Error: Filament roll not found.", 400
+    print_job = db.session.get(PrintJob, print_id)
+    if not print_job or print_job.site_id != current_site_id():
+        return "Error: Print job not found.", 400
     
+    allocations = form_allocations(request.form, print_job.site_id)
+    if allocations is None:
+        return "Error: Filament roll not found.", 400
+
     new_project_name = request.form['project_name']
-    new_weight_used = float(request.form['weight_used'])
-    new_filament_id = int(request.form['filament_id'])
 
     # Parse new date or use current time
     date_str = request.form['date']
     new_date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M") if date_str else datetime.now()
 
     new_print_job = PrintJob(
-        filament_id=new_filament_id,
-        weight_used=new_weight_used,
         project_name=new_project_name,
-        date=new_date
+        date=new_date,
+        site_id=print_job.site_id,
+        printer_id=print_job.printer_id
     )
-
-    new_filament = db.session.get(FilamentRoll, new_filament_id)
-    if new_filament:
-        new_filament.remaining_weight -= new_weight_used
+    set_allocations(new_print_job, allocations)
 
     db.session.add(new_print_job)
+    record_usage(new_print_job)
     db.session.commit()
 
     return redirect(url_for('index'))
 
-@app.route('/add_temp_job', methods=['POST'])
-def add_temp_job():
-    data = request.get_json()
-
-    # Validate incoming data
-    if not data or "project_name" not in data or "weight_used" not in data:
-        return jsonify({"error": "Invalid data"}), 400
-
-    try:
-        # Handle missing or incorrect date format
-        date_str = data.get("date", "")
-        try:
-            job_date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M") if date_str else datetime.now()
-        except ValueError:
-            job_date = datetime.now()  # Use current time if format is invalid
-
-        # Create the temporary job
-        temp_job = TempPrintJob(
-            project_name=data["project_name"],
-            weight_used=data["weight_used"],
-            date=job_date
-        )
-
-        db.session.add(temp_job)
-        db.session.commit()
-
-        return jsonify({"message": "Temporary job added successfully"}), 200
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
 @app.route('/delete_temp_job/<int:job_id>', methods=['POST'])
 def delete_temp_job(job_id):
     job = db.session.get(TempPrintJob, job_id)
+    if not job or job.site_id != current_site_id():
+        return "Error: Unreviewed print job not found.", 400
     db.session.delete(job)
     db.session.commit()
     return redirect(url_for('index'))
@@ -208,12 +329,15 @@ def delete_temp_job(job_id):
 @app.route('/approve_temp_job/<int:job_id>', methods=['POST'])
 def approve_temp_job(job_id):
     job = db.session.get(TempPrintJob, job_id)
+    if not job or job.site_id != current_site_id():
+        return "Error: Unreviewed print job not found.", 400
+    allocations = form_allocations(request.form, job.site_id)
+    if allocations is None:
+        return "Error: Filament roll not found.", 400
 
     # Get form data
     project_name = request.form.get("project_name")
     date = request.form.get("date")
-    weight_used = request.form.get("weight_used")
-    filament_id = request.form.get("filament_id")
 
     # Convert date from string to datetime
     try:
@@ -221,16 +345,133 @@ def approve_temp_job(job_id):
     except ValueError:
         job_date = datetime.now()  # Default to current time if invalid
 
-    # Move job to PrintJob table
+    # Move job to PrintJob table, it stays with the site and printer it was uploaded from
     new_print = PrintJob(
         project_name=project_name,
         date=job_date,
-        weight_used=weight_used,
-        filament_id=filament_id
+        site_id=job.site_id,
+        printer_id=job.printer_id
     )
+    set_allocations(new_print, allocations)
 
     db.session.add(new_print)
+    record_usage(new_print)
     db.session.delete(job)  # Remove from temp jobs
     db.session.commit()
 
     return redirect(url_for('index'))
+
+def item_allocations(item):
+    """Returns the allocations of a review item, a single one unless it lists several rolls."""
+    allocations = item.get("allocations")
+    if allocations is None:
+        allocations = [{key: item[key] for key in ("filament_id", "weight_used") if key in item}]
+    if not isinstance(allocations, list) or not all(isinstance(a, dict) for a in allocations):
+        return []
+    return allocations
+
+def is_id(value):
+    # bool is an int too, but True isn't a row id
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def valid_item(item):
+    """Whether a review item is an object whose job and roll ids are ids, so they can be looked up."""
+    return (
+        isinstance(item, dict) and is_id(item.get("temp_job_id"))
+        and all(is_id(allocation.get("filament_id")) for allocation in item_allocations(item))
+    )
+
+@app.route('/review_temp_jobs', methods=['POST'])
+def review_temp_jobs():
+    """Approves and rejects many unreviewed jobs in one transaction.
+
+    Expects {"approve": [{"temp_job_id", "filament_id", and optional "project_name",
+    "weight_used", "date" overrides}, ...], "reject": [temp_job_id, ...]}. Multi-material
+    jobs give "allocations": [{"filament_id", "weight_used"}, ...] instead of "filament_id".
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid data"}), 400
+    approvals = data.get("approve") or []
+    rejections = data.get("reject") or []
+    if not isinstance(approvals, list) or not isinstance(rejections, list):
+        return jsonify({"error": "approve and reject must be lists"}), 400
+    if not all(is_id(job_id) for job_id in rejections):
+        return jsonify({"error": "reject must be a list of unreviewed job ids"}), 400
+
+    # Load every referenced temp job and roll with one query each, of the site being reviewed only
+    site_id = current_site_id()
+    temp_ids = [item["temp_job_id"] for item in approvals if valid_item(item)] + rejections
+    temp_jobs = {
+        job.id: job
+        for job in TempPrintJob.query.filter(TempPrintJob.id.in_(temp_ids), TempPrintJob.site_id == site_id)
+    }
+    roll_ids = [
+        allocation["filament_id"]
+        for item in approvals if valid_item(item)
+        for allocation in item_allocations(item)
+    ]
+    rolls = {
+        roll.id for roll in FilamentRoll.query.filter(FilamentRoll.id.in_(roll_ids), FilamentRoll.site_id == site_id)
+        .with_entities(FilamentRoll.id)
+    }
+
+    errors, seen, new_prints, approved_ids, rejected_ids = [], set(), [], [], []
+    for index, item in enumerate(approvals):
+        if not valid_item(item):
+            errors.append({"index": index, "error": "Invalid data"})
+            continue
+        job = temp_jobs.get(item.get("temp_job_id"))
+        if not job or job.id in seen:
+            errors.append({"index": index, "error": "Unreviewed job not found"})
+            continue
+        allocations = item_allocations(item)
+        if not allocations or any(allocation.get("filament_id") not in rolls for allocation in allocations):
+            errors.append({"index": index, "error": "Filament roll not found"})
+            continue
+        try:
+            allocations = [
+                (allocation["filament_id"], float(allocation.get("weight_used", job.weight_used)))
+                for allocation in allocations
+            ]
+            date_str = item.get("date")
+            date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M") if date_str else job.date or datetime.now()
+        except (TypeError, ValueError):
+            errors.append({"index": index, "error": "Invalid weight_used or date"})
+            continue
+
+        seen.add(job.id)
+        approved_ids.append(job.id)
+        new_print = PrintJob(
+            project_name=item.get("project_name") or job.project_name,
+            date=date,
+            site_id=job.site_id,
+            printer_id=job.printer_id
+        )
+        set_allocations(new_print, allocations)
+        new_prints.append(new_print)
+
+    for job_id in rejections:
+        if job_id not in temp_jobs or job_id in seen:
+            errors.append({"reject": job_id, "error": "Unreviewed job not found"})
+            continue
+        seen.add(job_id)
+        rejected_ids.append(job_id)
+
+    db.session.add_all(new_prints)
+    db.session.flush()
+    record_usage_bulk(new_prints)
+    db.session.execute(delete(TempPrintJob).where(TempPrintJob.id.in_(approved_ids + rejected_ids)))
+    record_changes("temp_print_job", approved_ids + rejected_ids, "delete")
+    db.session.commit()
+
+    touched = {allocation.roll_id for job in new_prints for allocation in job.allocations}
+    return jsonify({
+        "approved": len(approved_ids),
+        "rejected": len(rejected_ids),
+        "errors": errors,
+        "rolls": [
+            {"id": roll.id, "remaining_weight": roll.remaining_weight}
+            for roll in FilamentRoll.query.filter(FilamentRoll.id.in_(touched))
+        ]
+    })
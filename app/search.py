@@ -0,0 +1,138 @@
+import re
+from sqlalchemy import event, text
+from app import db
+
+# Searchable tables and the columns indexed for each of them.
+# SQLite: every table gets an external content FTS5 table (the text lives only in the base table)
+# kept in sync by triggers. PostgreSQL: a GIN index over the tsvector of the columns.
+FTS_TABLES = {
+    "print_job": ["project_name"],
+    "temp_print_job": ["project_name"],
+    "filament_roll": ["maker", "color"],
+}
+
+def fts_ddl(table, columns):
+    """Returns the statements creating the FTS5 index and sync triggers of a table."""
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    old_values = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+def tsvector(columns, alias=None):
+    prefix = f"{alias}." if alias else ""
+    return "to_tsvector('simple', " + " || ' ' || ".join(prefix + c for c in columns) + ")"
+
+def tsvector_ddl(table, columns):
+    """Returns the statement creating the full text GIN index of a table on PostgreSQL."""
+    return f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING gin ({tsvector(columns)})"
+
+@event.listens_for(db.metadata, "after_create")
+def create_search_index(target, connection, **kw):
+    # Alembic creates these in production, this covers db.create_all() (e.g. the test suite)
+    for table, columns in FTS_TABLES.items():
+        if connection.dialect.name == "sqlite":
+            for statement in fts_ddl(table, columns):
+                connection.execute(text(statement))
+        elif connection.dialect.name == "postgresql":
+            connection.execute(text(tsvector_ddl(table, columns)))
+
+@event.listens_for(db.metadata, "before_drop")
+def drop_search_index(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    for table in FTS_TABLES:
+        connection.execute(text(f"DROP TABLE IF EXISTS {table}_fts"))
+
+def search_terms(query):
+    return re.findall(r"[^\W_]+", query)
+
+def fts_query(query):
+    """Converts free text into an FTS5 query matching every word as a prefix."""
+    return " ".join(f'"{term}"*' for term in search_terms(query))
+
+def ts_query(query):
+    """Converts free text into a PostgreSQL tsquery matching every word as a prefix."""
+    return " & ".join(f"{term}:*" for term in search_terms(query))
+
+SQLITE_QUERIES = {
+    "rolls": (
+        "SELECT r.id, r.maker, r.color, r.remaining_weight, r.in_use "
+        "FROM filament_roll_fts JOIN filament_roll r ON r.id = filament_roll_fts.rowid "
+        "WHERE filament_roll_fts MATCH :match AND r.site_id = :site ORDER BY filament_roll_fts.rank LIMIT :limit"
+    ),
+    "print_jobs": (
+        "SELECT j.id, j.project_name, j.date, j.weight_used, j.filament_id, r.maker, r.color "
+        "FROM print_job_fts JOIN print_job j ON j.id = print_job_fts.rowid "
+        "LEFT JOIN filament_roll r ON r.id = j.filament_id "
+        "WHERE print_job_fts MATCH :match AND j.site_id = :site ORDER BY print_job_fts.rank LIMIT :limit"
+    ),
+    "temp_jobs": (
+        "SELECT t.id, t.project_name, t.date, t.weight_used "
+        "FROM temp_print_job_fts JOIN temp_print_job t ON t.id = temp_print_job_fts.rowid "
+        "WHERE temp_print_job_fts MATCH :match AND t.site_id = :site ORDER BY temp_print_job_fts.rank LIMIT :limit"
+    ),
+}
+
+POSTGRESQL_QUERIES = {
+    "rolls": (
+        "SELECT r.id, r.maker, r.color, r.remaining_weight, r.in_use "
+        "FROM filament_roll r, to_tsquery('simple', :match) q "
+        f"WHERE {tsvector(FTS_TABLES['filament_roll'], 'r')} @@ q AND r.site_id = :site "
+        f"ORDER BY ts_rank({tsvector(FTS_TABLES['filament_roll'], 'r')}, q) DESC LIMIT :limit"
+    ),
+    "print_jobs": (
+        "SELECT j.id, j.project_name, j.date, j.weight_used, j.filament_id, r.maker, r.color "
+        "FROM print_job j LEFT JOIN filament_roll r ON r.id = j.filament_id, to_tsquery('simple', :match) q "
+        f"WHERE {tsvector(FTS_TABLES['print_job'], 'j')} @@ q AND j.site_id = :site "
+        f"ORDER BY ts_rank({tsvector(FTS_TABLES['print_job'], 'j')}, q) DESC LIMIT :limit"
+    ),
+    "temp_jobs": (
+        "SELECT t.id, t.project_name, t.date, t.weight_used "
+        "FROM temp_print_job t, to_tsquery('simple', :match) q "
+        f"WHERE {tsvector(FTS_TABLES['temp_print_job'], 't')} @@ q AND t.site_id = :site "
+        f"ORDER BY ts_rank({tsvector(FTS_TABLES['temp_print_job'], 't')}, q) DESC LIMIT :limit"
+    ),
+}
+
+def search(query, site_id, limit=20):
+    """Returns a site's best ranked rolls, print jobs and unreviewed jobs matching the query."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        queries, match = POSTGRESQL_QUERIES, ts_query(query)
+    else:
+        queries, match = SQLITE_QUERIES, fts_query(query)
+    if not match:
+        return {"rolls": [], "print_jobs": [], "temp_jobs": []}
+
+    params = {"match": match, "site": site_id, "limit": limit}
+    rolls = db.session.execute(
+        text(queries["rolls"]).columns(in_use=db.Boolean), params
+    ).mappings().all()
+    print_jobs = db.session.execute(
+        text(queries["print_jobs"]).columns(date=db.DateTime), params
+    ).mappings().all()
+    temp_jobs = db.session.execute(
+        text(queries["temp_jobs"]).columns(date=db.DateTime), params
+    ).mappings().all()
+
+    return {
+        "rolls": [dict(row) for row in rolls],
+        "print_jobs": [serialize_job(row) for row in print_jobs],
+        "temp_jobs": [serialize_job(row) for row in temp_jobs],
+    }
+
+def serialize_job(row):
+    job = dict(row)
+    job["date"] = job["date"].strftime("%Y-%m-%dT%H:%M") if job["date"] else None
+    return job
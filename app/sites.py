@@ -0,0 +1,56 @@
+import hashlib
+import secrets
+from flask import abort, g, has_request_context, request
+from sqlalchemy import event, insert, select
+from app import app, db
+from app.models import DEFAULT_SITE_ID, Printer, Site
+
+class ApiKeyError(Exception):
+    pass
+
+@event.listens_for(Site.__table__, "after_create")
+def seed_default_site(target, connection, **kw):
+    # The migration creates it in production, this covers db.create_all() (e.g. the test suite)
+    connection.execute(insert(target), {"name": "Default"})
+
+def current_site_id():
+    """The site a request shows or changes: ?site=<id>, the default site without one."""
+    if "site_id" not in g:
+        site_id = request.args.get("site", DEFAULT_SITE_ID, type=int)
+        if site_id != DEFAULT_SITE_ID and db.session.get(Site, site_id) is None:
+            abort(404)
+        g.site_id = site_id
+    return g.site_id
+
+@app.url_defaults
+def keep_site(endpoint, values):
+    # Links, forms and requests of a site's dashboard stay on that site
+    if endpoint != "static" and "site" not in values and has_request_context() and "site" in request.args:
+        values["site"] = current_site_id()
+
+def hash_key(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def add_printer(site, name):
+    """Adds a printer to a site, returns it and its API key. Only the key's hash is stored."""
+    key = secrets.token_urlsafe(32)
+    printer = Printer(site=site, name=name, api_key_hash=hash_key(key))
+    db.session.add(printer)
+    return printer, key
+
+def uploading_printer():
+    """The (printer id, site id) of the request's X-API-Key, (None, default site) without a key.
+
+    Raises ApiKeyError for an unknown key, or for a missing one with INGEST_REQUIRE_API_KEY set.
+    """
+    key = request.headers.get("X-API-Key")
+    if not key:
+        if app.config["INGEST_REQUIRE_API_KEY"]:
+            raise ApiKeyError("X-API-Key is required")
+        return None, DEFAULT_SITE_ID
+    printer = db.session.execute(
+        select(Printer.id, Printer.site_id).where(Printer.api_key_hash == hash_key(key))
+    ).first()
+    if printer is None:
+        raise ApiKeyError("Invalid API key")
+    return printer.id, printer.site_id
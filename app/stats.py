@@ -0,0 +1,96 @@
+from sqlalchemy import Date, func, select, type_coerce
+from app import db
+from app.models import FilamentRoll, PrintJob, PrintJobUsage, MonthlyRollUsage, MonthlyProjectUsage
+
+PERIODS = ("day", "week", "month")
+DIMENSIONS = ("maker", "color", "roll", "project")
+ROLL_DIMENSIONS = {"maker", "color", "roll"}
+
+def period_start(column, period):
+    """SQL expression of the first day of the day, week (starting Monday) or month a date falls in."""
+    if db.engine.dialect.name == "sqlite":
+        modifiers = {"day": (), "week": ("weekday 0", "-6 days"), "month": ("start of month",)}[period]
+        return type_coerce(func.date(column, *modifiers), Date)
+    return func.date_trunc(period, column).cast(Date)
+
+def monthly_usage_from_print_jobs(*dimensions):
+    month = period_start(PrintJob.date, "month")
+    return select(
+        month,
+        *dimensions,
+        func.sum(PrintJobUsage.grams),
+        func.count(PrintJobUsage.job_id)
+    ).join(PrintJob, PrintJob.id == PrintJobUsage.job_id).where(PrintJob.date.is_not(None)).group_by(
+        month, *dimensions
+    )
+
+def monthly_roll_usage_from_print_jobs():
+    """Aggregates the monthly roll rollup from the print history in a single GROUP BY."""
+    return monthly_usage_from_print_jobs(PrintJobUsage.roll_id)
+
+def monthly_project_usage_from_print_jobs():
+    """Aggregates the monthly project rollup from the print history in a single GROUP BY."""
+    return monthly_usage_from_print_jobs(PrintJob.site_id, PrintJob.project_name)
+
+def consumption_series(site_id, period, by=(), min_date=None, max_date=None):
+    """Grams consumed at a site per period, one series for every combination of the given dimensions.
+
+    Months split by roll attributes or by project alone are read from the monthly rollups and
+    always cover whole months, everything else is bucketed from the print history. Returns the
+    start of every period with any usage and the series, largest first, with a value for each.
+    """
+    rollup = None
+    if period == "month":
+        if set(by) <= ROLL_DIMENSIONS:
+            rollup = MonthlyRollUsage
+        elif set(by) == {"project"}:
+            rollup = MonthlyProjectUsage
+
+    if rollup:
+        bucket = rollup.month
+        query = select().select_from(rollup)
+        if min_date:
+            query = query.where(bucket >= min_date.date().replace(day=1))
+        if max_date:
+            query = query.where(bucket <= max_date.date())
+        columns = {"roll": getattr(rollup, "roll_id", None), "project": getattr(rollup, "project_name", None)}
+        grams = rollup.grams
+        if rollup is MonthlyProjectUsage:
+            query = query.where(rollup.site_id == site_id)
+        else:
+            # Rolls belong to a single site
+            query = query.join(FilamentRoll, FilamentRoll.id == rollup.roll_id).where(FilamentRoll.site_id == site_id)
+    else:
+        bucket = period_start(PrintJob.date, period)
+        query = (
+            select().select_from(PrintJobUsage).join(PrintJob, PrintJob.id == PrintJobUsage.job_id)
+            .where(PrintJob.site_id == site_id)
+        )
+        # On the raw date, so the (site_id, date, id) index narrows the scan
+        if min_date:
+            query = query.where(PrintJob.date >= min_date)
+        if max_date:
+            query = query.where(PrintJob.date <= max_date)
+        columns = {"roll": PrintJobUsage.roll_id, "project": PrintJob.project_name}
+        grams = PrintJobUsage.grams
+
+    if ("maker" in by or "color" in by) and rollup is not MonthlyRollUsage:
+        query = query.join(FilamentRoll, FilamentRoll.id == columns["roll"])
+    columns.update(maker=FilamentRoll.maker, color=FilamentRoll.color)
+    dimensions = [columns[name] for name in by]
+
+    rows = db.session.execute(
+        query.add_columns(bucket, func.sum(grams), *dimensions)
+        .group_by(bucket, *dimensions)
+    ).all()
+
+    buckets = sorted({row[0] for row in rows if row[0]})
+    series = {}
+    for start, total, *key in rows:
+        if start:
+            series.setdefault(tuple(key), {})[start] = total
+
+    return buckets, [
+        dict(zip(by, key), grams=[round(values.get(start, 0), 2) for start in buckets])
+        for key, values in sorted(series.items(), key=lambda item: -sum(item[1].values()))
+    ]
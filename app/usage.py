@@ -0,0 +1,208 @@
+from sqlalchemy import func, insert, inspect, select, update
+from sqlalchemy.orm import selectinload
+from app import db
+from app.changes import record_changes
+from app.stats import monthly_project_usage_from_print_jobs
+from app.models import (
+    FilamentRoll, PrintJob, PrintJobUsage, RollUsage, MonthlyRollUsage, MonthlyProjectUsage, ConsumptionEntry
+)
+
+def naive(date):
+    # Dates loaded back from the database are naive, the model default is not
+    return date.replace(tzinfo=None) if date else None
+
+def merge_allocations(allocations):
+    """Adds up the grams of (roll_id, grams) pairs naming the same roll, keeping the first-seen order."""
+    merged = {}
+    for roll_id, grams in allocations:
+        merged[roll_id] = merged.get(roll_id, 0) + grams
+    return list(merged.items())
+
+def set_allocations(job, allocations):
+    """Splits a print job over one or more rolls, given as (roll_id, grams) pairs.
+
+    The job's filament_id becomes the roll it used the most of and weight_used the total.
+    """
+    allocations = merge_allocations(allocations)
+    if not allocations:
+        raise ValueError("A print job needs at least one roll")
+    job.allocations = [PrintJobUsage(roll_id=roll_id, grams=grams) for roll_id, grams in allocations]
+    job.filament_id = max(allocations, key=lambda allocation: allocation[1])[0]
+    job.weight_used = sum(grams for _, grams in allocations)
+
+def month_of(date):
+    return naive(date).date().replace(day=1) if date else None
+
+def add_monthly_usage(model, grams, count, **key):
+    """Adds to a row of a monthly rollup, rows left without jobs are removed."""
+    usage = db.session.get(model, key)
+    if not usage:
+        usage = model(grams=0, job_count=0, **key)
+    db.session.add(usage)  # Also brings back a row deleted earlier in the transaction (edits)
+    usage.grams += grams
+    usage.job_count += count
+    if usage.job_count <= 0:
+        if inspect(usage).pending:
+            db.session.expunge(usage)
+        else:
+            db.session.delete(usage)
+
+def add_to_rollups(jobs):
+    """Adds the allocations of new (flushed) print jobs to the monthly rollups."""
+    # Summed up first, a pending row can't be looked up again before the next flush
+    by_roll, by_project = {}, {}
+    for job in jobs:
+        if not job.date:
+            continue
+        month = month_of(job.date)
+        for allocation in job.allocations:
+            for totals, key in ((by_roll, (month, allocation.roll_id)),
+                                (by_project, (month, job.site_id, job.project_name))):
+                grams, count = totals.get(key, (0, 0))
+                totals[key] = (grams + float(allocation.grams), count + 1)
+
+    for (month, roll_id), (grams, count) in by_roll.items():
+        add_monthly_usage(MonthlyRollUsage, grams, count, month=month, roll_id=roll_id)
+    for (month, site_id, project_name), (grams, count) in by_project.items():
+        add_monthly_usage(MonthlyProjectUsage, grams, count, month=month, site_id=site_id, project_name=project_name)
+
+def allocations_of(job):
+    # Jobs created with only filament_id and weight_used take everything from that roll
+    if not job.allocations:
+        job.allocations = [PrintJobUsage(roll_id=job.filament_id, grams=float(job.weight_used))]
+    return job.allocations
+
+def record_usage(job, sign=1):
+    """Consumes (sign=1) or gives back (sign=-1) a print job's filament from each of its rolls.
+
+    Updates the rolls' remaining weight, appends to the consumption ledger and
+    keeps the rolls' usage summary and the monthly rollups in step, all in the caller's transaction.
+    """
+    allocations = allocations_of(job)
+    if job.id is None:
+        db.session.flush()  # The ledger needs the job's id
+
+    project_grams = project_count = 0
+    for allocation in allocations:
+        roll = db.session.get(FilamentRoll, allocation.roll_id)
+        if not roll:
+            continue
+
+        grams = sign * float(allocation.grams)
+        roll.remaining_weight -= grams
+        db.session.add(ConsumptionEntry(
+            roll_id=roll.id,
+            job_id=job.id,
+            grams=grams,
+            reason="print" if sign > 0 else "revert"
+        ))
+
+        usage = db.session.get(RollUsage, roll.id)
+        if not usage:
+            usage = RollUsage(roll_id=roll.id, grams_used=0, job_count=0)
+            db.session.add(usage)
+        usage.grams_used += grams
+        usage.job_count += sign
+        if job.date:
+            add_monthly_usage(MonthlyRollUsage, grams, sign, month=month_of(job.date), roll_id=roll.id)
+            project_grams += grams
+            project_count += sign
+
+        if sign > 0:
+            if job.date and (not usage.last_used or naive(job.date) > usage.last_used):
+                usage.last_used = naive(job.date)
+        else:
+            # Only the removed job can have been the latest one, find its predecessor
+            usage.last_used = db.session.scalar(
+                select(func.max(PrintJob.date))
+                .join(PrintJobUsage, PrintJobUsage.job_id == PrintJob.id)
+                .where(PrintJobUsage.roll_id == roll.id, PrintJob.id != job.id)
+            )
+
+    if project_count:
+        add_monthly_usage(MonthlyProjectUsage, project_grams, project_count,
+                          month=month_of(job.date), site_id=job.site_id, project_name=job.project_name)
+
+def record_usage_bulk(jobs):
+    """Consumes the filament of many new (flushed) print jobs.
+
+    Issues one aggregated UPDATE per roll rather than one per job, and a single
+    executemany INSERT into the ledger.
+    """
+    totals = {}
+    for job in jobs:
+        for allocation in allocations_of(job):
+            grams, count, last_used = totals.get(allocation.roll_id, (0, 0, None))
+            date = naive(job.date)
+            if date and (not last_used or date > last_used):
+                last_used = date
+            totals[allocation.roll_id] = (grams + float(allocation.grams), count + 1, last_used)
+
+    for roll_id, (grams, count, last_used) in totals.items():
+        db.session.execute(
+            update(FilamentRoll)
+            .where(FilamentRoll.id == roll_id)
+            .values(remaining_weight=FilamentRoll.remaining_weight - grams)
+        )
+
+        usage = db.session.get(RollUsage, roll_id)
+        if not usage:
+            usage = RollUsage(roll_id=roll_id, grams_used=0, job_count=0)
+            db.session.add(usage)
+        usage.grams_used += grams
+        usage.job_count += count
+        if last_used and (not usage.last_used or last_used > usage.last_used):
+            usage.last_used = last_used
+    record_changes("filament_roll", totals)
+
+    add_to_rollups(jobs)
+
+    if jobs:
+        db.session.execute(insert(ConsumptionEntry), [
+            {"roll_id": allocation.roll_id, "job_id": job.id, "grams": float(allocation.grams), "reason": "print"}
+            for job in jobs for allocation in job.allocations
+        ])
+
+def record_adjustment(roll, new_remaining_weight):
+    """Records a manual correction of a roll's remaining weight in the ledger."""
+    grams = roll.remaining_weight - new_remaining_weight
+    if grams:
+        db.session.add(ConsumptionEntry(roll_id=roll.id, grams=grams, reason="adjust"))
+    roll.remaining_weight = new_remaining_weight
+
+def forget_roll(roll_id):
+    """Removes a deleted roll from the print history.
+
+    Jobs printed only with that roll are deleted, multi-material jobs keep their other rolls.
+    """
+    # The roll's share of every project's months goes with it
+    for month, site_id, project_name, grams, count in db.session.execute(
+        monthly_project_usage_from_print_jobs().where(PrintJobUsage.roll_id == roll_id)
+    ).all():
+        add_monthly_usage(MonthlyProjectUsage, -grams, -count, month=month, site_id=site_id, project_name=project_name)
+
+    shared_jobs = PrintJob.query.options(selectinload(PrintJob.allocations)).filter(
+        PrintJob.id.in_(select(PrintJobUsage.job_id).where(PrintJobUsage.roll_id == roll_id))
+    ).all()
+    for job in shared_jobs:
+        others = [(a.roll_id, a.grams) for a in job.allocations if a.roll_id != roll_id]
+        if others:
+            set_allocations(job, others)
+        else:
+            db.session.delete(job)
+    db.session.flush()
+
+    # Jobs without allocations
+    record_changes("print_job", db.session.scalars(select(PrintJob.id).where(PrintJob.filament_id == roll_id)), "delete")
+    PrintJob.query.filter_by(filament_id=roll_id).delete()
+    RollUsage.query.filter_by(roll_id=roll_id).delete()
+    MonthlyRollUsage.query.filter_by(roll_id=roll_id).delete()
+
+def usage_from_print_jobs():
+    """Aggregates the usage of every roll from the print history in a single GROUP BY."""
+    return select(
+        PrintJobUsage.roll_id,
+        func.sum(PrintJobUsage.grams),
+        func.count(PrintJobUsage.job_id),
+        func.max(PrintJob.date)
+    ).join(PrintJob, PrintJob.id == PrintJobUsage.job_id).group_by(PrintJobUsage.roll_id)
@@ -0,0 +1,58 @@
+import random
+from itertools import chain
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from app import db
+from app.models import DataVersion
+
+# Tables whose changes are counted. Every commit writing to one of them bumps its row in
+# data_version once, so clients can tell whether anything changed with a single primary key lookup.
+VERSIONED_TABLES = ["filament_roll", "print_job", "print_job_usage", "temp_print_job", "roll_usage", "site"]
+
+def changed_tables(session):
+    return session.info.setdefault("changed_tables", set())
+
+@event.listens_for(Session, "after_flush")
+def track_flush(session, flush_context):
+    # new, dirty and deleted still hold what was just flushed
+    for obj in chain(session.new, session.dirty, session.deleted):
+        changed_tables(session).add(obj.__table__.name)
+
+@event.listens_for(Session, "do_orm_execute")
+def track_statement(orm_execute_state):
+    # Bulk statements (insert(Model), update(Model), Query.delete(), ...) bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        changed_tables(orm_execute_state.session).add(orm_execute_state.statement.table.name)
+
+@event.listens_for(Session, "before_commit")
+def bump_versions(session):
+    session.flush()
+    tables = session.info.pop("changed_tables", set()) & set(VERSIONED_TABLES)
+    if tables:
+        # Core statement, in the transaction being committed
+        session.connection().execute(
+            update(DataVersion.__table__)
+            .where(DataVersion.table_name.in_(sorted(tables)))
+            .values(version=DataVersion.version + 1)
+        )
+
+@event.listens_for(Session, "after_rollback")
+def forget_changes(session):
+    session.info.pop("changed_tables", None)
+
+def initial_versions():
+    # Counters start at a random value, so a recreated database never repeats the versions
+    # (and ETags, cached pages) of the one it replaces
+    return [{"table_name": table, "version": random.randrange(2 ** 30)} for table in VERSIONED_TABLES]
+
+@event.listens_for(DataVersion.__table__, "after_create")
+def seed_versions(target, connection, **kw):
+    # Alembic seeds them in production, this covers db.create_all() (e.g. the test suite)
+    connection.execute(insert(target), initial_versions())
+
+def data_versions(tables):
+    """Returns the change counter of every given table, in one query."""
+    rows = db.session.execute(
+        select(DataVersion.table_name, DataVersion.version).where(DataVersion.table_name.in_(tables))
+    )
+    return dict(rows.all())
@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+from benchmarks import bench_extractor, loadtest
+
+def sizes(value):
+    return [float(size) for size in value.split(",")]
+
+def names(choices):
+    def parse(value):
+        selected = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = set(selected) - set(choices)
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown: {', '.join(sorted(unknown))} (choose from {', '.join(choices)})")
+        return selected
+    return parse
+
+def baseline_options(parser):
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--compare", action="store_true",
+                        help="Compare with the stored baseline, exit with status 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Slowdown counted as a regression, as a fraction (default 0.2)")
+    parser.add_argument("--baseline", help="Baseline file (default benchmarks/baselines/<suite>.json)")
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks and load tests.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    extractor = commands.add_parser("extractor", help="Time the G-code extractor on generated files")
+    extractor.add_argument("--sizes", type=sizes, default=[1, 50, 500], help="File sizes in MB (default 1,50,500)")
+    extractor.add_argument("--cases", type=names([case[0] for case in bench_extractor.CASES]),
+                           help="Comma separated cases (default all)")
+    extractor.add_argument("--rounds", type=int, default=5, help="Minimum timed rounds per case (default 5)")
+    extractor.add_argument("--min-time", type=float, default=1.0,
+                           help="Minimum seconds spent timing each case (default 1)")
+    extractor.add_argument("--data-dir", help="Keep the generated G-code here and reuse it on the next run")
+    baseline_options(extractor)
+
+    load = commands.add_parser("load", help="Load test the web app under gunicorn")
+    load.add_argument("--scenarios", type=names(list(loadtest.SCENARIOS)), default=list(loadtest.SCENARIOS),
+                      help="Comma separated scenarios (default all)")
+    load.add_argument("--concurrency", type=int, default=8, help="Concurrent clients (default 8)")
+    load.add_argument("--duration", type=float, default=10, help="Seconds per scenario (default 10)")
+    load.add_argument("--workers", type=int, default=2, help="gunicorn workers (default 2)")
+    load.add_argument("--threads", type=int, default=1, help="Threads per gunicorn worker (default 1)")
+    load.add_argument("--worker-class", default="gthread", help="gunicorn worker class (default gthread)")
+    load.add_argument("--role", choices=["all", "ingest"], default="all",
+                      help="FILATRACK_ROLE of the server, ingest only runs the ingest scenarios (default all)")
+    load.add_argument("--check-targets", action="store_true",
+                      help="Exit with status 1 when an ingest scenario misses its throughput target")
+    load.add_argument("--rolls", type=int, default=300)
+    load.add_argument("--jobs", type=int, default=20000)
+    load.add_argument("--temp-jobs", type=int, default=200)
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--database-url", help="Serve this database instead of generating one")
+    load.add_argument("--url", help="Test an already running server instead of starting gunicorn")
+    baseline_options(load)
+
+    generate = commands.add_parser("generate", help="Fill a database with a synthetic history")
+    generate.add_argument("--database-url", required=True)
+    generate.add_argument("--rolls", type=int, default=300)
+    generate.add_argument("--jobs", type=int, default=20000)
+    generate.add_argument("--temp-jobs", type=int, default=200)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--years", type=int, default=3, help="Years the print history spans (default 3)")
+
+    args = parser.parse_args()
+    if args.command == "extractor":
+        return bench_extractor.run(
+            args.sizes, args.rounds, args.min_time, data_dir=args.data_dir, cases=args.cases,
+            save=args.save_baseline, check=args.compare, threshold=args.threshold, baseline=args.baseline
+        )
+    if args.command == "load":
+        return loadtest.run(
+            args.scenarios, args.concurrency, args.duration, args.workers, args.threads,
+            args.rolls, args.jobs, args.temp_jobs, seed=args.seed, database_url=args.database_url,
+            url=args.url, save=args.save_baseline, check=args.compare, threshold=args.threshold,
+            baseline=args.baseline, worker_class=args.worker_class, role=args.role, targets=args.check_targets
+        )
+
+    # The app reads the database URL when it is imported
+    os.environ["DATABASE_URL"] = args.database_url
+    from benchmarks.datagen import populate_database
+    populate_database(args.rolls, args.jobs, args.temp_jobs, years=args.years, seed=args.seed)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
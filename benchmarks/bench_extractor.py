@@ -0,0 +1,68 @@
+"""Microbenchmarks of the G-code extractor of the PrusaSlicer post-processing script."""
+import importlib.util
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from benchmarks.datagen import BASE_DIR, make_gcode
+from benchmarks.harness import measure, report
+
+SUITE = "extractor"
+COLUMNS = ["size_mb", "rounds", "min_ms", "median_ms", "mean_ms", "stddev_ms", "max_ms", "mb_per_s"]
+
+# (name, fixture, metadata in the middle): the fixtures cover every slicer parser, the last
+# case has its metadata outside the scanned header and footer so the whole file is read
+CASES = [
+    ("prusaslicer", "prusaslicer_mmu_0.4n_0.2mm_PLA_MK4_1h2m.gcode", False),
+    ("orca", "orca_bracket_PETG_1h8m.gcode", False),
+    ("bambu", "bambu_ams_plate_1.gcode", False),
+    ("anycubic", "anycubic_vase_PLA.gcode", False),
+    ("unknown", "unknown_slicer_part.gcode", False),
+    ("prusaslicer-fullscan", "prusaslicer_mmu_0.4n_0.2mm_PLA_MK4_1h2m.gcode", True),
+]
+
+def load_prusa_post():
+    # Imported the way the slicer runs it: with its own folder on the path for slicers.py
+    sys.path.insert(0, os.path.join(BASE_DIR, "integrations", "prusa"))
+    spec = importlib.util.spec_from_file_location(
+        "prusa_post", os.path.join(BASE_DIR, "integrations", "prusa", "prusa_post.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # It logs every step at DEBUG, which would be timed too
+    logging.getLogger().setLevel(logging.WARNING)
+    return module
+
+def run(sizes, rounds, min_time, data_dir=None, cases=None, save=False, check=False, threshold=0.2,
+        baseline=None):
+    prusa_post = load_prusa_post()
+    work_dir = data_dir or tempfile.mkdtemp(prefix="filatrack-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = {}
+    try:
+        for name, fixture, metadata_in_middle in CASES:
+            if cases and name not in cases:
+                continue
+            for size_mb in sizes:
+                path = os.path.join(work_dir, f"{name}_{size_mb:g}mb.gcode")
+                # Kept files in --data-dir are reused, they are slow to write at hundreds of MB
+                if not os.path.exists(path):
+                    make_gcode(path, size_mb, fixture, metadata_in_middle)
+                actual_mb = os.path.getsize(path) / (1024 * 1024)
+
+                info = prusa_post.extract_gcode_info(path)
+                if not info or info.get("weight_used") is None:
+                    raise RuntimeError(f"No filament weight extracted from {path}")
+
+                stats = measure(lambda: prusa_post.extract_gcode_info(path), rounds=rounds, min_time=min_time)
+                stats["size_mb"] = round(actual_mb, 1)
+                stats["mb_per_s"] = actual_mb / (stats["median_ms"] / 1000)
+                results[f"{name}-{size_mb:g}mb"] = stats
+                print(f"{name} {size_mb:g} MB: median {stats['median_ms']:.2f} ms", file=sys.stderr)
+    finally:
+        if not data_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return report(SUITE, results, COLUMNS, save=save, check=check, threshold=threshold, path=baseline)
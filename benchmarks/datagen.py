@@ -0,0 +1,123 @@
+"""Synthetic data for the benchmarks: a populated tracker database and large G-code files."""
+import os
+import random
+from datetime import datetime, timedelta
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FIXTURES_DIR = os.path.join(BASE_DIR, "tests", "fixtures", "gcode")
+
+MAKERS = ["Prusament", "Polymaker", "eSun", "Sunlu", "Bambu Lab", "Elegoo", "Overture", "Extrudr"]
+COLORS = ["Black", "White", "Galaxy Black", "Jet Black", "Signal Red", "Azure Blue", "Orange",
+          "Olive Green", "Silver", "Transparent", "Pearl Mango", "Lipstick Red"]
+WORDS = ["bracket", "benchy", "vase", "hinge", "clip", "enclosure", "knob", "mount", "gear",
+         "lid", "case", "spool", "holder", "adapter", "cover", "stand", "hook", "plate"]
+CHUNK = 5000
+
+def project_names(rng, count):
+    return [f"{rng.choice(WORDS)} {rng.choice(WORDS)} v{rng.randint(1, 9)}" for _ in range(count)]
+
+def populate_database(rolls=300, jobs=20000, temp_jobs=200, years=3, seed=0):
+    """Creates the schema of the configured DATABASE_URL and fills it with a reproducible history.
+
+    Must run in its own process: the app reads DATABASE_URL when it is first imported. The
+    migrations are applied (so the search index and its triggers exist), the rows are bulk
+    inserted and the usage summary and monthly rollups are rebuilt from them at the end.
+    """
+    import click
+    from flask_migrate import upgrade
+    from sqlalchemy import insert
+    from app import app, db
+    from app.cli import rebuild_usage
+    from app.models import FilamentRoll, PrintJob, PrintJobUsage, TempPrintJob
+
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=365 * years)
+    projects = project_names(rng, max(jobs // 20, 1))
+
+    with app.app_context():
+        upgrade(directory=os.path.join(BASE_DIR, "migrations"))
+
+        roll_rows = []
+        for _ in range(rolls):
+            total = rng.choice([250.0, 500.0, 750.0, 1000.0, 1000.0, 1000.0, 2000.0])
+            roll_rows.append({"maker": rng.choice(MAKERS), "color": rng.choice(COLORS),
+                              "total_weight": total, "remaining_weight": total, "in_use": True})
+        db.session.execute(insert(FilamentRoll), roll_rows)
+        roll_ids = [roll.id for roll in FilamentRoll.query.order_by(FilamentRoll.id)]
+        remaining = {roll_id: row["remaining_weight"] for roll_id, row in zip(roll_ids, roll_rows)}
+
+        # Jobs in date order, ids follow the dates like they do for a real history
+        dates = sorted(start + timedelta(seconds=rng.randrange(int((now - start).total_seconds())))
+                       for _ in range(jobs))
+        next_id = (db.session.query(db.func.max(PrintJob.id)).scalar() or 0) + 1
+        for offset in range(0, jobs, CHUNK):
+            job_rows, usage_rows = [], []
+            for job_id, date in enumerate(dates[offset:offset + CHUNK], start=next_id + offset):
+                # One roll most of the time, a few multi-material jobs on up to four
+                count = 1 if rng.random() < 0.9 else rng.randint(2, 4)
+                grams = [round(rng.uniform(1, 120), 2) for _ in range(count)]
+                used = rng.sample(roll_ids, count)
+                job_rows.append({"id": job_id, "filament_id": used[grams.index(max(grams))],
+                                 "weight_used": round(sum(grams), 2),
+                                 "project_name": rng.choice(projects), "date": date})
+                for roll_id, weight in zip(used, grams):
+                    usage_rows.append({"job_id": job_id, "roll_id": roll_id, "grams": weight})
+                    remaining[roll_id] -= weight
+            db.session.execute(insert(PrintJob), job_rows)
+            db.session.execute(insert(PrintJobUsage), usage_rows)
+        if db.engine.dialect.name == "postgresql":
+            # The ids were given explicitly, move the sequence past them
+            db.session.execute(db.text(
+                "SELECT setval(pg_get_serial_sequence('print_job', 'id'), (SELECT max(id) FROM print_job))"
+            ))
+
+        # Some rolls ran out, most of them long ago
+        for roll_id, weight in remaining.items():
+            db.session.execute(
+                db.update(FilamentRoll).where(FilamentRoll.id == roll_id)
+                .values(remaining_weight=round(weight, 2), in_use=weight > 0)
+            )
+
+        if temp_jobs:
+            db.session.execute(insert(TempPrintJob), [
+                {"project_name": rng.choice(projects), "weight_used": round(rng.uniform(1, 120), 2),
+                 "date": now - timedelta(minutes=rng.randrange(60 * 24 * 14))}
+                for _ in range(temp_jobs)
+            ])
+        db.session.commit()
+
+        with click.Context(rebuild_usage) as ctx:
+            ctx.invoke(rebuild_usage)
+
+def fixture_path(name):
+    return os.path.join(FIXTURES_DIR, name)
+
+def make_gcode(path, size_mb, fixture, metadata_in_middle=False):
+    """Writes a G-code file of about size_mb MB from one of the test fixtures.
+
+    The fixture's header and footer (with the slicer's metadata and config block) are kept and
+    its moves are repeated in between. With metadata_in_middle the footer is written halfway,
+    so the metadata is only found by scanning the whole file.
+    """
+    with open(fixture_path(fixture), "rb") as f:
+        lines = f.read().splitlines(keepends=True)
+    moves = [i for i, line in enumerate(lines) if line.startswith((b"G0 ", b"G1 "))]
+    header = b"".join(lines[:moves[0]])
+    body = b"".join(lines[moves[0]:moves[-1] + 1])
+    footer = b"".join(lines[moves[-1] + 1:])
+
+    # Repeat the moves in blocks of about 1 MB
+    block = body * max(1, (1024 * 1024) // len(body))
+    target = int(size_mb * 1024 * 1024) - len(header) - len(footer)
+    blocks = max(1, target // len(block))
+
+    with open(path, "wb") as f:
+        f.write(header)
+        for i in range(blocks):
+            if metadata_in_middle and i == blocks // 2:
+                f.write(footer)
+            f.write(block)
+        if not metadata_in_middle:
+            f.write(footer)
+    return path
@@ -0,0 +1,136 @@
+import json
+import math
+import os
+import platform
+import statistics
+import time
+from datetime import datetime
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Metrics compared against the baseline, and whether a higher value is better
+METRICS = {
+    "median_ms": False,
+    "mean_ms": False,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "rps": True,
+    "mb_per_s": True,
+}
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(durations):
+    """min/max/mean/median/stddev and p50/p95/p99 of durations in seconds, in milliseconds."""
+    values = sorted(d * 1000 for d in durations)
+    return {
+        "rounds": len(values),
+        "min_ms": values[0],
+        "max_ms": values[-1],
+        "mean_ms": statistics.fmean(values),
+        "median_ms": statistics.median(values),
+        "stddev_ms": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+    }
+
+def measure(func, rounds=5, warmup=1, min_time=0.0):
+    """Times func like pytest-benchmark: warm-up calls first, then at least `rounds` timed calls
+    and more until `min_time` seconds have been spent."""
+    for _ in range(warmup):
+        func()
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < rounds or time.perf_counter() - started < min_time:
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+def machine():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+def baseline_path(suite, path=None):
+    return path or os.path.join(BASELINE_DIR, f"{suite}.json")
+
+def save_baseline(suite, results, path=None):
+    path = baseline_path(suite, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "suite": suite,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "machine": machine(),
+            "results": results,
+        }, f, indent=2, sort_keys=True)
+    return path
+
+def load_baseline(suite, path=None):
+    path = baseline_path(suite, path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def compare(results, baseline, threshold):
+    """Returns (case, metric, baseline value, current value, change) for every metric that got
+    worse than the baseline by more than threshold (0.2 = 20 %)."""
+    regressions = []
+    for case, metrics in results.items():
+        previous = baseline["results"].get(case, {})
+        for metric, higher_is_better in METRICS.items():
+            old, new = previous.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append((case, metric, old, new, change))
+    return regressions
+
+def print_table(rows, columns):
+    """Prints a list of dicts as an aligned text table, floats with 2 decimals."""
+    def cell(value):
+        if isinstance(value, float):
+            return f"{value:.2f}"
+        return "" if value is None else str(value)
+
+    table = [[cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[i]) for line in table)) for i, column in enumerate(columns)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for line in table:
+        print("  ".join(value.rjust(width) for value, width in zip(line, widths)))
+
+def report(suite, results, columns, save=False, check=False, threshold=0.2, path=None):
+    """Prints the results, optionally stores them as the new baseline and/or compares them to
+    the stored one. Returns the process exit code: 1 when a regression was found."""
+    print_table([{"case": case, **metrics} for case, metrics in results.items()], ["case"] + columns)
+
+    status = 0
+    if check:
+        baseline = load_baseline(suite, path)
+        if baseline is None:
+            print(f"\nNo baseline at {baseline_path(suite, path)}, run with --save-baseline first.")
+        else:
+            regressions = compare(results, baseline, threshold)
+            print(f"\nCompared with the baseline of {baseline['created']} ({baseline['machine']['platform']}):")
+            for case, metric, old, new, change in regressions:
+                print(f"  REGRESSION {case} {metric}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+            if regressions:
+                status = 1
+            else:
+                print(f"  no regression above {threshold:.0%}")
+    if save:
+        print(f"\nBaseline saved to {save_baseline(suite, results, path)}")
+    return status
@@ -0,0 +1,182 @@
+"""Concurrent load test of the read and ingest endpoints, against gunicorn on a generated database."""
+import itertools
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import requests
+from benchmarks.datagen import BASE_DIR, WORDS
+from benchmarks.harness import percentile, report
+
+SUITE = "load"
+COLUMNS = ["requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+BULK_SIZE = 100
+
+# Throughput an ingest server is expected to sustain on SQLite, checked by --check-targets. Measured
+# with --role ingest --workers 2 --threads 4 and 8 clients on a single core shared with the clients,
+# so any real server should clear them. See "Serving" in the README.
+TARGETS = {
+    "ingest": {"rps": 150, "p99_ms": 250},
+    "ingest-bulk": {"rps": 70, "p99_ms": 1500},  # 100 jobs per request
+}
+INGEST_SCENARIOS = ["ingest", "ingest-bulk"]
+
+def ingest_job(rng):
+    return {
+        "project_name": f"{rng.choice(WORDS)} {rng.choice(WORDS)}",
+        "weight_used": round(rng.uniform(1, 120), 2),
+        "date": time.strftime("%Y-%m-%dT%H:%M"),
+    }
+
+# name -> function(session, base url, counter, rng) making one request. Most reads are served from
+# the response cache while nothing is written, index-render defeats it to time the rendering itself.
+SCENARIOS = {
+    "index": lambda s, url, n, rng: s.get(url + "/"),
+    "index-render": lambda s, url, n, rng: s.get(url + "/", params={"nocache": n}),
+    "print-jobs": lambda s, url, n, rng: s.get(url + "/print_jobs"),
+    "search": lambda s, url, n, rng: s.get(url + "/search", params={"q": rng.choice(WORDS)}),
+    "api-jobs": lambda s, url, n, rng: s.get(url + "/api/v1/jobs", params={"limit": 100}),
+    "api-stats": lambda s, url, n, rng: s.get(url + "/api/v1/stats", params={"by": "maker"}),
+    "api-forecast": lambda s, url, n, rng: s.get(url + "/api/v1/forecast"),
+    "ingest": lambda s, url, n, rng: s.post(url + "/add_temp_job", json=ingest_job(rng)),
+    "ingest-bulk": lambda s, url, n, rng: s.post(
+        url + "/add_temp_jobs", json=[ingest_job(rng) for _ in range(BULK_SIZE)]
+    ),
+}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def generate_database(database_url, rolls, jobs, temp_jobs, seed):
+    # In a child process, the app binds to DATABASE_URL when it is imported
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks", "generate", "--database-url", database_url,
+         "--rolls", str(rolls), "--jobs", str(jobs), "--temp-jobs", str(temp_jobs), "--seed", str(seed)],
+        cwd=BASE_DIR, check=True
+    )
+
+def start_server(database_url, workers, threads, port, worker_class="gthread", role="all"):
+    # Started with gunicorn.conf.py, the way app/entrypoint.sh does, the options override it.
+    # No scheduled backups: one would be timed, and written into the project's data folder
+    env = dict(os.environ, DATABASE_URL=database_url, FILATRACK_ROLE=role, BACKUP_INTERVAL_HOURS="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "--threads", str(threads),
+         "-k", worker_class, "-b", f"127.0.0.1:{port}", "--log-level", "warning", "app:app"],
+        cwd=BASE_DIR, env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {server.returncode}")
+        try:
+            # Served by every role
+            if requests.get(url + "/metrics", timeout=5).status_code == 200:
+                return server, url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn did not answer within 60 seconds")
+
+def run_scenario(request, url, concurrency, duration, seed):
+    """Runs request from `concurrency` threads for `duration` seconds.
+
+    Returns the latency percentiles of the successful requests, the throughput and the errors.
+    """
+    counter = itertools.count()
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        own_latencies, own_errors = [], 0
+        with requests.Session() as session:
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                try:
+                    response = request(session, url, next(counter), rng)
+                    response.content
+                    ok = response.status_code < 400
+                except requests.RequestException:
+                    ok = False
+                if ok:
+                    own_latencies.append(time.perf_counter() - start)
+                else:
+                    own_errors += 1
+        with lock:
+            latencies.extend(own_latencies)
+            errors.append(own_errors)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    values = sorted(latency * 1000 for latency in latencies)
+    return {
+        "requests": len(values),
+        "errors": sum(errors),
+        "rps": len(values) / elapsed,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": values[-1] if values else None,
+    }
+
+def check_targets(results):
+    """Prints the scenarios missing their TARGETS, returns whether all that ran met them."""
+    met = True
+    for name, target in TARGETS.items():
+        if name not in results:
+            continue
+        result = results[name]
+        if result["errors"] or result["rps"] < target["rps"] or (result["p99_ms"] or 0) > target["p99_ms"]:
+            met = False
+            print(f"{name}: {result['rps']:.0f} rps, p99 {result['p99_ms'] or 0:.1f} ms, {result['errors']} errors "
+                  f"(target {target['rps']} rps, p99 {target['p99_ms']} ms, no errors)", file=sys.stderr)
+    return met
+
+def run(scenarios, concurrency, duration, workers, threads, rolls, jobs, temp_jobs, seed=0,
+        database_url=None, url=None, save=False, check=False, threshold=0.2, baseline=None,
+        worker_class="gthread", role="all", targets=False):
+    """Generates a database and serves it with gunicorn, unless given one or a running server's url."""
+    if role == "ingest":
+        scenarios = [name for name in scenarios if name in INGEST_SCENARIOS]
+    work_dir = None
+    server = None
+    try:
+        if not url:
+            if not database_url:
+                work_dir = tempfile.mkdtemp(prefix="filatrack-load-")
+                database_url = "sqlite:///" + os.path.join(work_dir, "bench.db")
+                print(f"Generating {rolls} rolls and {jobs} print jobs...", file=sys.stderr)
+                generate_database(database_url, rolls, jobs, temp_jobs, seed)
+            server, url = start_server(database_url, workers, threads, free_port(), worker_class, role)
+
+        results = {}
+        for name in scenarios:
+            print(f"{name}: {concurrency} clients for {duration:g} s", file=sys.stderr)
+            results[name] = run_scenario(SCENARIOS[name], url, concurrency, duration, seed)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    status = report(SUITE, results, COLUMNS, save=save, check=check, threshold=threshold, path=baseline)
+    if targets and not check_targets(results):
+        status = 1
+    return status
@@ -8,6 +8,88 @@ DB_PATH = os.path.join(DB_DIR, "database.db")
 if not os.path.exists(DB_DIR):
     os.makedirs(DB_DIR, exist_ok=True)
 
+def database_uri():
+    """Returns DATABASE_URL if set (e.g. by docker-compose.yml), otherwise the default SQLite file."""
+    uri = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+    # Resolve relative SQLite paths against the project folder rather than the Flask instance folder
+    prefix = "sqlite:///"
+    if uri.startswith(prefix) and uri[len(prefix):] not in ("", ":memory:"):
+        uri = prefix + os.path.join(BASE_DIR, uri[len(prefix):])
+
+    # Use the psycopg 3 driver for plain postgres:// and postgresql:// URLs
+    for scheme in ("postgres://", "postgresql://"):
+        if uri.startswith(scheme):
+            uri = "postgresql+psycopg://" + uri[len(scheme):]
+    return uri
+
+def engine_options(uri):
+    if uri.startswith("postgresql"):
+        return {
+            # Per gunicorn worker; size the database's max_connections for workers * (size + overflow)
+            "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+            "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+            "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+            "pool_pre_ping": True,
+        }
+
+    # In-memory SQLite is given a single static connection by Flask-SQLAlchemy
+    if not uri.startswith("sqlite:///") or uri.endswith(("sqlite:///", ":memory:")):
+        return {}
+    return {
+        # Every gunicorn worker keeps a few connections, SQLite serializes writers anyway
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 5)),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "connect_args": {"timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)) / 1000},
+    }
+
 class Config:
-    SQLALCHEMY_DATABASE_URI = f"sqlite:///{DB_PATH}"
+    # "all" serves everything, "ingest" only the slicer uploads (/add_temp_job, /add_temp_jobs) and
+    # /metrics, for a separate gunicorn in front of the uploads (see gunicorn.conf.py)
+    ROLE = os.getenv("FILATRACK_ROLE", "all")
+
+    SQLALCHEMY_DATABASE_URI = database_uri()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Applied to every new SQLite connection. WAL lets readers carry on while a writer commits.
+    SQLITE_PRAGMAS = {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -32000)),  # Negative values are KiB
+    }
+
+    # Without it, uploads without an X-API-Key go to the default site (see app/sites.py)
+    INGEST_REQUIRE_API_KEY = os.getenv("INGEST_REQUIRE_API_KEY", "false").lower() in ("1", "true", "yes")
+
+    # Rendered pages and API listings kept per worker, keyed by the data versions they show
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 256))
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+    # Consumption rates are fitted over this many recent days, colors running out within the lead time are flagged
+    FORECAST_WINDOW_DAYS = int(os.getenv("FORECAST_WINDOW_DAYS", 90))
+    FORECAST_REORDER_LEAD_DAYS = int(os.getenv("FORECAST_REORDER_LEAD_DAYS", 14))
+
+    # Change feed of the dashboard (/events): workers poll the change log this often, a stream ends
+    # (and the browser resumes it) before gunicorn's worker timeout, entries are kept for a day
+    CHANGE_FEED_POLL_SECONDS = float(os.getenv("CHANGE_FEED_POLL_SECONDS", 1))
+    CHANGE_FEED_STREAM_SECONDS = float(os.getenv("CHANGE_FEED_STREAM_SECONDS", 25))
+    CHANGE_FEED_KEEPALIVE_SECONDS = 10
+    CHANGE_FEED_RETRY_MS = 1000
+    CHANGE_LOG_RETENTION_HOURS = int(os.getenv("CHANGE_LOG_RETENTION_HOURS", 24))
+
+    # Snapshots of a SQLite database (see app/backup.py): one is taken when the newest is older than
+    # the interval (0 turns the schedule off) and the newest BACKUP_KEEP are kept. The backup API
+    # copies BACKUP_PAGES_PER_STEP pages at a time and leaves the database to writers in between.
+    BACKUP_DIR = os.getenv("BACKUP_DIR", os.path.join(DB_DIR, "backups"))
+    BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", 24))
+    BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", 7))
+    BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", 1024))
+    BACKUP_STEP_SLEEP_MS = int(os.getenv("BACKUP_STEP_SLEEP_MS", 10))
+
+    # SQL statements taking at least this long are logged with the request they ran in
+    SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", 250))
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+
+# Loaded by gunicorn from the working directory (app/entrypoint.sh starts it from the project folder)
+
+role = os.getenv("FILATRACK_ROLE", "all")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", 1))
+
+# Every open dashboard keeps a change feed stream (/events) running, which holds a thread of a
+# worker. Threads (the gthread worker) keep those from blocking everything else. An ingest server
+# (FILATRACK_ROLE=ingest) has no streams, its requests are short writes that SQLite serializes
+# anyway, so a few threads keep the workers busy. Async workers (GUNICORN_WORKER_CLASS=gevent)
+# need gevent installed, and only pay off on PostgreSQL: SQLite calls block the event loop.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 4 if role == "ingest" else 8))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+# Slicers and scripts uploading a batch of jobs reuse their connection
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Every worker writes its Prometheus samples to files in this folder and /metrics adds them up
+# (see app/metrics.py). It is set before the workers import the app, one folder per server.
+metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+own_metrics_dir = not metrics_dir
+if own_metrics_dir:
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="filatrack-metrics-")
+
+# Only once the folder is set, prometheus_client picks its storage when imported. Not imported in
+# child_exit: it runs in the master's signal handler, and workers exiting together would each start
+# the import and find it half done.
+from prometheus_client import multiprocess
+
+def on_starting(server):
+    # Samples left by a previous run in a configured folder would be added to the new ones
+    if not own_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+def post_worker_init(worker):
+    # Every worker checks whether a backup is due, a lock file lets one of them take it
+    from app.backup import start_schedule
+    start_schedule()
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
+
+def on_exit(server):
+    if own_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -1,13 +1,19 @@
 import argparse
+import hashlib
+import json
 import logging
+import mmap
 import sys
 import os
-import re
 import requests
 import subprocess
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
+from slicers import GcodeMetadata, detect_slicer, filename_pattern
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,6 +22,26 @@ load_dotenv()
 # Set FILAMENT_TRACKER_API_URL env var with the address of your server if necessary
 FILAMENT_TRACKER_API_URL = os.getenv("FILAMENT_TRACKER_API_URL", "http://127.0.0.1:5000/add_temp_job") 
 
+# Bulk endpoint used to upload spooled jobs, derived from FILAMENT_TRACKER_API_URL unless set
+FILAMENT_TRACKER_BULK_API_URL = os.getenv("FILAMENT_TRACKER_BULK_API_URL") or (
+    FILAMENT_TRACKER_API_URL + "s" if FILAMENT_TRACKER_API_URL.endswith("/add_temp_job") else None
+)
+
+# API key of the printer (from 'flask printers add'), sent as X-API-Key so its jobs are queued at its site
+FILAMENT_TRACKER_API_KEY = os.getenv("FILAMENT_TRACKER_API_KEY")
+
+# Jobs are written to this folder first and uploaded in the background, so nothing is lost
+# while the server is unreachable (they are sent on the next export or with --flush)
+SPOOL_DIR = os.getenv("FILAMENT_TRACKER_SPOOL_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "spool")
+SPOOL_BATCH_SIZE = 100
+FLUSH_TIMEOUT = int(os.getenv("FILAMENT_TRACKER_FLUSH_TIMEOUT") or 600)  # Seconds to keep retrying
+STALE_LOCK_AGE = 3600
+
+# Directory import (--import-dir): progress is saved here so an interrupted import resumes
+IMPORT_STATE_FILE = os.getenv("FILAMENT_TRACKER_IMPORT_STATE") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_state.json")
+IMPORT_BATCH_SIZE = 500
+WATCH_INTERVAL = 10  # Seconds between two scans of a watched folder
+
 # ArcWelder Path
 # set env var ARCWELDER_PATH tothe full path to the ArcWelder.exe, otherwise ArcWelder executable should be in PATH
 ARCWELDER_PATH = os.getenv("ARCWELDER_PATH", "ArcWelder")
@@ -25,6 +51,11 @@ logging.basicConfig(
     level=logging.DEBUG,  # Set logging level (INFO, DEBUG, WARNING, ERROR, CRITICAL)
 )
 
+# Slicers write the metadata we need as comments in the header and in the config block
+# at the end of the file, so only those regions are scanned (the moves in between can be hundreds of MB)
+HEADER_BYTES = 64 * 1024
+FOOTER_BYTES = 512 * 1024
+
 def format_project_name(raw_name):
     """Converts raw input filename base to a properly formatted project name."""
     if not raw_name:
@@ -33,37 +64,57 @@ def format_project_name(raw_name):
     formatted_name = raw_name.replace("-", " ").replace("_", " ")
     return formatted_name.title()  # Capitalize Each Word
 
-def extract_gcode_info(file_path):
-    """Extracts filament weight and project details from the G-code file."""
+def read_gcode_metadata(file_path):
+    """Reads the filament weight and filename format from a G-code file (see slicers.GcodeMetadata).
+
+    The slicer is detected from the header and its parser is used. The file is memory-mapped and
+    only its header and trailing config block are scanned; if the filament weight isn't found
+    there, the whole file is searched for the slicer's comment keys and only their lines parsed.
+    """
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return GcodeMetadata(None, None, None, None)
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            slicer = detect_slicer(data[:HEADER_BYTES])
+            logging.info(f"Detected slicer: {slicer.name}")
+            if size <= HEADER_BYTES + FOOTER_BYTES:
+                return slicer.parse([data])
+
+            # Cut both regions on line boundaries so no value is read truncated
+            header_end = data.rfind(b"\n", 0, HEADER_BYTES) + 1
+            footer_start = data.find(b"\n", size - FOOTER_BYTES) + 1
+            metadata = slicer.parse([data[:header_end], data[footer_start:]])
+            if metadata.weight is None:
+                logging.info("Metadata not found in the header or footer, scanning the whole file")
+                metadata = slicer.parse(slicer.key_lines(data))
+            return metadata
+
+def extract_gcode_info(file_path, use_output_name=True):
+    """Extracts filament weight and project details from the G-code file.
+
+    The slicer passes the name of the file it exports in SLIC3R_PP_OUTPUT_NAME, which is used
+    unless use_output_name is False (for files that aren't the one being exported).
+    """
     filament_weight = None
+    per_tool = None
     project_name = None
     filename_format = None
     gcode_filename = None
 
     # Try to get filename from environment variable
-    env_project_name = os.getenv("SLIC3R_PP_OUTPUT_NAME")
+    env_project_name = os.getenv("SLIC3R_PP_OUTPUT_NAME") if use_output_name else None
     if env_project_name:
         gcode_filename = Path(env_project_name).stem
         logging.info(f"Using filename from environment variable: {gcode_filename}")
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-
-                # Extract filament weight
-                if line.startswith("; filament used [g] ="):
-                    match = re.search(r"; filament used \[g\] = ([\d.]+)", line)
-                    if match:
-                        filament_weight = float(match.group(1))
-
-                # Extract output filename format
-                if line.startswith("; output_filename_format") or line.startswith("; filename_format"):
-                    match = re.search(r"; (?:output_)?filename_format = (.+)", line)
-                    if match:
-                        filename_format = match.group(1)
-                        logging.info(f"Using filename format: {filename_format}")
-                        
+        metadata = read_gcode_metadata(file_path)
+        filament_weight, filename_format, per_tool = metadata.weight, metadata.filename_format, metadata.per_tool
+        if filename_format:
+            logging.info(f"Using filename format: {filename_format}")
+
         # Fallback to file name if env variable not set
         if not gcode_filename:
             gcode_filename = os.path.basename(file_path).replace(".gcode", "")
@@ -71,35 +122,11 @@ def extract_gcode_info(file_path):
 
         # If a filename_format is provided, use dynamic parsing with regex.
         if filename_format:
-            # Remove trailing .gcode if present in the format string.
-            if filename_format.endswith(".gcode"):
-                filename_format = filename_format[:-6]
-
-            # Split the format string into tokens (literals and placeholders)
-            tokens = re.split(r'(\{[^}]+\})', filename_format)
-            regex_pattern = ""
-            for token in tokens:
-                logging.debug(f"Token: {token}")
-                if token.startswith("{") and token.endswith("}"):
-                    # Process placeholders.
-                    if token == "{input_filename_base}":
-                        # Use a greedy capture for the base so it can include internal separators.
-                        regex_pattern += r"(?P<input_filename_base>.+)"
-                    else:
-                        # For other placeholders, assume they do not include '-' or '_'.
-                        regex_pattern += r"[^-_]+"
-                else:
-                    # For literal parts, if the token is exactly '-' or '_', allow matching either.
-                    if token in ["-", "_"]:
-                        regex_pattern += "[-_]"
-                    else:
-                        regex_pattern += re.escape(token)
-            # Force full string match and append .gcode extension.
-            regex_pattern = "^" + regex_pattern + r"\.gcode$"
-            logging.debug(f"Constructed regex pattern: {regex_pattern}")
-            
+            regex_pattern = filename_pattern(filename_format)
+            logging.debug(f"Constructed regex pattern: {regex_pattern.pattern}")
+
             # Attempt to match the actual filename (append .gcode to match the regex).
-            match = re.match(regex_pattern, gcode_filename + ".gcode")
+            match = regex_pattern.match(gcode_filename + ".gcode")
             if match and "input_filename_base" in match.groupdict():
                 extracted = match.group("input_filename_base")
                 logging.info(f"Extracted project name: {extracted}")
@@ -115,23 +142,228 @@ def extract_gcode_info(file_path):
 
     # Only return info if filament weight was successfully extracted.
     if filament_weight is not None:
-        return {
+        info = {
             "project_name": project_name,  # Aligned field name
             "weight_used": filament_weight,  # Aligned field name
             "date": datetime.now().strftime('%Y-%m-%dT%H:%M')
         }
+        if per_tool and len(per_tool) > 1:
+            info["weight_per_tool"] = per_tool  # Multi-material print, grams used from each tool
+        return info
     return None
 
-def send_to_flask_api(data):
-    """Sends extracted print job data to the Flask backend."""
+def spool_job(data, spool_dir=SPOOL_DIR):
+    """Writes a job to the spool folder, atomically so the flusher never reads half a file."""
+    os.makedirs(spool_dir, exist_ok=True)
+    name = f"{time.time_ns()}-{uuid.uuid4().hex}.json"
+    temp_path = os.path.join(spool_dir, name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(temp_path, os.path.join(spool_dir, name))
+    logging.info(f"Spooled print job: {name}")
+
+def spooled_files(spool_dir=SPOOL_DIR):
+    if not os.path.isdir(spool_dir):
+        return []
+    return sorted(os.path.join(spool_dir, name) for name in os.listdir(spool_dir) if name.endswith(".json"))
+
+def acquire_flush_lock(spool_dir=SPOOL_DIR):
+    """Makes sure only one flusher runs at a time. Returns the lock path, or None if it's taken."""
+    lock_path = os.path.join(spool_dir, ".flush.lock")
     try:
-        response = requests.post(FILAMENT_TRACKER_API_URL, json=data)
-        if response.status_code == 200:
-            logging.info("Successfully sent data to Filament Tracker API")
-        else:
+        if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_AGE:
+            os.remove(lock_path)  # Left behind by a flusher that was killed
+    except OSError:
+        pass
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return None
+    with os.fdopen(fd, "w") as f:
+        f.write(str(os.getpid()))
+    return lock_path
+
+def api_session():
+    session = requests.Session()
+    if FILAMENT_TRACKER_API_KEY:
+        session.headers["X-API-Key"] = FILAMENT_TRACKER_API_KEY
+    return session
+
+def send_batch(session, jobs):
+    """Uploads a batch of jobs. Returns True once the server has taken them (even if it rejected some)."""
+    if FILAMENT_TRACKER_BULK_API_URL:
+        response = session.post(FILAMENT_TRACKER_BULK_API_URL, json=jobs, timeout=(5, 60))
+        if response.status_code in (200, 400):
+            for error in response.json().get("errors", []):
+                logging.error(f"Filament Tracker rejected job {jobs[error['index']]}: {error['error']}")
+            return True
+        if response.status_code != 404:
+            logging.error(f"Failed to send data: {response.status_code} {response.text}")
+            return False
+        # Server without the bulk endpoint, send the jobs one by one
+
+    for job in jobs:
+        response = session.post(FILAMENT_TRACKER_API_URL, json=job, timeout=(5, 30))
+        if response.status_code >= 500:
             logging.error(f"Failed to send data: {response.text}")
-    except Exception as e:
-        logging.error(f"Error sending data: {e}")
+            return False
+        if response.status_code != 200:
+            logging.error(f"Filament Tracker rejected job {job}: {response.text}")
+    return True
+
+def flush_spool(spool_dir=SPOOL_DIR, timeout=FLUSH_TIMEOUT, session=None):
+    """Uploads every spooled job in batches, retrying with exponential backoff until the timeout.
+
+    Returns True when the spool is empty.
+    """
+    session = session or api_session()
+    deadline = time.monotonic() + timeout
+
+    while spooled_files(spool_dir):
+        lock_path = acquire_flush_lock(spool_dir)
+        if not lock_path:
+            logging.info("Another upload is already running")
+            return False
+
+        try:
+            while files := spooled_files(spool_dir)[:SPOOL_BATCH_SIZE]:
+                jobs = []
+                for path in files:
+                    with open(path, encoding="utf-8") as f:
+                        jobs.append(json.load(f))
+
+                if not send_with_backoff(session, jobs, deadline):
+                    logging.error(f"Giving up for now, {len(spooled_files(spool_dir))} job(s) stay spooled")
+                    return False
+                for path in files:
+                    os.remove(path)
+                logging.info(f"Successfully sent {len(jobs)} job(s) to Filament Tracker API")
+        finally:
+            os.remove(lock_path)
+
+    return True
+
+def send_with_backoff(session, jobs, deadline):
+    """Uploads a batch, retrying with exponential backoff until the deadline. Returns True once sent."""
+    delay = 1
+    while True:
+        try:
+            if send_batch(session, jobs):
+                return True
+        except requests.RequestException as e:
+            logging.error(f"Error sending data: {e}")
+
+        if time.monotonic() + delay > deadline:
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, 60)
+
+def gcode_files(directory):
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.lower().endswith(".gcode"):
+                yield os.path.abspath(os.path.join(root, name))
+
+def import_file(path):
+    """Returns the content hash and the job of an archived G-code file, dated when the file was written.
+
+    Runs in the worker processes of import_directory.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+
+    # Named after the file itself, even when run from a slicer's post-processing step
+    info = extract_gcode_info(path, use_output_name=False)
+    if info:
+        info["date"] = datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%dT%H:%M')
+    return digest.hexdigest(), info
+
+def load_import_state(state_path):
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"files": {}, "hashes": []}
+
+def save_import_state(state, state_path):
+    temp_path = state_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(temp_path, state_path)
+
+def import_directory(directory, state_path=IMPORT_STATE_FILE, workers=None, min_age=0, timeout=FLUSH_TIMEOUT, session=None):
+    """Imports every G-code file of a folder (recursively) as unreviewed print jobs.
+
+    Files are parsed by a process pool and sent in batches to the bulk endpoint. Files already
+    imported (same size and modification time) are skipped, and so are copies of an already imported
+    file (same content hash). The state is saved after every batch, so an interrupted import resumes
+    where it stopped. Files modified less than min_age seconds ago are left for the next run.
+
+    Returns the number of imported jobs, or None if the server couldn't be reached.
+    """
+    state = load_import_state(state_path)
+    known_hashes = set(state["hashes"])
+
+    pending = []
+    for path in gcode_files(directory):
+        stat = os.stat(path)
+        key = [stat.st_size, stat.st_mtime_ns]
+        if state["files"].get(path) != key and time.time() - stat.st_mtime >= min_age:
+            pending.append((path, key))
+    if not pending:
+        return 0
+
+    logging.info(f"Importing {len(pending)} G-code file(s) from {directory}")
+    session = session or api_session()
+    imported = 0
+    jobs, hashes, files = [], [], {}
+
+    def send_pending():
+        nonlocal imported, jobs, hashes, files
+        if jobs and not send_with_backoff(session, jobs, time.monotonic() + timeout):
+            return False
+        imported += len(jobs)
+        state["hashes"].extend(hashes)
+        state["files"].update(files)
+        save_import_state(state, state_path)
+        jobs, hashes, files = [], [], {}
+        return True
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(import_file, [path for path, _ in pending], chunksize=16)
+        for (path, key), (digest, info) in zip(pending, results):
+            files[path] = key
+            if info and digest not in known_hashes:
+                known_hashes.add(digest)
+                hashes.append(digest)
+                jobs.append(info)
+            if len(files) >= IMPORT_BATCH_SIZE and not send_pending():
+                pool.shutdown(cancel_futures=True)
+                break
+        else:
+            if send_pending():
+                logging.info(f"Imported {imported} job(s) from {len(pending)} file(s)")
+                return imported
+
+    logging.error(f"Filament Tracker unreachable, {imported} job(s) imported so far, run the import again to resume")
+    return None
+
+def watch_directory(directory, workers=None):
+    """Imports the G-code files of a folder, then keeps importing the new ones as they appear."""
+    while True:
+        import_directory(directory, workers=workers, min_age=WATCH_INTERVAL)
+        time.sleep(WATCH_INTERVAL)
+
+def start_background_flush():
+    """Starts a detached flusher process so the slicer doesn't wait for the upload."""
+    kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "--flush"], **kwargs)
 
 def forward_to_arcwelder(file_path):
     """Calls ArcWelder with the given G-code file."""
@@ -146,11 +378,14 @@ def main():
     Basic usage:
     python3 prusa_post.py c:\\gcode\\my_file.gcode
 
+    Import an archive of already sliced files (can be interrupted and resumed)
+    python3 prusa_post.py --import-dir c:\\gcode
+
     Use with ArcWelder to convert non-arcs to arcs in the output
     python3 prusa_post.py -a c:\\gcode\\my_file.gcode
     
     Use with ArcWelder to convert non-arcs to arcs in the output, with custom path to the executable
-    ARCWELDER_PATH="C:\\tools\ArcWelder.exe" python3 prusa_post.py -a c:\\gcode\\my_file.gcode
+    ARCWELDER_PATH="C:\\tools\\ArcWelder.exe" python3 prusa_post.py -a c:\\gcode\\my_file.gcode
 
     Linux: Use with ArcWelder to convert non-arcs to arcs in the output, with custom path to the executable
     ARCWELDER_PATH=arcwelder/bin/ArcWelder python3 prusa_post.py -a ../gcode/face_0.4n_0.2mm_PETG_MINI_1d5h24m.gcode
@@ -171,9 +406,42 @@ def main():
         help='Use ArcWelder for converting G-code short lines to arcs',
         action='store_true'
     )
+    parser.add_argument(
+        "--flush",
+        help='Upload the spooled print jobs and exit',
+        action='store_true'
+    )
+    parser.add_argument(
+        "--wait",
+        help='Upload the print job before exiting instead of in the background',
+        action='store_true'
+    )
+    parser.add_argument(
+        "--import-dir",
+        help='Import every G-code file of a folder (e.g. an archive of sliced files) and exit',
+        metavar="DIR"
+    )
+    parser.add_argument(
+        "--watch",
+        help='With --import-dir, keep watching the folder for new G-code files',
+        action='store_true'
+    )
+    parser.add_argument(
+        "--workers",
+        help='Number of processes parsing G-code files during an import (default: one per CPU)',
+        type=int
+    )
 
     args = parser.parse_args()
 
+    if args.flush:
+        sys.exit(0 if flush_spool() else 1)
+
+    if args.import_dir:
+        if args.watch:
+            watch_directory(args.import_dir, workers=args.workers)
+        sys.exit(0 if import_directory(args.import_dir, workers=args.workers) is not None else 1)
+
     # If no argument is passed, fall back to sys.argv (for PrusaSlicer execution)
     gcode_path = args.input if args.input else (sys.argv[1] if len(sys.argv) > 1 else None)
 
@@ -184,14 +452,20 @@ def main():
 
     print(f"Processing G-code: {gcode_path}")
 
+    # The metadata must be read before ArcWelder rewrites the file
     extracted_data = extract_gcode_info(gcode_path)
     if extracted_data:
-        send_to_flask_api(extracted_data)
+        spool_job(extracted_data)
+        if not args.wait:
+            start_background_flush()  # Uploads while ArcWelder runs
 
     # Forward the file to ArcWelder for further processing if needed
     if args.arcwelder:
         forward_to_arcwelder(gcode_path)
 
+    if extracted_data and args.wait:
+        flush_spool()
+
 if __name__ == "__main__":
     main()
     # Uncomment for debugging
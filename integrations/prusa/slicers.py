@@ -0,0 +1,161 @@
+"""Slicer detection and G-code metadata extraction.
+
+Every supported slicer is described by a Slicer entry with its header signature and the
+comments holding the filament weight and the filename format, each a literal key and the
+(precompiled) pattern of its line. detect_slicer picks the entry matching the header of a file,
+GENERIC covers unknown slicers.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# weight: total filament weight in grams over every tool (None if not found)
+# per_tool: weight of every extruder / filament slot, as listed by the slicer
+GcodeMetadata = namedtuple("GcodeMetadata", ["weight", "filename_format", "per_tool", "slicer"])
+
+# key: the literal text of the comment, searched for before the pattern is tried on its line
+Comment = namedtuple("Comment", ["key", "pattern"])
+
+def parse_weights(value):
+    """Parses a weight list like b"12.3, 4.5" (one entry per tool). Returns None if it isn't one."""
+    try:
+        return [float(weight) for weight in value.split(b",")]
+    except ValueError:
+        return None
+
+class Slicer:
+    def __init__(self, name, signature, per_tool_comments, total_comments, filename_format_comments):
+        self.name = name
+        self.signature = re.compile(signature, re.MULTILINE)
+        self.per_tool_comments = per_tool_comments
+        self.total_comments = total_comments
+        self.filename_format_comments = filename_format_comments
+        self.keys = {c.key for c in per_tool_comments + total_comments + filename_format_comments}
+
+    def __repr__(self):
+        return f"<Slicer {self.name}>"
+
+    @staticmethod
+    def last_match(comments, regions):
+        """Returns the value of the last occurrence of the first comment found in the regions."""
+        for comment in comments:
+            value = None
+            for region in regions:
+                for match in comment.pattern.finditer(region):
+                    value = match.group(1)
+            if value is not None:
+                return value
+        return None
+
+    def key_lines(self, data):
+        """The lines of data (e.g. a whole memory-mapped file) holding one of the slicer's keys.
+
+        The keys are found with a plain substring search, much faster than running the line
+        patterns over every line of the moves. The lines are returned in file order, for parse.
+        """
+        starts = set()
+        for key in self.keys:
+            position = data.find(key)
+            while position != -1:
+                starts.add(data.rfind(b"\n", 0, position) + 1)
+                position = data.find(key, position + len(key))
+        lines = []
+        for start in sorted(starts):
+            end = data.find(b"\n", start)
+            lines.append(data[start:end + 1 if end != -1 else len(data)])
+        return lines
+
+    def parse(self, regions):
+        """Extracts the metadata from the given byte regions of a G-code file."""
+        per_tool = None
+        value = self.last_match(self.per_tool_comments, regions)
+        if value is not None:
+            per_tool = parse_weights(value)
+
+        # Some slicers list the total per filament too
+        total = self.last_match(self.total_comments, regions)
+        if total is not None:
+            total = parse_weights(total)
+        if total:
+            weight = round(sum(total), 2)
+        elif per_tool:
+            weight = round(sum(per_tool), 2)
+        else:
+            weight = None
+
+        filename_format = self.last_match(self.filename_format_comments, regions)
+        if filename_format is not None:
+            filename_format = filename_format.decode("utf-8", errors="replace")
+
+        return GcodeMetadata(weight, filename_format, per_tool, self.name)
+
+# Comment keys shared by the slicer families
+LINE_START = rb"^[ \t]*; "
+WEIGHT_LIST = rb"([\d.]+(?:[ \t]*,[ \t]*[\d.]+)*)"
+VALUE = rb"(.+?)[ \t\r]*$"
+
+def comment(key, value):
+    """A "; <key><value>" comment line, the value captured by the pattern's first group."""
+    return Comment(key, re.compile(LINE_START + re.escape(key) + value, re.MULTILINE))
+
+# PrusaSlicer and its forks: "; filament used [g] = 12.3, 4.5" and "; total filament used [g] = 16.8"
+PRUSA_PER_TOOL = [comment(b"filament used [g] = ", WEIGHT_LIST)]
+PRUSA_TOTAL = [comment(b"total filament used [g] = ", WEIGHT_LIST)]
+# Older releases write the format as "; filename_format = "
+PRUSA_FILENAME_FORMAT = [comment(b"output_filename_format = ", VALUE), comment(b"filename_format = ", VALUE)]
+
+# OrcaSlicer, BambuStudio and their forks: "; total filament weight [g] : 16.8" in the header block
+ORCA_PER_TOOL = PRUSA_PER_TOOL
+ORCA_TOTAL = [comment(b"total filament weight [g] : ", WEIGHT_LIST)] + PRUSA_TOTAL
+ORCA_FILENAME_FORMAT = [comment(b"filename_format = ", VALUE)]
+
+SLICERS = [
+    Slicer("PrusaSlicer", rb"^; generated by PrusaSlicer", PRUSA_PER_TOOL, PRUSA_TOTAL, PRUSA_FILENAME_FORMAT),
+    Slicer("SuperSlicer", rb"^; generated by (?:SuperSlicer|Slic3r)", PRUSA_PER_TOOL, PRUSA_TOTAL, PRUSA_FILENAME_FORMAT),
+    Slicer("OrcaSlicer", rb"^; generated by OrcaSlicer", ORCA_PER_TOOL, ORCA_TOTAL, ORCA_FILENAME_FORMAT),
+    Slicer("BambuStudio", rb"^; (?:generated by )?BambuStudio", ORCA_PER_TOOL, ORCA_TOTAL, ORCA_FILENAME_FORMAT),
+    Slicer("AnycubicSlicerNext", rb"^; generated by AnycubicSlicerNext", ORCA_PER_TOOL, ORCA_TOTAL, ORCA_FILENAME_FORMAT),
+    Slicer(
+        "AnycubicSlicer", rb"^; generated by AnycubicSlicer",
+        PRUSA_PER_TOOL, ORCA_TOTAL, PRUSA_FILENAME_FORMAT,
+    ),
+]
+
+# Unknown slicers: try every known key
+GENERIC = Slicer("Unknown", rb"(?!)", PRUSA_PER_TOOL, ORCA_TOTAL, PRUSA_FILENAME_FORMAT)
+
+def detect_slicer(header):
+    """Returns the slicer that generated a file from the first bytes of it."""
+    for slicer in SLICERS:
+        if slicer.signature.search(header):
+            return slicer
+    return GENERIC
+
+@lru_cache(maxsize=32)
+def filename_pattern(filename_format):
+    """Builds the regex matching the file names produced by a slicer's filename format.
+
+    The base name of the input file is captured as input_filename_base.
+    """
+    # Remove trailing .gcode if present in the format string.
+    if filename_format.endswith(".gcode"):
+        filename_format = filename_format[:-6]
+
+    # Split the format string into tokens (literals and placeholders)
+    regex_pattern = ""
+    for token in re.split(r'(\{[^}]+\})', filename_format):
+        if token.startswith("{") and token.endswith("}"):
+            # Process placeholders.
+            if token == "{input_filename_base}":
+                # Use a greedy capture for the base so it can include internal separators.
+                regex_pattern += r"(?P<input_filename_base>.+)"
+            else:
+                # For other placeholders, assume they do not include '-' or '_'.
+                regex_pattern += r"[^-_]+"
+        elif token in ["-", "_"]:
+            # For literal parts, if the token is exactly '-' or '_', allow matching either.
+            regex_pattern += "[-_]"
+        else:
+            regex_pattern += re.escape(token)
+    # Force full string match and append .gcode extension.
+    return re.compile("^" + regex_pattern + r"\.gcode$")
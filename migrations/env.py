@@ -51,6 +51,17 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_name(name, type_, parent_names):
+    # The search index of a table is a FTS5 table named <table>_fts with its shadow tables
+    # (<table>_fts_data, _idx, ...) on SQLite, and a GIN index named ix_<table>_search on
+    # PostgreSQL, made by hand in cac14657bd1e rather than from the models
+    if type_ == 'table':
+        return not any(name.startswith(f'{table}_fts') for table in get_metadata().tables)
+    if type_ == 'index':
+        return name != f"ix_{parent_names['table_name']}_search"
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +76,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_name=include_name
     )
 
     with context.begin_transaction():
@@ -93,6 +105,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_name", include_name)
 
     connectable = get_engine()
 
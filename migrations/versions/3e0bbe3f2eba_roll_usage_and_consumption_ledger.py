@@ -0,0 +1,53 @@
+"""Roll usage summary and consumption ledger
+
+Revision ID: 3e0bbe3f2eba
+Revises: cac14657bd1e
+Create Date: 2026-10-18 10:41:17.932054
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e0bbe3f2eba'
+down_revision = 'cac14657bd1e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('roll_usage',
+    sa.Column('roll_id', sa.Integer(), nullable=False),
+    sa.Column('grams_used', sa.Float(), nullable=False),
+    sa.Column('job_count', sa.Integer(), nullable=False),
+    sa.Column('last_used', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['roll_id'], ['filament_roll.id'], ),
+    sa.PrimaryKeyConstraint('roll_id')
+    )
+    op.create_table('consumption_ledger',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('roll_id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=True),
+    sa.Column('grams', sa.Float(), nullable=False),
+    sa.Column('reason', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('consumption_ledger', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_consumption_ledger_roll_id'), ['roll_id'], unique=False)
+
+    # Seed the summary from the existing print history
+    op.execute(
+        'INSERT INTO roll_usage (roll_id, grams_used, job_count, last_used) '
+        'SELECT filament_id, SUM(weight_used), COUNT(id), MAX(date) FROM print_job '
+        'WHERE filament_id IN (SELECT id FROM filament_roll) GROUP BY filament_id'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('consumption_ledger', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_consumption_ledger_roll_id'))
+
+    op.drop_table('consumption_ledger')
+    op.drop_table('roll_usage')
@@ -0,0 +1,36 @@
+"""Per table change counters
+
+Revision ID: 4fa02924e4f2
+Revises: c264333d8ac1
+Create Date: 2026-10-18 12:37:44.093815
+
+"""
+import random
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4fa02924e4f2'
+down_revision = 'c264333d8ac1'
+branch_labels = None
+depends_on = None
+
+
+VERSIONED_TABLES = ['filament_roll', 'print_job', 'print_job_usage', 'temp_print_job', 'roll_usage']
+
+
+def upgrade():
+    data_version = op.create_table('data_version',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    # Random start, so a recreated database never repeats the versions of the one it replaces
+    op.bulk_insert(data_version, [
+        {'table_name': table, 'version': random.randrange(2 ** 30)} for table in VERSIONED_TABLES
+    ])
+
+
+def downgrade():
+    op.drop_table('data_version')
@@ -0,0 +1,60 @@
+"""Monthly usage rollups
+
+Revision ID: 7e01b85ae5c3
+Revises: 4fa02924e4f2
+Create Date: 2026-10-18 13:32:46.487209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e01b85ae5c3'
+down_revision = '4fa02924e4f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('monthly_roll_usage',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('roll_id', sa.Integer(), nullable=False),
+    sa.Column('grams', sa.Float(), nullable=False),
+    sa.Column('job_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['roll_id'], ['filament_roll.id'], ),
+    sa.PrimaryKeyConstraint('month', 'roll_id')
+    )
+    with op.batch_alter_table('monthly_roll_usage', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_monthly_roll_usage_roll_id'), ['roll_id'], unique=False)
+
+    op.create_table('monthly_project_usage',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('project_name', sa.String(length=255), nullable=False),
+    sa.Column('grams', sa.Float(), nullable=False),
+    sa.Column('job_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('month', 'project_name')
+    )
+
+    # Seed the rollups from the existing print history
+    if op.get_bind().dialect.name == 'sqlite':
+        month = "date(print_job.date, 'start of month')"
+    else:
+        month = "CAST(date_trunc('month', print_job.date) AS DATE)"
+    for table, column in (('monthly_roll_usage', 'print_job_usage.roll_id'),
+                          ('monthly_project_usage', 'print_job.project_name')):
+        op.execute(
+            f'INSERT INTO {table} (month, {column.split(".")[1]}, grams, job_count) '
+            f'SELECT {month}, {column}, SUM(print_job_usage.grams), COUNT(print_job_usage.job_id) '
+            'FROM print_job_usage JOIN print_job ON print_job.id = print_job_usage.job_id '
+            'WHERE print_job.date IS NOT NULL '
+            f'GROUP BY {month}, {column}'
+        )
+
+
+def downgrade():
+    op.drop_table('monthly_project_usage')
+    with op.batch_alter_table('monthly_roll_usage', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_monthly_roll_usage_roll_id'))
+
+    op.drop_table('monthly_roll_usage')
@@ -0,0 +1,175 @@
+"""Sites and printers
+
+Revision ID: 9a4c1d7e2b60
+Revises: 5b8e2f0d91c4
+Create Date: 2026-10-18 17:21:05.664128
+
+"""
+import random
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c1d7e2b60'
+down_revision = '5b8e2f0d91c4'
+branch_labels = None
+depends_on = None
+
+
+# The search index of these tables is kept in sync by triggers (see cac14657bd1e), which are
+# lost when batch mode recreates a table on SQLite
+FTS_TABLES = {
+    'print_job': ['project_name'],
+    'temp_print_job': ['project_name'],
+    'filament_roll': ['maker', 'color'],
+}
+
+
+def restore_search_triggers():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    # The rows keep their ids in the copy, so the index itself still matches them
+    for table, columns in FTS_TABLES.items():
+        fts = f'{table}_fts'
+        cols = ', '.join(columns)
+        new_values = ', '.join(f'new.{c}' for c in columns)
+        old_values = ', '.join(f'old.{c}' for c in columns)
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+
+
+def add_site_id(batch_op, table):
+    batch_op.add_column(sa.Column('site_id', sa.Integer(), server_default='1', nullable=False))
+    batch_op.create_foreign_key(f'fk_{table}_site_id_site', 'site', ['site_id'], ['id'])
+
+
+def add_printer_id(batch_op, table):
+    batch_op.add_column(sa.Column('printer_id', sa.Integer(), nullable=True))
+    batch_op.create_foreign_key(f'fk_{table}_printer_id_printer', 'printer', ['printer_id'], ['id'], ondelete='SET NULL')
+
+
+def upgrade():
+    site = op.create_table('site',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    # Everything recorded so far belongs to the default site (id 1)
+    op.bulk_insert(site, [{'id': 1, 'name': 'Default'}])
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("SELECT setval(pg_get_serial_sequence('site', 'id'), 1)")
+
+    op.create_table('printer',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('site_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('api_key_hash', sa.String(length=64), nullable=False),
+    sa.ForeignKeyConstraint(['site_id'], ['site.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('api_key_hash')
+    )
+    with op.batch_alter_table('printer', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_printer_site_id'), ['site_id'], unique=False)
+
+    # Everything recorded so far is the default site's
+    with op.batch_alter_table('filament_roll', schema=None) as batch_op:
+        add_site_id(batch_op, 'filament_roll')
+        batch_op.create_index(batch_op.f('ix_filament_roll_site_id'), ['site_id'], unique=False)
+    with op.batch_alter_table('print_job', schema=None) as batch_op:
+        add_site_id(batch_op, 'print_job')
+        add_printer_id(batch_op, 'print_job')
+        batch_op.create_index('ix_print_job_site_id_date_id', ['site_id', 'date', 'id'], unique=False)
+        batch_op.drop_index('ix_print_job_date_id')
+    with op.batch_alter_table('temp_print_job', schema=None) as batch_op:
+        add_site_id(batch_op, 'temp_print_job')
+        add_printer_id(batch_op, 'temp_print_job')
+        batch_op.create_index('ix_temp_print_job_site_id_date', ['site_id', 'date'], unique=False)
+    restore_search_triggers()
+
+    # The project rollup is kept per site, rebuilt from the (default site's) print history
+    op.drop_table('monthly_project_usage')
+    op.create_table('monthly_project_usage',
+    sa.Column('site_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('project_name', sa.String(length=255), nullable=False),
+    sa.Column('grams', sa.Float(), nullable=False),
+    sa.Column('job_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['site_id'], ['site.id'], ),
+    sa.PrimaryKeyConstraint('site_id', 'month', 'project_name')
+    )
+    if op.get_bind().dialect.name == 'sqlite':
+        month = "date(print_job.date, 'start of month')"
+    else:
+        month = "CAST(date_trunc('month', print_job.date) AS DATE)"
+    op.execute(
+        'INSERT INTO monthly_project_usage (site_id, month, project_name, grams, job_count) '
+        f'SELECT print_job.site_id, {month}, print_job.project_name, '
+        'SUM(print_job_usage.grams), COUNT(print_job_usage.job_id) '
+        'FROM print_job_usage JOIN print_job ON print_job.id = print_job_usage.job_id '
+        'WHERE print_job.date IS NOT NULL '
+        f'GROUP BY print_job.site_id, {month}, print_job.project_name'
+    )
+
+    data_version = sa.table('data_version', sa.column('table_name', sa.String), sa.column('version', sa.Integer))
+    op.bulk_insert(data_version, [{'table_name': 'site', 'version': random.randrange(2 ** 30)}])
+
+
+def downgrade():
+    op.execute("DELETE FROM data_version WHERE table_name = 'site'")
+
+    op.drop_table('monthly_project_usage')
+    op.create_table('monthly_project_usage',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('project_name', sa.String(length=255), nullable=False),
+    sa.Column('grams', sa.Float(), nullable=False),
+    sa.Column('job_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('month', 'project_name')
+    )
+    if op.get_bind().dialect.name == 'sqlite':
+        month = "date(print_job.date, 'start of month')"
+    else:
+        month = "CAST(date_trunc('month', print_job.date) AS DATE)"
+    op.execute(
+        'INSERT INTO monthly_project_usage (month, project_name, grams, job_count) '
+        f'SELECT {month}, print_job.project_name, SUM(print_job_usage.grams), COUNT(print_job_usage.job_id) '
+        'FROM print_job_usage JOIN print_job ON print_job.id = print_job_usage.job_id '
+        'WHERE print_job.date IS NOT NULL '
+        f'GROUP BY {month}, print_job.project_name'
+    )
+
+    with op.batch_alter_table('temp_print_job', schema=None) as batch_op:
+        batch_op.drop_index('ix_temp_print_job_site_id_date')
+        batch_op.drop_constraint('fk_temp_print_job_printer_id_printer', type_='foreignkey')
+        batch_op.drop_constraint('fk_temp_print_job_site_id_site', type_='foreignkey')
+        batch_op.drop_column('printer_id')
+        batch_op.drop_column('site_id')
+    with op.batch_alter_table('print_job', schema=None) as batch_op:
+        batch_op.create_index('ix_print_job_date_id', ['date', 'id'], unique=False)
+        batch_op.drop_index('ix_print_job_site_id_date_id')
+        batch_op.drop_constraint('fk_print_job_printer_id_printer', type_='foreignkey')
+        batch_op.drop_constraint('fk_print_job_site_id_site', type_='foreignkey')
+        batch_op.drop_column('printer_id')
+        batch_op.drop_column('site_id')
+    with op.batch_alter_table('filament_roll', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_filament_roll_site_id'))
+        batch_op.drop_constraint('fk_filament_roll_site_id_site', type_='foreignkey')
+        batch_op.drop_column('site_id')
+    restore_search_triggers()
+
+    with op.batch_alter_table('printer', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_printer_site_id'))
+    op.drop_table('printer')
+    op.drop_table('site')
@@ -0,0 +1,27 @@
+"""Print job keyset indexes
+
+Revision ID: b71ac0cc0f3a
+Revises: 0c701aa35f43
+Create Date: 2026-10-18 09:12:04.518230
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71ac0cc0f3a'
+down_revision = '0c701aa35f43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('print_job', schema=None) as batch_op:
+        batch_op.create_index('ix_print_job_date_id', ['date', 'id'], unique=False)
+        batch_op.create_index('ix_print_job_filament_id_date', ['filament_id', 'date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('print_job', schema=None) as batch_op:
+        batch_op.drop_index('ix_print_job_filament_id_date')
+        batch_op.drop_index('ix_print_job_date_id')
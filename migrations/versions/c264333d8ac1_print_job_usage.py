@@ -0,0 +1,46 @@
+"""Per roll usage of print jobs
+
+Revision ID: c264333d8ac1
+Revises: 3e0bbe3f2eba
+Create Date: 2026-10-18 11:52:06.418327
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c264333d8ac1'
+down_revision = '3e0bbe3f2eba'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('print_job_usage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('roll_id', sa.Integer(), nullable=False),
+    sa.Column('grams', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['job_id'], ['print_job.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['roll_id'], ['filament_roll.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('print_job_usage', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_print_job_usage_job_id'), ['job_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_print_job_usage_roll_id'), ['roll_id'], unique=False)
+
+    # Every existing job used a single roll
+    op.execute(
+        'INSERT INTO print_job_usage (job_id, roll_id, grams) '
+        'SELECT id, filament_id, weight_used FROM print_job '
+        'WHERE filament_id IN (SELECT id FROM filament_roll)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('print_job_usage', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_print_job_usage_roll_id'))
+        batch_op.drop_index(batch_op.f('ix_print_job_usage_job_id'))
+
+    op.drop_table('print_job_usage')
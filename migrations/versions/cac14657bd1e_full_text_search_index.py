@@ -0,0 +1,79 @@
+"""Full text search index
+
+Revision ID: cac14657bd1e
+Revises: b71ac0cc0f3a
+Create Date: 2026-10-18 10:03:41.207611
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'cac14657bd1e'
+down_revision = 'b71ac0cc0f3a'
+branch_labels = None
+depends_on = None
+
+
+FTS_TABLES = {
+    'print_job': ['project_name'],
+    'temp_print_job': ['project_name'],
+    'filament_roll': ['maker', 'color'],
+}
+
+
+def tsvector(columns):
+    return "to_tsvector('simple', " + " || ' ' || ".join(columns) + ")"
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # FTS5 is SQLite only, PostgreSQL gets GIN indexes over the same columns
+        for table, columns in FTS_TABLES.items():
+            op.execute(f'CREATE INDEX ix_{table}_search ON {table} USING gin ({tsvector(columns)})')
+        return
+    if dialect != 'sqlite':
+        return
+
+    for table, columns in FTS_TABLES.items():
+        fts = f'{table}_fts'
+        cols = ', '.join(columns)
+        new_values = ', '.join(f'new.{c}' for c in columns)
+        old_values = ', '.join(f'old.{c}' for c in columns)
+
+        op.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+        # Index the rows that already exist
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in FTS_TABLES:
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search')
+        return
+    if dialect != 'sqlite':
+        return
+
+    for table in FTS_TABLES:
+        fts = f'{table}_fts'
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+        op.execute(f'DROP TABLE IF EXISTS {fts}')
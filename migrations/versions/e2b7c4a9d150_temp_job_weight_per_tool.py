@@ -0,0 +1,25 @@
+"""Weight per tool of unreviewed jobs
+
+Revision ID: e2b7c4a9d150
+Revises: 9a4c1d7e2b60
+Create Date: 2026-10-18 19:04:37.215906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7c4a9d150'
+down_revision = '9a4c1d7e2b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A plain ADD COLUMN, a batch operation would recreate the table without its search index triggers
+    op.add_column('temp_print_job', sa.Column('weight_per_tool', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('temp_print_job', 'weight_per_tool')
@@ -1,20 +1,28 @@
+import os
 import pytest
+from sqlalchemy import event
+
+# Must be set before the app (and its engine) is created. Set TEST_DATABASE_URL to run
+# the suite against another database, e.g. postgresql://postgres@localhost/filatrack_test
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or "sqlite:///:memory:"
+
 from app import app, db
-from app.models import FilamentRoll, PrintJob
+from app.models import FilamentRoll
 
 @pytest.fixture
 def client():
     """Create a test client for the Flask app."""
     app.config["TESTING"] = True
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"  # Use in-memory DB for testing
     app.config["WTF_CSRF_ENABLED"] = False  # Disable CSRF for tests
 
     with app.test_client() as client:
         with app.app_context():
             db.create_all()
         yield client
-        with app.app_context():
-            db.drop_all()
+
+    # Outside the client block, so no preserved request context holds a transaction open
+    with app.app_context():
+        db.drop_all()
 
 @pytest.fixture
 def init_database():
@@ -24,3 +32,34 @@ def init_database():
         filament2 = FilamentRoll(maker="ESun", color="White", total_weight=750, remaining_weight=750, in_use=True)
         db.session.add_all([filament1, filament2])
         db.session.commit()
+
+@pytest.fixture
+def add_print(client):
+    """Returns a function that adds a print job of one roll through the form."""
+    def add(weight, filament_id=1, project_name="Test Print", date="2025-02-08T14:30"):
+        return client.post("/add_print", data={
+            "filament_id": filament_id,
+            "weight_used": weight,
+            "project_name": project_name,
+            "date": date
+        })
+    return add
+
+@pytest.fixture
+def no_slicer_env(monkeypatch):
+    """Clear the output name PrusaSlicer gives post-processing scripts, in case the tests run from one."""
+    monkeypatch.delenv("SLIC3R_PP_OUTPUT_NAME", raising=False)
+
+@pytest.fixture
+def query_counter():
+    """Count the SQL statements executed while the fixture is active."""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(engine, "before_cursor_execute", count)
@@ -0,0 +1,58 @@
+; HEADER_BLOCK_START
+; generated by AnycubicSlicerNext 1.3.0.2 on 2025-01-20 at 08:15:02
+; model printing time: 45m 10s; total estimated time: 49m 2s
+; total layer number: 300
+; total filament length [mm] : 2410.00
+; total filament volume [cm^3] : 5796.79
+; total filament weight [g] : 7.19
+; HEADER_BLOCK_END
+
+M73 P0 R49
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+; filament used [mm] = 2410.00
+; filament used [cm3] = 5.80
+; filament used [g] = 7.19
+; filament cost = 0.14
+
+; CONFIG_BLOCK_START
+; filename_format = {input_filename_base}_{filament_type[0]}.gcode
+; CONFIG_BLOCK_END
@@ -0,0 +1,62 @@
+; HEADER_BLOCK_START
+; BambuStudio 01.09.05.51
+; model printing time: 2h 3m 1s; total estimated time: 2h 10m 8s
+; total layer number: 200
+; total filament length [mm] : 7000.12,1200.55
+; total filament volume [cm^3] : 16837.02,2887.65
+; total filament weight [g] : 20.88,3.58
+; filament_density: 1.24,1.24
+; filament_diameter: 1.75,1.75
+; max_z_height: 40.00
+; HEADER_BLOCK_END
+
+M73 P0 R130
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+; filament used [mm] = 7000.12, 1200.55
+; filament used [cm3] = 16.84, 2.89
+; filament used [g] = 20.88, 3.58
+; filament cost = 0.42, 0.07
+; total filament used [g] = 24.46
+
+; CONFIG_BLOCK_START
+; filename_format = {input_filename_base}_plate_{plate_number}.gcode
+; CONFIG_BLOCK_END
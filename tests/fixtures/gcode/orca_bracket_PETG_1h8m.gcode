@@ -0,0 +1,69 @@
+; HEADER_BLOCK_START
+; generated by OrcaSlicer 2.1.1 on 2024-07-12 at 10:20:30
+; model printing time: 1h 2m 5s; total estimated time: 1h 8m 40s
+; total layer number: 120
+; total filament length [mm] : 4500.10
+; total filament volume [cm^3] : 10823.40
+; total filament weight [g] : 13.75
+; filament_density: 1.27
+; filament_diameter: 1.75
+; max_z_height: 24.00
+; HEADER_BLOCK_END
+
+; HEADER_BLOCK_START
+; THUMBNAIL_BLOCK_END
+
+M73 P0 R68
+M106 S0
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+; filament used [mm] = 4500.10
+; filament used [cm3] = 10.82
+; filament used [g] = 13.75
+; filament cost = 0.30
+; total filament used [g] = 13.75
+; total filament cost = 0.30
+; total layers count = 120
+
+; CONFIG_BLOCK_START
+; filament_type = PETG
+; filename_format = {input_filename_base}_{filament_type[0]}_{print_time}.gcode
+; CONFIG_BLOCK_END
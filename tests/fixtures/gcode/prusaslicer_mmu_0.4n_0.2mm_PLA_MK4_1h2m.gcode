@@ -0,0 +1,62 @@
+; generated by PrusaSlicer 2.8.1+win64 on 2024-11-03 at 18:42:10 UTC
+
+; 
+
+; external perimeters extrusion width = 0.45mm
+; perimeters extrusion width = 0.45mm
+
+M73 P0 R62
+M201 X4000 Y4000 Z200 E2500
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+; filament used [mm] = 4123.58, 1508.91
+; filament used [cm3] = 9.92, 3.63
+; filament used [g] = 12.30, 4.50
+; filament cost = 0.25, 0.09
+; total filament used [g] = 16.80
+; total filament cost = 0.34
+; estimated printing time (normal mode) = 1h 2m 11s
+
+; prusaslicer_config = begin
+; filament_type = PLA;PLA
+; output_filename_format = {input_filename_base}_{nozzle_diameter[0]}n_{layer_height}mm_{printing_filament_types}_{printer_model}_{print_time}.gcode
+; printer_model = MK4
+; prusaslicer_config = end
@@ -0,0 +1,44 @@
+; generated by SuperSlicer 2.5.59.13 on 2024-06-14 at 09:12:44 UTC
+
+; external perimeters extrusion width = 0.45mm
+; perimeters extrusion width = 0.45mm
+
+M73 P0 R41
+M201 X1000 Y1000 Z200 E5000
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+G1 X110.512 Y98.227 E.02731
+G1 X111.204 Y98.919 E.03562
+; filament used [mm] = 2268.41
+; filament used [cm3] = 5.46
+; filament used [g] = 6.98
+; filament cost = 0.14
+; total filament used [g] = 6.98
+; total filament cost = 0.14
+; estimated printing time (normal mode) = 41m 5s
+
+; SuperSlicer_config = begin
+; filament_type = PETG
+; filename_format = {input_filename_base}_{printing_filament_types}.gcode
+; printer_model = MK3S
+; SuperSlicer_config = end
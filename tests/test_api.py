@@ -0,0 +1,163 @@
+import pytest
+from datetime import datetime, timedelta
+from app import app, db
+from app.models import LOCAL_TZ, DataVersion
+
+def test_api_rolls(client, init_database, add_print):
+    """Test listing rolls with their usage, field selection and filters."""
+    add_print(20)
+
+    rolls = client.get("/api/v1/rolls").get_json()["rolls"]
+    assert [roll["maker"] for roll in rolls] == ["Prusa", "ESun"]
+    assert rolls[0]["remaining_weight"] == 480
+    assert (rolls[0]["grams_used"], rolls[0]["job_count"], rolls[0]["last_used"]) == (20, 1, "2025-02-08T14:30")
+    assert (rolls[1]["grams_used"], rolls[1]["job_count"]) == (0, 0)
+
+    response = client.get("/api/v1/rolls", query_string={"fields": "id,color", "min_remaining_weight": 600})
+    assert response.get_json()["rolls"] == [{"id": 2, "color": "White"}]
+    assert client.get("/api/v1/rolls", query_string={"in_use": "false"}).get_json()["rolls"] == []
+
+def test_api_invalid_requests(client, init_database):
+    """Ensure unknown fields, filters and bad values are rejected."""
+    assert client.get("/api/v1/rolls", query_string={"fields": "id,secret"}).status_code == 400
+    assert client.get("/api/v1/rolls", query_string={"owner": "me"}).status_code == 400
+    assert client.get("/api/v1/rolls", query_string={"min_total_weight": "heavy"}).status_code == 400
+    assert client.get("/api/v1/jobs", query_string={"cursor": "nope"}).status_code == 400
+
+def test_api_jobs_pagination_and_allocations(client, init_database, add_print):
+    """Test paginating the print history and reading the rolls of every job."""
+    for day in range(1, 4):
+        add_print(day, date=f"2025-02-0{day}T10:00", project_name=f"Job {day}")
+    client.post("/add_print", data={
+        "filament_id": [1, 2],
+        "weight_used": [3, 2],
+        "project_name": "Two Colours",
+        "date": "2025-02-05T10:00"
+    })
+
+    page = client.get("/api/v1/jobs", query_string={"limit": 2, "fields": "project_name,allocations"}).get_json()
+    assert [job["project_name"] for job in page["jobs"]] == ["Two Colours", "Job 3"]
+    assert page["jobs"][0]["allocations"] == [
+        {"filament_id": 1, "weight_used": 3}, {"filament_id": 2, "weight_used": 2}
+    ]
+
+    page = client.get("/api/v1/jobs", query_string={"limit": 2, "cursor": page["next_cursor"]}).get_json()
+    assert [job["project_name"] for job in page["jobs"]] == ["Job 2", "Job 1"]
+    assert page["next_cursor"] is None
+
+    jobs = client.get("/api/v1/jobs", query_string={"min_date": "2025-02-02", "max_weight_used": 2.5}).get_json()["jobs"]
+    assert [job["project_name"] for job in jobs] == ["Job 2"]
+
+def test_api_temp_jobs(client):
+    """Test listing the unreviewed jobs."""
+    client.post("/add_temp_jobs", json=[{"project_name": "Upload", "weight_used": 10, "date": "2025-02-08T14:30"}])
+    assert client.get("/api/v1/temp_jobs").get_json()["temp_jobs"] == [
+        {"id": 1, "project_name": "Upload", "date": "2025-02-08T14:30", "weight_used": 10, "printer_id": None}
+    ]
+
+def test_api_conditional_get(client, init_database, query_counter, add_print):
+    """Ensure polling with the ETag costs one query until the data changes."""
+    response = client.get("/api/v1/rolls")
+    etag = response.headers["ETag"]
+    assert not response.headers["ETag"].startswith("W/")
+
+    query_counter.clear()
+    response = client.get("/api/v1/rolls", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert len(query_counter) == 1
+
+    # A different field selection is a different representation
+    assert client.get("/api/v1/rolls?fields=id", headers={"If-None-Match": etag}).status_code == 200
+
+    # Unrelated tables don't invalidate the rolls
+    client.post("/add_temp_job", json={"project_name": "Temp Job", "weight_used": 5})
+    assert client.get("/api/v1/rolls", headers={"If-None-Match": etag}).status_code == 304
+
+    add_print(20)
+    response = client.get("/api/v1/rolls", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_bulk_statements_bump_versions(client, init_database):
+    """Ensure bulk inserts and deletes, which bypass the ORM flush, count as changes."""
+    def version(table):
+        with app.app_context():
+            return db.session.get(DataVersion, table).version
+
+    before = version("temp_print_job")
+    client.post("/add_temp_jobs", json=[{"project_name": "Upload", "weight_used": 10}])
+    assert version("temp_print_job") == before + 1
+
+    client.post("/review_temp_jobs", json={"reject": [1]})
+    assert version("temp_print_job") == before + 2
+
+def test_api_stats(client, init_database, add_print):
+    """Test consumption bucketed per day, week and month and split by roll attributes or project."""
+    add_print(10, date="2025-02-03T10:00", project_name="Benchy")  # Monday
+    add_print(20, date="2025-02-09T22:00", project_name="Benchy")  # Sunday, same week
+    add_print(5, filament_id=2, date="2025-02-10T08:00", project_name="Vase")
+    add_print(7, date="2025-03-15T12:00", project_name="Vase")
+
+    stats = client.get("/api/v1/stats", query_string={"period": "day"}).get_json()
+    assert stats["buckets"] == ["2025-02-03", "2025-02-09", "2025-02-10", "2025-03-15"]
+    assert stats["series"] == [{"grams": [10, 20, 5, 7]}]
+
+    stats = client.get("/api/v1/stats", query_string={"period": "week", "by": "maker"}).get_json()
+    assert stats["buckets"] == ["2025-02-03", "2025-02-10", "2025-03-10"]
+    assert stats["series"] == [{"maker": "Prusa", "grams": [30, 0, 7]}, {"maker": "ESun", "grams": [0, 5, 0]}]
+    assert client.get("/api/v1/stats", query_string={"period": "week", "min_date": "2025-03-01"}).get_json()["series"] == [
+        {"grams": [7]}
+    ]
+
+    stats = client.get("/api/v1/stats", query_string={"by": "project,color"}).get_json()
+    assert stats["period"] == "month"
+    assert stats["buckets"] == ["2025-02-01", "2025-03-01"]
+    assert stats["series"] == [
+        {"project": "Benchy", "color": "Black", "grams": [30, 0]},
+        {"project": "Vase", "color": "Black", "grams": [0, 7]},
+        {"project": "Vase", "color": "White", "grams": [5, 0]},
+    ]
+    stats = client.get("/api/v1/stats", query_string={"by": "roll", "max_date": "2025-02-28"}).get_json()
+    assert stats["series"] == [{"roll": 1, "grams": [30]}, {"roll": 2, "grams": [5]}]
+
+    assert client.get("/api/v1/stats", query_string={"period": "year"}).status_code == 400
+    assert client.get("/api/v1/stats", query_string={"by": "owner"}).status_code == 400
+    assert client.get("/api/v1/stats", query_string={"min_date": "soon"}).status_code == 400
+
+def test_api_forecast(client, init_database, add_print):
+    """Test depletion estimates per roll and color and the unreviewed jobs their roll can't hold."""
+    def days_ago(days):
+        return (datetime.now(LOCAL_TZ) - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M")
+
+    add_print(60, date=days_ago(40), project_name="Bracket")
+    add_print(30, date=days_ago(10), project_name="Bracket")
+    add_print(50, filament_id=2, date=days_ago(200), project_name="Benchy")  # Outside the window
+    add_print(100, filament_id=2, date=days_ago(2), project_name="Vase")
+    client.post("/add_temp_job", json={"project_name": "Benchy", "weight_used": 500})
+    client.post("/add_temp_job", json={"project_name": "Benchy", "weight_used": 200})
+    client.post("/add_temp_job", json={"project_name": "Unknown", "weight_used": 20})
+
+    forecast = client.get("/api/v1/forecast").get_json()
+    black, white = forecast["rolls"]
+    assert black["remaining_weight"] == 410
+    assert black["grams_per_day"] == pytest.approx(90 / 40, abs=0.01)
+    assert black["days_left"] == pytest.approx(410 / (90 / 40), abs=0.1)
+    # Used for the first time two days ago, the rate is spread over a week at least
+    assert white["grams_per_day"] == pytest.approx(100 / 7, abs=0.01)
+
+    assert [(color["color"], color["reorder"]) for color in forecast["colors"]] == [("White", False), ("Black", False)]
+
+    assert [(job["roll_id"], job["available"], job["fits"]) for job in forecast["pending"]] == [
+        (2, 600, True),
+        (2, 100, False),
+        (2, 0, False),
+    ]
+
+    app.config["FORECAST_REORDER_LEAD_DAYS"] = 60
+    try:
+        colors = client.get("/api/v1/forecast").get_json()["colors"]
+    finally:
+        app.config["FORECAST_REORDER_LEAD_DAYS"] = 14
+    assert [color["reorder"] for color in colors] == [True, False]
+
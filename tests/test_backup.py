@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import threading
+import pytest
+from sqlalchemy import create_engine, insert, select
+from app import app, db
+from app.backup import create_backup, finish_restore, list_backups, prune_backups, restore_backup, verify_backup
+from app.changes import latest_change_id
+from app.models import ChangeLog, DataVersion, FilamentRoll, TempPrintJob
+
+def make_database(path, rolls=3):
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(FilamentRoll.__table__), [
+            {"maker": "Prusa", "color": f"Color {i}", "total_weight": 1000, "remaining_weight": 1000, "in_use": True}
+            for i in range(rolls)
+        ])
+    engine.dispose()
+
+def roll_count(path):
+    with sqlite3.connect(path) as connection:
+        return connection.execute("SELECT COUNT(*) FROM filament_roll").fetchone()[0]
+
+def test_backup_verify_and_prune(tmp_path):
+    """Test that snapshots are checked against their recorded row counts and rotated."""
+    make_database(tmp_path / "live.db")
+    directory = tmp_path / "backups"
+    paths = [create_backup(str(tmp_path / "live.db"), str(directory))[0] for _ in range(3)]
+    labelled, description = create_backup(str(tmp_path / "live.db"), str(directory), label="pre-restore")
+    assert description["tables"]["filament_roll"] == 3
+    assert list_backups(str(directory)) == paths + [labelled]
+    assert all(verify_backup(path) == [] for path in paths)
+
+    # A snapshot that lost rows, and one that isn't a database any more
+    with sqlite3.connect(paths[0]) as connection:
+        connection.execute("DELETE FROM filament_roll WHERE id = 1")
+    assert verify_backup(paths[0]) == ["filament_roll: 2 rows, 3 when the snapshot was taken"]
+    with open(paths[1], "r+b") as f:
+        f.truncate(1024)
+    assert verify_backup(paths[1])
+
+    # Labelled snapshots aren't rotated
+    assert prune_backups(str(directory), keep=1) == paths[:2]
+    assert list_backups(str(directory)) == [paths[2], labelled]
+    assert not os.path.exists(os.path.splitext(paths[0])[0] + ".json")
+
+def test_backup_while_written(tmp_path):
+    """Test that a snapshot taken a page at a time during uploads is complete and consistent."""
+    make_database(tmp_path / "live.db", rolls=2000)
+    stop = threading.Event()
+
+    def upload():
+        with sqlite3.connect(tmp_path / "live.db", timeout=5) as connection:
+            connection.execute("PRAGMA journal_mode = WAL")
+            while not stop.is_set():
+                connection.execute("INSERT INTO temp_print_job (project_name, weight_used, date) "
+                                   "VALUES ('Upload', 1, '2025-01-01 00:00:00.000000')")
+                connection.commit()
+
+    app.config["BACKUP_PAGES_PER_STEP"] = 1
+    writer = threading.Thread(target=upload)
+    writer.start()
+    try:
+        path, description = create_backup(str(tmp_path / "live.db"), str(tmp_path / "backups"))
+    finally:
+        stop.set()
+        writer.join()
+        app.config["BACKUP_PAGES_PER_STEP"] = 1024
+    assert verify_backup(path) == []
+    assert description["tables"]["filament_roll"] == 2000
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+
+def test_restore_keeps_replaced_database(tmp_path):
+    """Test that a restore brings back the snapshot's rows and saves the replaced database first."""
+    live = str(tmp_path / "live.db")
+    directory = str(tmp_path / "backups")
+    make_database(live)
+    path, _ = create_backup(live, directory)
+    with sqlite3.connect(live) as connection:
+        connection.execute("DELETE FROM filament_roll")
+
+    saved, replaced = restore_backup(path, live, directory)
+    assert roll_count(live) == 3
+    assert roll_count(saved) == 0
+    assert replaced["tables"]["filament_roll"] == 0
+
+    # A damaged snapshot is refused before anything is touched
+    with sqlite3.connect(path) as connection:
+        connection.execute("DELETE FROM filament_roll")
+    with pytest.raises(ValueError, match="failed verification"):
+        restore_backup(path, live, directory)
+    assert roll_count(live) == 3
+
+def test_finish_restore_invalidates_caches_and_dashboards(client, init_database):
+    """Test that after a restore the data versions change and the change log moves on with reloads."""
+    client.post("/add_temp_job", json={"project_name": "Upload", "weight_used": 5})
+    with app.app_context():
+        if db.engine.dialect.name != "sqlite":
+            pytest.skip("Snapshots are restored into a SQLite database")
+        versions = dict(db.session.execute(select(DataVersion.table_name, DataVersion.version)).all())
+        previous = latest_change_id() + 10  # The replaced database had logged more
+        finish_restore(previous)
+
+        entries = db.session.execute(select(ChangeLog.id, ChangeLog.table_name, ChangeLog.action)
+                                     .where(ChangeLog.id > previous)).all()
+        assert sorted((table, action) for _, table, action in entries) == [
+            ("filament_roll", "reload"), ("print_job", "reload"), ("temp_print_job", "reload")
+        ]
+        for table, version in db.session.execute(select(DataVersion.table_name, DataVersion.version)):
+            assert version != versions[table]
+        assert db.session.get(TempPrintJob, 1).project_name == "Upload"
+
+def test_backup_needs_sqlite_file(client):
+    """Test that the backup commands refuse a database that isn't a SQLite file."""
+    result = app.test_cli_runner().invoke(args=["backup", "create"])
+    assert result.exit_code == 1
+    assert "flask export" in result.output
@@ -0,0 +1,49 @@
+from app.cache import ResponseCache, response_cache
+
+def test_lru_eviction():
+    """Test that the least recently used entries are evicted by count and by size."""
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.put("a", b"1234", 200, "text/html")
+    cache.put("b", b"1234", 200, "text/html")
+    assert cache.get("a")  # a is now the most recently used
+    cache.put("c", b"12", 200, "text/html")
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+    cache.put("d", b"12345678", 200, "text/html")
+    assert list(cache.entries) == ["c", "d"]
+    assert cache.stats()["bytes"] == 10
+
+    cache.put("e", b"x" * 11, 200, "text/html")  # Bigger than the whole cache
+    assert cache.get("e") is None
+
+def test_index_served_from_cache(client, init_database, query_counter):
+    """Ensure repeated page loads are served from the cache until something is written."""
+    response_cache.clear()
+    first = client.get("/")
+    assert first.headers["X-Cache"] == "MISS"
+
+    query_counter.clear()
+    second = client.get("/")
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.data == first.data
+    assert len(query_counter) == 1  # The data version lookup
+
+    client.post("/add_print", data={
+        "filament_id": 1,
+        "weight_used": 20,
+        "project_name": "Cache Buster",
+        "date": "2025-02-08T14:30"
+    })
+    third = client.get("/")
+    assert third.headers["X-Cache"] == "MISS"
+    assert b"Cache Buster" in third.data
+
+def test_cache_stats(client, init_database):
+    """Test the hit and miss counters endpoint."""
+    client.get("/api/v1/rolls")
+    before = client.get("/api/v1/cache").get_json()
+    client.get("/api/v1/rolls")
+    after = client.get("/api/v1/cache").get_json()
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
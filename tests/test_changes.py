@@ -0,0 +1,71 @@
+import json
+from sqlalchemy import update
+from app import app, db
+from app.models import FilamentRoll
+
+def read_events(client, since=None, last_event_id=None):
+    """Reads the change feed once (without waiting for new changes) as (id, event, data) tuples."""
+    query = {"duration": 0}
+    if since is not None:
+        query["since"] = since
+    headers = {"Last-Event-ID": str(last_event_id)} if last_event_id is not None else {}
+    response = client.get("/events", query_string=query, headers=headers)
+    assert response.mimetype == "text/event-stream"
+
+    events = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_change_feed(client, init_database):
+    """Test that roll, unreviewed job and print job changes are streamed as row deltas."""
+    start = read_events(client, since=0)[-1][0]
+
+    client.post("/add_temp_job", json={"project_name": "Slicer Upload", "weight_used": 12.5, "date": "2025-02-09T10:00"})
+    client.post("/add_temp_jobs", json=[
+        {"project_name": "Bulk Upload", "weight_used": 5, "date": "2025-02-09T11:00"}
+    ])
+    events = read_events(client, since=start)
+    assert [(event, data["table"], data["action"]) for _, event, data in events] == [
+        ("change", "temp_print_job", "upsert"), ("change", "temp_print_job", "upsert")
+    ]
+    assert events[0][2]["row"]["project_name"] == "Slicer Upload"
+    assert f'id="temp-job-{events[0][2]["id"]}"' in events[0][2]["html"]
+
+    # Approving a job removes it, adds a print job and changes the roll's weight
+    temp_job_id = events[0][2]["id"]
+    client.post(f"/approve_temp_job/{temp_job_id}", data={
+        "project_name": "Slicer Upload", "date": "2025-02-09T10:00", "filament_id": 1, "weight_used": 12.5
+    })
+    changes = {(data["table"], data["id"]): data for _, _, data in read_events(client, last_event_id=events[-1][0])}
+    assert changes[("temp_print_job", temp_job_id)]["action"] == "delete"
+    assert changes[("filament_roll", 1)]["row"]["remaining_weight"] == 487.5
+    assert "Slicer Upload" in next(data["html"] for (table, _), data in changes.items() if table == "print_job")
+
+def test_change_feed_resume(client, init_database):
+    """Ensure a resumed feed only sends newer changes and unknown positions are reset."""
+    client.post("/edit_roll/1", data={"maker": "Prusa", "color": "Red", "total_weight": 1000, "remaining_weight": 400})
+    client.post("/edit_roll/1", data={"maker": "Prusa", "color": "Blue", "total_weight": 1000, "remaining_weight": 400})
+
+    # Both edits of the roll are sent once, with the current values
+    events = read_events(client, since=0)
+    rolls = [data for _, _, data in events if data["table"] == "filament_roll" and data["id"] == 1]
+    assert len(rolls) == 1 and rolls[0]["row"]["color"] == "Blue"
+
+    latest = int(events[-1][0])
+    assert read_events(client, last_event_id=latest) == []
+    assert read_events(client) == []  # Starts at the newest change
+    assert read_events(client, since=latest + 10)[0][1] == "reset"
+    assert client.get("/events", query_string={"since": "soon"}).status_code == 400
+
+def test_change_feed_bulk_statement(client, init_database):
+    """Test that a bulk statement on a dashboard table without recorded rows reloads the page."""
+    latest = int(read_events(client, since=0)[-1][0])
+    with app.app_context():
+        db.session.execute(update(FilamentRoll).values(in_use=False))
+        db.session.commit()
+    assert [data for _, _, data in read_events(client, since=latest)] == [
+        {"table": "filament_roll", "id": None, "action": "reload"}
+    ]
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+from sqlalchemy import create_engine, text
+from config import BASE_DIR, Config, database_uri, engine_options
+from app.engine import configure_sqlite
+
+def test_database_url_is_honored(monkeypatch):
+    """Test that DATABASE_URL overrides the default database, relative to the project folder."""
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///data/database.db")
+    assert database_uri() == "sqlite:///" + os.path.join(BASE_DIR, "data", "database.db")
+
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///:memory:")
+    assert database_uri() == "sqlite:///:memory:"
+    assert engine_options(database_uri()) == {}
+
+def test_postgresql_url_uses_pooled_psycopg_engine(monkeypatch):
+    """Test that PostgreSQL URLs get the psycopg driver and configurable pool settings."""
+    monkeypatch.setenv("DATABASE_URL", "postgres://user:pass@db:5432/filatrack")
+    monkeypatch.setenv("DB_POOL_SIZE", "8")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "600")
+    uri = database_uri()
+    assert uri == "postgresql+psycopg://user:pass@db:5432/filatrack"
+
+    options = engine_options(uri)
+    assert (options["pool_size"], options["pool_recycle"], options["pool_pre_ping"]) == (8, 600, True)
+
+def test_sqlite_pragmas_applied_on_connect(tmp_path):
+    """Ensure every new SQLite connection runs in WAL mode with the configured pragmas."""
+    uri = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(uri, **engine_options(uri))
+    configure_sqlite(engine, Config.SQLITE_PRAGMAS)
+
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == Config.SQLITE_PRAGMAS["busy_timeout"]
+    engine.dispose()
+
+def test_reads_are_not_blocked_by_writes(tmp_path):
+    """Ensure a reader sees the last committed data while a write transaction is open."""
+    uri = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(uri, **engine_options(uri))
+    configure_sqlite(engine, Config.SQLITE_PRAGMAS)
+
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        connection.execute(text("INSERT INTO t VALUES (1)"))
+
+    with engine.connect() as writer, engine.connect() as reader:
+        writer.execute(text("BEGIN IMMEDIATE"))
+        writer.execute(text("INSERT INTO t VALUES (2)"))
+        assert reader.execute(text("SELECT COUNT(*) FROM t")).scalar() == 1
+        writer.rollback()
+    engine.dispose()
+
+def test_ingest_role_serves_only_uploads():
+    """Ensure an ingest server routes only the uploads and /metrics, and never loads Jinja."""
+    # The role is read when the app is imported, so it is imported in a fresh interpreter
+    script = (
+        "from app import app\n"
+        "print(sorted(rule.endpoint for rule in app.url_map.iter_rules()))\n"
+        "print('jinja_env' in app.__dict__)\n"
+    )
+    env = dict(os.environ, FILATRACK_ROLE="ingest", DATABASE_URL="sqlite:///:memory:")
+    result = subprocess.run([sys.executable, "-c", script], cwd=BASE_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    endpoints, jinja_loaded = result.stdout.splitlines()
+    assert endpoints == str(["add_temp_job", "add_temp_jobs", "metrics", "static"])
+    assert jinja_loaded == "False"
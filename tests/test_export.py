@@ -0,0 +1,83 @@
+import gzip
+import json
+import pytest
+from sqlalchemy import select
+from app import app, db
+from app.export import EXPORT_TABLES
+from app.models import RollUsage
+
+def add_history(client):
+    client.post("/add_print", data={
+        "filament_id": 1, "weight_used": 20, "project_name": "Benchy \"v2\", ä", "date": "2025-02-08T14:30"
+    })
+    client.post("/add_print", data={
+        "filament_id": [1, 2], "weight_used": [12.5, 4], "project_name": "Two Colour", "date": "2025-03-01T08:00"
+    })
+    client.post("/add_temp_job", json={"project_name": "Slicer Upload", "weight_used": 7.25})
+
+def table_rows():
+    with app.app_context():
+        return {table.name: db.session.execute(select(table).order_by(table.c.id)).all() for table in EXPORT_TABLES}
+
+@pytest.mark.parametrize("options", [["--format", "ndjson"], ["--format", "csv", "--gzip"]])
+def test_export_import_round_trip(client, init_database, tmp_path, options):
+    """Test that an export imported over the database gives back the same rows and usage."""
+    add_history(client)
+    before = table_rows()
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["export", str(tmp_path), *options])
+    assert result.exit_code == 0, result.output
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert manifest["tables"]["print_job_usage"]["rows"] == 3
+
+    # Refused over existing rows unless they are to be replaced
+    result = runner.invoke(args=["import", str(tmp_path)])
+    assert result.exit_code == 1
+    assert "--replace" in result.output
+
+    result = runner.invoke(args=["import", str(tmp_path), "--replace"])
+    assert result.exit_code == 0, result.output
+    assert table_rows() == before
+    with app.app_context():
+        assert db.session.get(RollUsage, 1).grams_used == 32.5
+    assert runner.invoke(args=["usage", "verify"]).exit_code == 0
+
+    # The search index was rebuilt from the imported rows
+    assert "Two Colour" in client.get("/search", query_string={"q": "colour"}).get_data(as_text=True)
+
+def test_export_import_parquet(client, init_database, tmp_path):
+    """Test the round trip through Parquet files."""
+    pytest.importorskip("pyarrow")
+    add_history(client)
+    before = table_rows()
+    runner = app.test_cli_runner()
+
+    assert runner.invoke(args=["export", str(tmp_path), "--format", "parquet"]).exit_code == 0
+    assert (tmp_path / "print_job.parquet").read_bytes()[:4] == b"PAR1"
+    result = runner.invoke(args=["import", str(tmp_path), "--replace"])
+    assert result.exit_code == 0, result.output
+    assert table_rows() == before
+
+def test_api_export(client, init_database):
+    """Test the export manifest and streaming a table as NDJSON and gzipped CSV."""
+    add_history(client)
+
+    manifest = client.get("/api/v1/export", query_string={"format": "csv", "gzip": 1}).get_json()
+    assert manifest["tables"]["print_job"]["file"] == "print_job.csv.gz"
+    assert manifest["tables"]["print_job"]["url"].endswith("/api/v1/export/print_job?format=csv&gzip=1")
+
+    response = client.get("/api/v1/export/print_job")
+    assert response.mimetype == "application/x-ndjson"
+    jobs = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [job["project_name"] for job in jobs] == ["Benchy \"v2\", ä", "Two Colour"]
+    assert jobs[0]["date"] == "2025-02-08T14:30:00"
+
+    response = client.get("/api/v1/export/temp_print_job", query_string={"format": "csv", "gzip": 1})
+    assert response.headers["Content-Disposition"] == "attachment; filename=temp_print_job.csv.gz"
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert lines[0] == "id,project_name,weight_used,weight_per_tool,date,site_id,printer_id"
+    assert lines[1].startswith("1,Slicer Upload,7.25,")
+
+    assert client.get("/api/v1/export/data_version").status_code == 404
+    assert client.get("/api/v1/export/print_job", query_string={"format": "xml"}).status_code == 400
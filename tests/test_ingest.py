@@ -0,0 +1,59 @@
+import json
+from app import app
+from app.models import TempPrintJob
+
+def test_add_temp_jobs_json_array(client):
+    """Test bulk adding temporary jobs from a JSON array."""
+    response = client.post("/add_temp_jobs", json=[
+        {"project_name": "Plate A", "weight_used": 10.5, "date": "2025-02-08T14:30"},
+        {"project_name": "Plate B", "weight_used": "3.25"},
+        {"project_name": "", "weight_used": 1},
+        {"project_name": "No Weight"},
+        {"project_name": "Bad Weight", "weight_used": "heavy"},
+    ])
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result["inserted"] == 2
+    assert [error["index"] for error in result["errors"]] == [2, 3, 4]
+
+    with app.app_context():
+        jobs = TempPrintJob.query.order_by(TempPrintJob.id).all()
+        assert [(job.project_name, job.weight_used) for job in jobs] == [("Plate A", 10.5), ("Plate B", 3.25)]
+
+def test_add_temp_jobs_ndjson(client):
+    """Test bulk adding temporary jobs from an NDJSON stream."""
+    lines = [json.dumps({"project_name": f"Part {i}", "weight_used": i}) for i in range(100)]
+    lines.insert(50, "{not json")
+    response = client.post("/add_temp_jobs", data="\n".join(lines), content_type="application/x-ndjson")
+
+    result = response.get_json()
+    assert result["inserted"] == 100
+    assert result["errors"] == [{"index": 50, "error": "Invalid data"}]
+    with app.app_context():
+        assert TempPrintJob.query.count() == 100
+
+def test_add_temp_jobs_rejects_invalid_body(client):
+    """Test that a bulk upload which isn't a list of jobs is rejected."""
+    assert client.post("/add_temp_jobs", json={"project_name": "Single"}).status_code == 400
+    assert client.post("/add_temp_jobs", json=[{"weight_used": 1}]).status_code == 400
+
+def test_weight_per_tool_suggests_rolls(client):
+    """Test that the per tool weights of a multi-material upload fill a roll row per tool on approval."""
+    client.post("/add_temp_jobs", json=[
+        {"project_name": "MMU", "weight_used": 16.8, "weight_per_tool": [12.3, 4.5]},
+        {"project_name": "Single", "weight_used": 5, "weight_per_tool": [5]},
+    ])
+    with app.app_context():
+        assert [job.weight_per_tool for job in TempPrintJob.query.order_by(TempPrintJob.id)] == ["12.3,4.5", None]
+
+    values = client.get("/temp_job/1").get_json()
+    assert (values["weight_used"], values["extra_rolls"]) == (12.3, [{"weight_used": 4.5}])
+    assert "extra_rolls" not in client.get("/temp_job/2").get_json()
+
+    # An AMS with 16 slots, whatever the digits
+    weights = [0.1 + 0.2] * 16
+    client.post("/add_temp_job", json={"project_name": "AMS", "weight_used": 4.8, "weight_per_tool": weights})
+    assert client.get("/temp_job/3").get_json()["extra_rolls"] == [{"weight_used": w} for w in weights[1:]]
+
+    response = client.post("/add_temp_job", json={"project_name": "Bad", "weight_used": 1, "weight_per_tool": "12.3"})
+    assert response.status_code == 400
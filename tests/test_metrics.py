@@ -0,0 +1,49 @@
+import logging
+from app import app
+from app.metrics import queue_seconds
+
+def sample(text, name, **labels):
+    """Value of a sample in the Prometheus text format, 0 when it isn't there."""
+    wanted = name + "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+    for line in text.splitlines():
+        if line.startswith(wanted + " "):
+            return float(line.split()[-1])
+    return 0.0
+
+def test_metrics_endpoint(client, init_database):
+    """Test that request latency, SQL statements and template render time are exported."""
+    before = client.get("/metrics").get_data(as_text=True)
+    response = client.get("/?metrics=1")
+    assert "sql;dur=" in response.headers["Server-Timing"]
+
+    after = client.get("/metrics")
+    assert after.mimetype == "text/plain"
+    text = after.get_data(as_text=True)
+    count = "filatrack_http_request_duration_seconds_count"
+    assert sample(text, count, method="GET", endpoint="index", status="200") == \
+        sample(before, count, method="GET", endpoint="index", status="200") + 1
+    assert sample(text, "filatrack_http_request_sql_statements_sum", endpoint="index") > \
+        sample(before, "filatrack_http_request_sql_statements_sum", endpoint="index")
+    assert sample(text, "filatrack_template_render_seconds_count", template="index.html") == \
+        sample(before, "filatrack_template_render_seconds_count", template="index.html") + 1
+
+def test_slow_query_logging(client, init_database, caplog):
+    """Ensure statements over the threshold are logged with their request and counted."""
+    threshold = app.config["SLOW_QUERY_MS"]
+    app.config["SLOW_QUERY_MS"] = 0
+    try:
+        with caplog.at_level(logging.WARNING, logger=app.logger.name):
+            client.get("/api/v1/rolls")
+    finally:
+        app.config["SLOW_QUERY_MS"] = threshold
+    assert any("Slow query" in message and "GET /api/v1/rolls" in message for message in caplog.messages)
+    text = client.get("/metrics").get_data(as_text=True)
+    assert sample(text, "filatrack_slow_queries_total", endpoint="api_rolls") > 0
+
+def test_queue_seconds():
+    """Test reading X-Request-Start in seconds, milliseconds and microseconds."""
+    assert queue_seconds("t=1000.5", 1001.0) == 0.5
+    assert queue_seconds("1000500", 1001.0) == 0.5
+    assert queue_seconds("t=1000500000", 1001.0) == 0.5
+    assert queue_seconds("soon", 1001.0) is None
+    assert queue_seconds("t=2000", 1001.0) is None
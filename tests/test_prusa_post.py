@@ -0,0 +1,205 @@
+import importlib.util
+import json
+import os
+import sys
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# The script imports its sibling modules (slicers.py) the way it does when run by the slicer
+sys.path.insert(0, os.path.join(BASE_DIR, "integrations", "prusa"))
+import slicers
+spec = importlib.util.spec_from_file_location(
+    "prusa_post", os.path.join(BASE_DIR, "integrations", "prusa", "prusa_post.py")
+)
+prusa_post = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(prusa_post)
+sys.modules["prusa_post"] = prusa_post  # Lets the import worker processes unpickle its functions
+
+HEADER = "; generated by PrusaSlicer 2.9.0 on 2025-02-08 at 14:30:00 UTC\n\n"
+FOOTER = (
+    "; filament used [mm] = 1234.56\n"
+    "; filament used [g] = 42.17\n"
+    "\n; prusaslicer_config = begin\n"
+    "; output_filename_format = {input_filename_base}_{nozzle_diameter[0]}n_{layer_height}mm_{printing_filament_types}_{printer_model}_{print_time}.gcode\n"
+    "; prusaslicer_config = end\n"
+)
+
+def write_gcode(path, moves=0, header=HEADER, footer=FOOTER):
+    with open(path, "w", newline="\n") as f:
+        f.write(header)
+        f.write("G1 X10.123 Y20.456 E0.01234\n" * moves)
+        f.write(footer)
+    return str(path)
+
+pytestmark = pytest.mark.usefixtures("no_slicer_env")
+
+def test_extract_gcode_info(tmp_path):
+    """Test extracting the weight and project name from a PrusaSlicer file."""
+    path = write_gcode(tmp_path / "face_mount_0.4n_0.2mm_PETG_MINI_1d5h24m.gcode", moves=10)
+    info = prusa_post.extract_gcode_info(path)
+    assert info["weight_used"] == 42.17
+    assert info["project_name"] == "Face Mount"
+
+def test_large_file_reads_only_header_and_footer(tmp_path, monkeypatch):
+    """Ensure the moves of a large file are not scanned when the metadata is in the footer."""
+    path = write_gcode(tmp_path / "big_part.gcode", moves=100000)
+    scanned = []
+    parse = slicers.Slicer.parse
+    monkeypatch.setattr(
+        slicers.Slicer, "parse",
+        lambda self, regions: scanned.append(sum(len(r) for r in regions)) or parse(self, regions)
+    )
+
+    assert prusa_post.read_gcode_metadata(path).weight == 42.17
+    assert scanned[0] <= prusa_post.HEADER_BYTES + prusa_post.FOOTER_BYTES
+    assert len(scanned) == 1
+
+def test_falls_back_to_full_scan(tmp_path):
+    """Test that metadata outside the header and footer is still found."""
+    path = tmp_path / "odd_layout.gcode"
+    with open(path, "w", newline="\n") as f:
+        f.write("G1 X1 Y1\n" * 100000)
+        f.write("; filament used [g] = 7.5\n")
+        f.write("G1 X1 Y1\n" * 100000)
+    metadata = prusa_post.read_gcode_metadata(str(path))
+    assert (metadata.weight, metadata.filename_format) == (7.5, None)
+
+def test_no_weight_returns_none(tmp_path):
+    """Ensure files without a filament weight produce no job."""
+    path = write_gcode(tmp_path / "no_weight.gcode", footer="; nothing here\n")
+    assert prusa_post.extract_gcode_info(path) is None
+    assert prusa_post.extract_gcode_info(write_gcode(tmp_path / "empty.gcode", header="", footer="")) is None
+
+class StubResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.text = str(self.body)
+
+    def json(self):
+        return self.body
+
+class StubSession:
+    """Answers the uploads with the queued responses (or exceptions) and records what was posted."""
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append((url, json))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(prusa_post.time, "sleep", sleeps.append)
+    return sleeps
+
+def test_spooled_jobs_are_sent_in_one_batch(tmp_path, no_sleep):
+    """Ensure spooled jobs are uploaded together and removed from the spool."""
+    for i in range(3):
+        prusa_post.spool_job({"project_name": f"Part {i}", "weight_used": i}, spool_dir=tmp_path)
+    session = StubSession(StubResponse(200, {"inserted": 3, "errors": []}))
+
+    assert prusa_post.flush_spool(spool_dir=tmp_path, session=session)
+    assert len(session.posts) == 1
+    url, jobs = session.posts[0]
+    assert url.endswith("/add_temp_jobs")
+    assert [job["project_name"] for job in jobs] == ["Part 0", "Part 1", "Part 2"]
+    assert prusa_post.spooled_files(tmp_path) == []
+    assert not no_sleep
+
+def test_flush_retries_with_backoff(tmp_path, no_sleep):
+    """Test that connection errors and server errors are retried with a growing delay."""
+    prusa_post.spool_job({"project_name": "Retry", "weight_used": 5}, spool_dir=tmp_path)
+    session = StubSession(
+        prusa_post.requests.ConnectionError("refused"),
+        StubResponse(503),
+        StubResponse(200, {"inserted": 1, "errors": []}),
+    )
+
+    assert prusa_post.flush_spool(spool_dir=tmp_path, session=session)
+    assert no_sleep == [1, 2]
+    assert prusa_post.spooled_files(tmp_path) == []
+
+def test_unsent_jobs_stay_spooled(tmp_path, no_sleep):
+    """Ensure jobs are kept for the next run when the server stays unreachable."""
+    prusa_post.spool_job({"project_name": "Offline", "weight_used": 5}, spool_dir=tmp_path)
+    session = StubSession(*[prusa_post.requests.ConnectionError("refused")] * 10)
+
+    assert not prusa_post.flush_spool(spool_dir=tmp_path, timeout=10, session=session)
+    assert len(prusa_post.spooled_files(tmp_path)) == 1
+    assert not os.path.exists(tmp_path / ".flush.lock")
+
+def test_flush_falls_back_to_single_endpoint(tmp_path, no_sleep):
+    """Test uploading to a server without the bulk endpoint."""
+    prusa_post.spool_job({"project_name": "A", "weight_used": 1}, spool_dir=tmp_path)
+    prusa_post.spool_job({"project_name": "B", "weight_used": 2}, spool_dir=tmp_path)
+    session = StubSession(StubResponse(404), StubResponse(200), StubResponse(200))
+
+    assert prusa_post.flush_spool(spool_dir=tmp_path, session=session)
+    assert [url.rsplit("/", 1)[1] for url, _ in session.posts] == ["add_temp_jobs", "add_temp_job", "add_temp_job"]
+
+def test_flush_skips_when_locked(tmp_path):
+    """Ensure a second flusher leaves the spool to the running one."""
+    prusa_post.spool_job({"project_name": "A", "weight_used": 1}, spool_dir=tmp_path)
+    assert prusa_post.acquire_flush_lock(tmp_path)
+    assert not prusa_post.flush_spool(spool_dir=tmp_path, session=StubSession())
+
+def test_import_directory(tmp_path, no_sleep):
+    """Test importing a folder of G-code files, skipping duplicates and files without a weight."""
+    archive = tmp_path / "archive"
+    (archive / "2024").mkdir(parents=True)
+    write_gcode(archive / "plate_a.gcode")
+    write_gcode(archive / "2024" / "plate_b.gcode", moves=3)
+    write_gcode(archive / "2024" / "copy_of_a.gcode")  # Same content as plate_a
+    write_gcode(archive / "no_weight.gcode", footer="; nothing here\n")
+    (archive / "notes.txt").write_text("not G-code")
+    os.utime(archive / "plate_a.gcode", (0, 1700000000))
+
+    state_path = str(tmp_path / "state.json")
+    session = StubSession(StubResponse(200, {"inserted": 2, "errors": []}))
+    assert prusa_post.import_directory(str(archive), state_path=state_path, workers=2, session=session) == 2
+
+    jobs = session.posts[0][1]
+    assert sorted(job["weight_used"] for job in jobs) == [42.17, 42.17]
+    assert len({job["project_name"] for job in jobs}) == 2
+    assert any(job["date"].startswith("2023-11-1") for job in jobs)  # Dated by the file modification time
+    with open(state_path) as f:
+        assert len(json.load(f)["files"]) == 4
+
+    # A second run finds nothing new
+    assert prusa_post.import_directory(str(archive), state_path=state_path, workers=2, session=StubSession()) == 0
+
+def test_import_ignores_slicer_output_name(tmp_path, no_sleep, monkeypatch):
+    """Ensure archived files are named after themselves, not the file a slicer is exporting."""
+    monkeypatch.setenv("SLIC3R_PP_OUTPUT_NAME", "current_export_0.4n_0.2mm_PETG_MINI_1h.gcode")
+    write_gcode(tmp_path / "plate_a.gcode")
+    write_gcode(tmp_path / "plate_b.gcode", moves=3)
+
+    session = StubSession(StubResponse(200, {"inserted": 2, "errors": []}))
+    assert prusa_post.import_directory(str(tmp_path), state_path=str(tmp_path / "state.json"), workers=2,
+                                       session=session) == 2
+    assert sorted(job["project_name"] for job in session.posts[0][1]) == ["Plate A", "Plate B"]
+    # A single export still uses it
+    assert prusa_post.extract_gcode_info(str(tmp_path / "plate_a.gcode"))["project_name"] == "Current Export"
+
+def test_import_resumes_after_failure(tmp_path, no_sleep, monkeypatch):
+    """Ensure an import interrupted by an unreachable server sends only the missing batches on resume."""
+    monkeypatch.setattr(prusa_post, "IMPORT_BATCH_SIZE", 2)
+    for i in range(4):
+        write_gcode(tmp_path / f"part_{i}.gcode", moves=i)
+    state_path = str(tmp_path / "state.json")
+
+    session = StubSession(StubResponse(200, {"inserted": 2, "errors": []}), *[prusa_post.requests.ConnectionError("refused")] * 5)
+    assert prusa_post.import_directory(str(tmp_path), state_path=state_path, workers=1, timeout=5, session=session) is None
+    sent = [job["project_name"] for job in session.posts[0][1]]
+
+    session = StubSession(StubResponse(200, {"inserted": 2, "errors": []}))
+    assert prusa_post.import_directory(str(tmp_path), state_path=state_path, workers=1, session=session) == 2
+    assert len(session.posts) == 1
+    assert not set(sent) & {job["project_name"] for job in session.posts[0][1]}
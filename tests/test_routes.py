@@ -1,6 +1,8 @@
-import pytest
+import re
+from datetime import datetime
 from app import app, db
-from app.models import FilamentRoll, PrintJob
+from app.models import DEFAULT_SITE_ID, FilamentRoll, PrintJob, TempPrintJob, RollUsage
+from app.routes import print_job_page
 
 def test_add_roll(client):
     """Test adding a new filament roll."""
@@ -155,3 +157,219 @@ def test_delete_temp_job(client, init_database):
 
     response = client.post("/delete_temp_job/1", follow_redirects=True)
     assert response.status_code == 200
+
+def test_print_history_pagination(client, init_database):
+    """Test that the print history is paginated with a keyset cursor."""
+    with app.app_context():
+        db.session.add_all([
+            PrintJob(filament_id=1, weight_used=1, project_name=f"Job {i:03d}", date=datetime(2025, 1, 1, 12, i % 60))
+            for i in range(60)
+        ])
+        db.session.commit()
+
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.data.count(b"<td>Job ") == 50
+    assert b"loadMorePrints" in response.data
+
+    cursor = re.search(rb'data-cursor="([^"]+)"', response.data).group(1).decode()
+    page = client.get("/print_jobs", query_string={"cursor": cursor}).get_json()
+    assert page["rows"].count("<td>Job ") == 10
+    assert page["next_cursor"] is None
+
+def test_print_history_without_dates(client, init_database):
+    """Test that jobs without a date are paginated after the dated ones."""
+    with app.app_context():
+        db.session.add_all([
+            PrintJob(filament_id=1, weight_used=1, project_name=f"Job {i}", date=datetime(2025, 1, 1, 12, i))
+            for i in range(4)
+        ])
+        db.session.commit()
+        # An insert without a date gets the current time, imported history can still lack one
+        PrintJob.query.filter(PrintJob.id > 2).update({"date": None})
+        db.session.commit()
+
+        names, cursor = [], None
+        while True:
+            jobs, cursor = print_job_page(DEFAULT_SITE_ID, cursor, limit=1)
+            names += [job.project_name for job in jobs]
+            if not cursor:
+                break
+        assert names == ["Job 1", "Job 0", "Job 3", "Job 2"]
+
+    page = client.get("/api/v1/jobs", query_string={"limit": 3, "fields": "project_name"}).get_json()
+    assert [job["project_name"] for job in page["jobs"]] == ["Job 1", "Job 0", "Job 3"]
+    page = client.get("/api/v1/jobs", query_string={"limit": 3, "cursor": page["next_cursor"]}).get_json()
+    assert [job["project_name"] for job in page["jobs"]] == ["Job 2"]
+    assert client.get("/").status_code == 200
+
+def test_print_jobs_invalid_cursor(client):
+    """Test that a malformed cursor is rejected."""
+    response = client.get("/print_jobs", query_string={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_index_query_count_is_bounded(client, init_database, query_counter):
+    """Ensure rendering the print history doesn't lazy load each job's roll."""
+    with app.app_context():
+        db.session.add_all([
+            PrintJob(filament_id=1 + i % 2, weight_used=1, project_name=f"Job {i}", date=datetime(2025, 1, 1, 12, i))
+            for i in range(40)
+        ])
+        db.session.commit()
+
+    query_counter.clear()
+    client.get("/")
+    # Data versions (cache key), change feed position, rolls, print jobs, unreviewed jobs and sites
+    assert len(query_counter) <= 6
+
+    with app.app_context():
+        query_counter.clear()
+        jobs, _ = print_job_page(DEFAULT_SITE_ID)
+        assert {job.filament.maker for job in jobs} == {"Prusa", "ESun"}
+        assert len(query_counter) == 1
+
+def test_dialogs_are_not_rendered_per_row(client, init_database):
+    """Ensure the page holds one edit dialog per entity type, however many rows there are."""
+    with app.app_context():
+        db.session.add_all([
+            PrintJob(filament_id=1, weight_used=1, project_name=f"Job {i}", date=datetime(2025, 1, 1, 12, i))
+            for i in range(20)
+        ])
+        db.session.add_all([TempPrintJob(project_name=f"Temp {i}", weight_used=1) for i in range(5)])
+        db.session.commit()
+
+    page = client.get("/").data
+    # Add roll, add print, roll, print and approve dialogs
+    assert page.count(b'class="modal fade"') == 5
+    assert page.count(b'data-bs-target="#printDialog"') == 40
+
+def test_dialog_data(client, init_database):
+    """Test the values the shared dialogs are filled from."""
+    client.post("/add_print", data={
+        "filament_id": [1, 2],
+        "weight_used": [30, 10],
+        "project_name": "Two Colors",
+        "date": "2025-02-08T14:30"
+    })
+    client.post("/add_temp_job", json={"project_name": "Unreviewed", "weight_used": 12.5, "date": "2025-02-09T10:00"})
+
+    assert client.get("/roll/2").get_json() == {
+        "maker": "ESun", "color": "White", "total_weight": 750, "remaining_weight": 740, "in_use": True
+    }
+    assert client.get("/print/1").get_json() == {
+        "project_name": "Two Colors",
+        "date": "2025-02-08T14:30",
+        "filament_id": 1,
+        "weight_used": 30,
+        "extra_rolls": [{"filament_id": 2, "weight_used": 10}]
+    }
+    assert client.get("/temp_job/1").get_json() == {
+        "project_name": "Unreviewed", "date": "2025-02-09T10:00", "weight_used": 12.5
+    }
+    assert client.get("/roll/99").status_code == 404
+    assert client.get("/print/99").status_code == 404
+    assert client.get("/temp_job/99").status_code == 404
+
+def test_search(client, init_database):
+    """Test prefix search across rolls, print jobs and unreviewed jobs."""
+    client.post("/add_print", data={
+        "filament_id": 1,
+        "weight_used": 12,
+        "project_name": "Benchy Calibration",
+        "date": "2025-02-08T14:30"
+    })
+    client.post("/add_temp_job", json={"project_name": "Benchmark Tower", "weight_used": 5.0})
+
+    results = client.get("/search", query_string={"q": "bench"}).get_json()
+    assert [job["project_name"] for job in results["print_jobs"]] == ["Benchy Calibration"]
+    assert results["print_jobs"][0]["maker"] == "Prusa"
+    assert [job["project_name"] for job in results["temp_jobs"]] == ["Benchmark Tower"]
+
+    results = client.get("/search", query_string={"q": "whi es"}).get_json()
+    assert [roll["maker"] for roll in results["rolls"]] == ["ESun"]
+
+def test_search_index_follows_edits(client, init_database):
+    """Ensure the search index is kept in sync when print jobs change."""
+    client.post("/add_print", data={
+        "filament_id": 1,
+        "weight_used": 12,
+        "project_name": "Old Name",
+        "date": "2025-02-08T14:30"
+    })
+    client.post("/edit_print/1", data={
+        "filament_id": 1,
+        "weight_used": 12,
+        "project_name": "New Name",
+        "date": "2025-02-08T14:30"
+    })
+    assert client.get("/search", query_string={"q": "old"}).get_json()["print_jobs"] == []
+    assert len(client.get("/search", query_string={"q": "new"}).get_json()["print_jobs"]) == 1
+
+    client.post("/delete_print/1")
+    assert client.get("/search", query_string={"q": "new"}).get_json()["print_jobs"] == []
+
+def test_review_temp_jobs(client, init_database, query_counter):
+    """Test approving and rejecting many unreviewed jobs in one request."""
+    client.post("/add_temp_jobs", json=[{"project_name": f"Upload {i}", "weight_used": 10} for i in range(6)])
+
+    query_counter.clear()
+    response = client.post("/review_temp_jobs", json={
+        "approve": [
+            {"temp_job_id": 1, "filament_id": 1},
+            {"temp_job_id": 2, "filament_id": 1, "weight_used": 15, "project_name": "Renamed"},
+            {"temp_job_id": 3, "filament_id": 2, "date": "2025-02-08T14:30"},
+            {"temp_job_id": 4, "filament_id": 99},
+            {"temp_job_id": 42, "filament_id": 1},
+        ],
+        "reject": [5, 1]
+    })
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result["approved"], result["rejected"]) == (3, 1)
+    assert [error.get("index", error.get("reject")) for error in result["errors"]] == [3, 4, 1]
+    assert {roll["id"]: roll["remaining_weight"] for roll in result["rolls"]} == {1: 475, 2: 740}
+    # One UPDATE per roll, not per job
+    assert sum(statement.startswith("UPDATE filament_roll") for statement in query_counter) == 2
+
+    with app.app_context():
+        assert sorted(job.id for job in TempPrintJob.query) == [4, 6]
+        assert PrintJob.query.filter_by(project_name="Renamed").one().weight_used == 15
+        assert db.session.get(RollUsage, 1).job_count == 2
+
+def test_review_temp_jobs_with_several_rolls(client, init_database):
+    """Test approving a multi-material unreviewed job split over two rolls."""
+    client.post("/add_temp_jobs", json=[{"project_name": f"Upload {i}", "weight_used": 10} for i in range(2)])
+
+    response = client.post("/review_temp_jobs", json={
+        "approve": [{"temp_job_id": 1, "allocations": [
+            {"filament_id": 1, "weight_used": 6},
+            {"filament_id": 2, "weight_used": 4}
+        ]}]
+    })
+    result = response.get_json()
+    assert result["approved"] == 1
+    assert {roll["id"]: roll["remaining_weight"] for roll in result["rolls"]} == {1: 494, 2: 746}
+
+    response = client.post("/review_temp_jobs", json={
+        "approve": [{"temp_job_id": 2, "allocations": [{"filament_id": 1}, {"filament_id": 99}]}]
+    })
+    assert response.get_json()["errors"] == [{"index": 0, "error": "Filament roll not found"}]
+
+def test_review_temp_jobs_with_invalid_ids(client, init_database):
+    """Ensure job and roll ids that aren't ids are reported, not looked up."""
+    client.post("/add_temp_jobs", json=[{"project_name": f"Upload {i}", "weight_used": 10} for i in range(2)])
+
+    response = client.post("/review_temp_jobs", json={
+        "approve": [
+            {"temp_job_id": 1, "filament_id": [1]},
+            {"temp_job_id": {"id": 1}, "filament_id": 1},
+            {"temp_job_id": True, "filament_id": 1},
+            {"temp_job_id": 1, "allocations": [{"filament_id": "1"}]},
+            {"temp_job_id": 2, "filament_id": 1},
+        ]
+    })
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result["approved"] == 1
+    assert result["errors"] == [{"index": index, "error": "Invalid data"} for index in range(4)]
+    assert client.post("/review_temp_jobs", json={"reject": [True]}).status_code == 400
@@ -0,0 +1,149 @@
+import re
+import pytest
+from app import app, db
+from app.models import DEFAULT_SITE_ID, FilamentRoll, PrintJob, RollUsage, Site, TempPrintJob
+from app.sites import add_printer
+
+@pytest.fixture
+def workshop():
+    """A second site with a roll and a printer, returns the site's id and the printer's API key."""
+    with app.app_context():
+        site = Site(name="Workshop")
+        db.session.add(site)
+        db.session.flush()
+        printer, key = add_printer(site, "MK4")
+        db.session.commit()
+        return site.id, key
+
+def test_ingest_with_api_key(client, init_database, workshop):
+    """Test that uploads are tagged with the site and printer of their API key."""
+    site_id, key = workshop
+    assert client.post("/add_temp_job", json={"project_name": "Keyed", "weight_used": 5},
+                       headers={"X-API-Key": key}).status_code == 200
+    assert client.post("/add_temp_jobs", json=[{"project_name": "Keyed Bulk", "weight_used": 3}],
+                       headers={"X-API-Key": key}).get_json()["inserted"] == 1
+    client.post("/add_temp_job", json={"project_name": "Anonymous", "weight_used": 1})
+
+    with app.app_context():
+        jobs = {job.project_name: (job.site_id, job.printer_id) for job in TempPrintJob.query}
+    assert jobs == {"Keyed": (site_id, 1), "Keyed Bulk": (site_id, 1), "Anonymous": (DEFAULT_SITE_ID, None)}
+
+    response = client.post("/add_temp_job", json={"project_name": "Forged", "weight_used": 1},
+                           headers={"X-API-Key": "not-a-key"})
+    assert response.status_code == 401
+    assert response.get_json() == {"error": "Invalid API key"}
+
+    app.config["INGEST_REQUIRE_API_KEY"] = True
+    try:
+        assert client.post("/add_temp_jobs", json=[{"project_name": "Anonymous", "weight_used": 1}]).status_code == 401
+    finally:
+        app.config["INGEST_REQUIRE_API_KEY"] = False
+
+def test_views_are_scoped_to_site(client, init_database, workshop):
+    """Test that the dashboard, API, search and statistics of a site only show its own rows."""
+    site_id, key = workshop
+    site = {"site": site_id}
+    client.post("/add_roll", query_string=site,
+                data={"maker": "Polymaker", "color": "Teal", "total_weight": 1000, "remaining_weight": 1000})
+    client.post("/add_print", query_string=site,
+                data={"filament_id": 3, "weight_used": 40, "project_name": "Workshop Bracket", "date": "2025-02-08T14:30"})
+    client.post("/add_print", data={"filament_id": 1, "weight_used": 10, "project_name": "Home Benchy",
+                                    "date": "2025-02-08T15:30"})
+    client.post("/add_temp_job", json={"project_name": "Workshop Upload", "weight_used": 5}, headers={"X-API-Key": key})
+
+    assert [roll["color"] for roll in client.get("/api/v1/rolls", query_string=site).get_json()["rolls"]] == ["Teal"]
+    assert [roll["color"] for roll in client.get("/api/v1/rolls").get_json()["rolls"]] == ["Black", "White"]
+    assert [job["project_name"] for job in client.get("/api/v1/jobs", query_string=site).get_json()["jobs"]] == [
+        "Workshop Bracket"
+    ]
+    assert client.get("/api/v1/temp_jobs").get_json()["temp_jobs"] == []
+    assert client.get("/api/v1/stats", query_string={**site, "by": "project"}).get_json()["series"] == [
+        {"project": "Workshop Bracket", "grams": [40]}
+    ]
+    assert [roll["color"] for roll in client.get("/api/v1/forecast", query_string=site).get_json()["rolls"]] == ["Teal"]
+
+    page = client.get("/", query_string=site).get_data(as_text=True)
+    assert "Workshop Bracket" in page and "Workshop Upload" in page and "Home Benchy" not in page
+    # Forms and links stay on the site
+    assert 'action="/add_roll?site=%d"' % site_id in page
+    assert "Home Benchy" in client.get("/").get_data(as_text=True)
+
+    assert "Workshop" not in client.get("/search", query_string={"q": "workshop"}).get_data(as_text=True)
+    assert "Workshop Bracket" in client.get("/search", query_string={**site, "q": "workshop"}).get_data(as_text=True)
+
+    assert client.get("/api/v1/rolls", query_string={"site": 99}).status_code == 404
+
+def test_approved_job_keeps_site_and_printer(client, init_database, workshop):
+    """Test that reviewing an upload keeps the site and printer it came from."""
+    site_id, key = workshop
+    client.post("/add_roll", query_string={"site": site_id},
+                data={"maker": "Polymaker", "color": "Teal", "total_weight": 1000, "remaining_weight": 1000})
+    client.post("/add_temp_job", json={"project_name": "Upload", "weight_used": 5}, headers={"X-API-Key": key})
+    client.post("/approve_temp_job/1", query_string={"site": site_id},
+                data={"project_name": "Upload", "date": "2025-02-08T14:30", "filament_id": 3, "weight_used": 5})
+    with app.app_context():
+        job = db.session.get(PrintJob, 1)
+        assert (job.site_id, job.printer_id) == (site_id, 1)
+
+def test_jobs_only_charge_rolls_of_their_site(client, init_database, workshop):
+    """Ensure a print job can't take filament from another site's roll, and rows stay on their site."""
+    site_id, key = workshop
+    site = {"site": site_id}
+    client.post("/add_roll", query_string=site,
+                data={"maker": "Polymaker", "color": "Teal", "total_weight": 1000, "remaining_weight": 1000})
+    job = {"project_name": "Bracket", "date": "2025-02-08T14:30"}
+    roll = {"maker": "Prusament", "color": "Red", "total_weight": 1000, "remaining_weight": 10}
+
+    # Roll 1 is the default site's
+    assert client.post("/add_print", query_string=site, data={**job, "filament_id": 1, "weight_used": 5}).status_code == 400
+    assert client.post("/add_print", query_string=site,
+                       data={**job, "filament_id": [3, 1], "weight_used": [5, 5]}).status_code == 400
+    assert client.post("/add_print", query_string=site, data={**job, "filament_id": 3, "weight_used": 5}).status_code == 302
+    assert client.post("/edit_print/1", query_string=site,
+                       data={**job, "filament_id": 1, "weight_used": 5}).status_code == 400
+    assert client.post("/duplicate_print/1", query_string=site,
+                       data={**job, "filament_id": 2, "weight_used": 5}).status_code == 400
+    client.post("/add_temp_job", json={"project_name": "Upload", "weight_used": 5}, headers={"X-API-Key": key})
+    assert client.post("/approve_temp_job/1", query_string=site,
+                       data={**job, "filament_id": 1, "weight_used": 5}).status_code == 400
+
+    # The workshop's rows can't be changed from the default site
+    assert client.post("/edit_roll/3", data=roll).status_code == 400
+    assert client.post("/duplicate_roll/3", data=roll).status_code == 400
+    assert client.post("/edit_print/1", data={**job, "filament_id": 1, "weight_used": 5}).status_code == 400
+    assert client.post("/duplicate_print/1", data={**job, "filament_id": 1, "weight_used": 5}).status_code == 400
+    assert client.post("/approve_temp_job/1", data={**job, "filament_id": 1, "weight_used": 5}).status_code == 400
+    assert client.post("/delete_print/1").status_code == 400
+    assert client.post("/delete_roll/3").status_code == 400
+    assert client.post("/delete_temp_job/1").status_code == 400
+
+    with app.app_context():
+        assert PrintJob.query.count() == 1
+        assert db.session.get(PrintJob, 1).filament_id == 3
+        assert TempPrintJob.query.count() == 1
+        assert db.session.get(RollUsage, 1) is None
+        assert FilamentRoll.query.count() == 3
+        assert db.session.get(FilamentRoll, 3).remaining_weight == 995
+
+    assert client.get("/roll/3").status_code == 404
+    assert client.get("/roll/3", query_string=site).status_code == 200
+    assert client.get("/print/1").status_code == 404
+    assert client.get("/print/1", query_string=site).get_json()["filament_id"] == 3
+    assert client.get("/temp_job/1").status_code == 404
+    assert client.get("/roll/1", query_string=site).status_code == 404
+
+def test_printer_commands(client, workshop):
+    """Test adding a printer from the command line and that removing it revokes its key."""
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["printers", "add", "Workshop", "XL"])
+    assert result.exit_code == 0, result.output
+    key = re.search(r"API key.*: (\S+)$", result.output, re.MULTILINE).group(1)
+    assert client.post("/add_temp_job", json={"project_name": "XL", "weight_used": 1},
+                       headers={"X-API-Key": key}).status_code == 200
+
+    assert runner.invoke(args=["printers", "remove", "2"]).exit_code == 0
+    with app.app_context():
+        assert db.session.get(TempPrintJob, 1).printer_id is None
+    assert client.post("/add_temp_job", json={"project_name": "XL", "weight_used": 1},
+                       headers={"X-API-Key": key}).status_code == 401
+    assert "Workshop" in runner.invoke(args=["sites", "list"]).output
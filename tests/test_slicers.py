@@ -0,0 +1,73 @@
+import os
+import pytest
+from tests.test_prusa_post import prusa_post, slicers
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "gcode")
+
+# Sample files of every supported slicer: (file, slicer, total weight, per tool weights, project name)
+CORPUS = [
+    ("prusaslicer_mmu_0.4n_0.2mm_PLA_MK4_1h2m.gcode", "PrusaSlicer", 16.8, [12.3, 4.5], "Prusaslicer Mmu"),
+    ("orca_bracket_PETG_1h8m.gcode", "OrcaSlicer", 13.75, [13.75], "Orca Bracket"),
+    # Only writes the older "; filename_format = " comment
+    ("superslicer_spacer_PETG.gcode", "SuperSlicer", 6.98, [6.98], "Superslicer Spacer"),
+    ("bambu_ams_plate_1.gcode", "BambuStudio", 24.46, [20.88, 3.58], "Bambu Ams"),
+    ("anycubic_vase_PLA.gcode", "AnycubicSlicerNext", 7.19, [7.19], "Anycubic Vase"),
+    ("unknown_slicer_part.gcode", "Unknown", 5.5, [5.5], "Unknown Slicer Part"),
+]
+
+pytestmark = pytest.mark.usefixtures("no_slicer_env")
+
+@pytest.mark.parametrize("name, slicer, weight, per_tool, project_name", CORPUS)
+def test_corpus(name, slicer, weight, per_tool, project_name):
+    """Test the slicer detection and metadata of every sample file."""
+    path = os.path.join(CORPUS_DIR, name)
+    metadata = prusa_post.read_gcode_metadata(path)
+    assert metadata.slicer == slicer
+    assert metadata.weight == weight
+    assert metadata.per_tool == per_tool
+
+    info = prusa_post.extract_gcode_info(path)
+    assert info["weight_used"] == weight
+    assert info["project_name"] == project_name
+    assert info.get("weight_per_tool", per_tool) == per_tool
+
+def test_single_tool_jobs_have_no_breakdown():
+    """Ensure the per tool weights are only sent for multi-material prints."""
+    info = prusa_post.extract_gcode_info(os.path.join(CORPUS_DIR, "orca_bracket_PETG_1h8m.gcode"))
+    assert "weight_per_tool" not in info
+
+def test_weight_summed_without_total():
+    """Test that the weights of every tool are added up when the slicer writes no total."""
+    metadata = slicers.GENERIC.parse([b"; filament used [g] = 1.25, 0.00, 2.5\n"])
+    assert metadata.weight == 3.75
+    assert metadata.per_tool == [1.25, 0.0, 2.5]
+
+@pytest.mark.parametrize("name, slicer, weight, per_tool, project_name", CORPUS)
+def test_key_lines_parse_like_the_whole_file(name, slicer, weight, per_tool, project_name):
+    """Test that parsing only the lines holding a slicer's keys gives the metadata of the whole file."""
+    with open(os.path.join(CORPUS_DIR, name), "rb") as f:
+        data = f.read()
+    parser = slicers.detect_slicer(data)
+    assert parser.parse(parser.key_lines(data)) == parser.parse([data])
+
+def test_key_lines_skip_keys_outside_comment_lines():
+    """Ensure a key in the middle of a line isn't taken for the slicer's comment."""
+    data = b"G1 X1 ; filament used [g] = 99\n; filament used [g] = 1.5\n; total filament used [g] = 1.5"
+    lines = slicers.GENERIC.key_lines(data)
+    assert lines == [b"G1 X1 ; filament used [g] = 99\n", b"; filament used [g] = 1.5\n",
+                     b"; total filament used [g] = 1.5"]
+    assert slicers.GENERIC.parse(lines).per_tool == [1.5]
+
+def test_detect_slicer_from_header():
+    """Test detecting the slicer from the first lines of a file."""
+    assert slicers.detect_slicer(b"; generated by PrusaSlicer 2.9.0 on 2025-02-08\n").name == "PrusaSlicer"
+    assert slicers.detect_slicer(b"; HEADER_BLOCK_START\n; generated by OrcaSlicer 2.2.0\n").name == "OrcaSlicer"
+    assert slicers.detect_slicer(b"; HEADER_BLOCK_START\n; BambuStudio 01.09.05.51\n").name == "BambuStudio"
+    assert slicers.detect_slicer(b"; generated by AnycubicSlicerNext 1.3\n").name == "AnycubicSlicerNext"
+    assert slicers.detect_slicer(b"G28\n") is slicers.GENERIC
+
+def test_filename_pattern_is_cached():
+    """Ensure the filename format regex is built once per format."""
+    fmt = "{input_filename_base}_{print_time}.gcode"
+    assert slicers.filename_pattern(fmt) is slicers.filename_pattern(fmt)
+    assert slicers.filename_pattern(fmt).match("my_part_1h2m.gcode").group("input_filename_base") == "my_part"
@@ -0,0 +1,160 @@
+from datetime import date
+from app import app, db
+from app.models import FilamentRoll, PrintJob, PrintJobUsage, RollUsage, MonthlyRollUsage, MonthlyProjectUsage, ConsumptionEntry
+
+def test_usage_follows_print_jobs(client, init_database, add_print):
+    """Ensure the usage summary and ledger follow adds, edits and deletes."""
+    add_print(20, date="2025-02-08T14:30")
+    add_print(30, date="2025-02-09T10:00")
+    client.post("/edit_print/2", data={
+        "filament_id": 2,
+        "weight_used": 35,
+        "project_name": "Usage Test",
+        "date": "2025-02-09T10:00"
+    })
+    client.post("/delete_print/1")
+
+    with app.app_context():
+        assert db.session.get(RollUsage, 1).job_count == 0
+        assert db.session.get(RollUsage, 1).grams_used == 0
+        assert db.session.get(RollUsage, 1).last_used is None
+        assert db.session.get(RollUsage, 2).grams_used == 35
+        assert db.session.get(FilamentRoll, 1).remaining_weight == 500
+        assert db.session.get(FilamentRoll, 2).remaining_weight == 715
+        assert [entry.grams for entry in ConsumptionEntry.query.order_by(ConsumptionEntry.id)] == [20, 30, -30, 35, -20]
+
+def test_approve_temp_job_consumes_filament(client, init_database):
+    """Ensure approving an unreviewed job decrements its roll."""
+    client.post("/add_temp_job", json={"project_name": "Temp Job", "weight_used": 42.0})
+    client.post("/approve_temp_job/1", data={
+        "project_name": "Approved Job",
+        "weight_used": 42.0,
+        "date": "2025-02-08T14:30",
+        "filament_id": 1
+    })
+
+    with app.app_context():
+        assert db.session.get(FilamentRoll, 1).remaining_weight == 458
+        assert db.session.get(RollUsage, 1).job_count == 1
+
+def test_manual_weight_correction_is_ledgered(client, init_database):
+    """Ensure editing a roll's remaining weight is recorded as an adjustment."""
+    client.post("/edit_roll/1", data={
+        "maker": "Prusa",
+        "color": "Black",
+        "total_weight": 1000,
+        "remaining_weight": 480,
+        "in_use": "on"
+    })
+
+    with app.app_context():
+        entry = ConsumptionEntry.query.one()
+        assert (entry.roll_id, entry.grams, entry.reason) == (1, 20, "adjust")
+
+def test_usage_verify_and_rebuild(client, init_database, add_print):
+    """Test the usage CLI detects drift and repairs it."""
+    add_print(20)
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["usage", "verify"])
+    assert result.exit_code == 0
+
+    with app.app_context():
+        db.session.get(RollUsage, 1).grams_used = 99
+        db.session.commit()
+
+    result = runner.invoke(args=["usage", "verify"])
+    assert result.exit_code == 1
+    assert "out of sync" in result.output
+
+    result = runner.invoke(args=["usage", "rebuild"])
+    assert result.exit_code == 0
+    assert runner.invoke(args=["usage", "verify"]).exit_code == 0
+
+def test_monthly_rollup_follows_print_jobs(client, init_database, add_print):
+    """Ensure the monthly rollups follow adds, edits, deletes and bulk approvals."""
+    add_print(20, date="2025-02-08T14:30")
+    add_print(30, date="2025-02-09T10:00")
+    add_print(5, date="2025-03-01T08:00")
+    client.post("/edit_print/2", data={
+        "filament_id": 2,
+        "weight_used": 35,
+        "project_name": "Usage Test",
+        "date": "2025-03-09T10:00"
+    })
+    client.post("/edit_print/3", data={
+        "filament_id": 1,
+        "weight_used": 6,
+        "project_name": "Usage Test",
+        "date": "2025-03-01T08:00"
+    })
+    client.post("/delete_print/1")
+    client.post("/add_temp_job", json={"project_name": "Bulk", "weight_used": 7, "date": "2025-03-02T10:00"})
+    client.post("/review_temp_jobs", json={"approve": [{"temp_job_id": 1, "filament_id": 1}]})
+
+    with app.app_context():
+        assert {(usage.month, usage.roll_id): usage.grams for usage in MonthlyRollUsage.query} == {
+            (date(2025, 3, 1), 1): 13,
+            (date(2025, 3, 1), 2): 35,
+        }
+        assert {(usage.month, usage.project_name): usage.grams for usage in MonthlyProjectUsage.query} == {
+            (date(2025, 3, 1), "Usage Test"): 41,
+            (date(2025, 3, 1), "Bulk"): 7,
+        }
+    assert app.test_cli_runner().invoke(args=["usage", "verify"]).exit_code == 0
+
+def test_multi_material_print_job(client, init_database):
+    """Test splitting a print job over several rolls and editing it back to one roll."""
+    response = client.post("/add_print", data={
+        "filament_id": [1, 2, 1],
+        "weight_used": [12.5, 4, 0.5],
+        "project_name": "Two Colour Benchy",
+        "date": "2025-02-08T14:30"
+    })
+    assert response.status_code == 302
+
+    with app.app_context():
+        job = PrintJob.query.one()
+        assert (job.filament_id, job.weight_used) == (1, 17)
+        assert [(a.roll_id, a.grams) for a in job.allocations] == [(1, 13), (2, 4)]
+        assert db.session.get(FilamentRoll, 1).remaining_weight == 487
+        assert db.session.get(FilamentRoll, 2).remaining_weight == 746
+        assert db.session.get(RollUsage, 2).job_count == 1
+
+    assert b"Black + White" in client.get("/").data
+
+    client.post("/edit_print/1", data={
+        "filament_id": 2,
+        "weight_used": 10,
+        "project_name": "Two Colour Benchy",
+        "date": "2025-02-08T14:30"
+    })
+
+    with app.app_context():
+        assert PrintJobUsage.query.count() == 1
+        assert db.session.get(FilamentRoll, 1).remaining_weight == 500
+        assert db.session.get(FilamentRoll, 2).remaining_weight == 740
+        assert db.session.get(RollUsage, 1).job_count == 0
+    assert app.test_cli_runner().invoke(args=["usage", "verify"]).exit_code == 0
+
+def test_delete_roll_keeps_other_rolls_of_shared_jobs(client, init_database):
+    """Ensure deleting a roll keeps the multi-material jobs it was part of on their other rolls."""
+    client.post("/add_print", data={
+        "filament_id": [1, 2],
+        "weight_used": [10, 5],
+        "project_name": "Shared",
+        "date": "2025-02-08T14:30"
+    })
+    client.post("/add_print", data={
+        "filament_id": 1,
+        "weight_used": 20,
+        "project_name": "Only Black",
+        "date": "2025-02-09T14:30"
+    })
+    client.post("/delete_roll/1")
+
+    with app.app_context():
+        job = PrintJob.query.one()
+        assert (job.project_name, job.filament_id, job.weight_used) == ("Shared", 2, 5)
+        assert [(a.roll_id, a.grams) for a in PrintJobUsage.query] == [(2, 5)]
+    assert app.test_cli_runner().invoke(args=["usage", "verify"]).exit_code == 0